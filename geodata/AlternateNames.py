@@ -23,6 +23,7 @@ Add alternate names for places using the Geonames.org Alternate names file
 """
 from geodata import GeodataBuild, Loc, GeoUtil, GeoSearch, FileReader
 
+ALT_ID = 0
 ALT_GEOID = 1
 ALT_LANG = 2
 ALT_NAME = 3
@@ -49,21 +50,64 @@ class AlternateNames(FileReader.FileReader):
         self.sub_dir = GeoUtil.get_cache_directory(directory)
         self.geo_build: GeodataBuild.GeodataBuild = geo_build
         self.lang_list = lang_list
+        # Languages as bytes for prefilter.  Lines with no language are treated as English
+        self.lang_bytes = {lang.encode('utf-8') for lang in lang_list}
+        if 'en' in lang_list:
+            self.lang_bytes.add(b'')
         self.place = Loc.Loc()
         self.search = None
+        # If True, entries not in the geo_build georow store are looked up by GEOID in the DB.  Used for updates
+        self.lookup_geoid = False
+        self.accepted = 0  # Lines added to DB in last read
 
-    def add_alternate_names_to_db(self) -> bool:
+    def add_alternate_names_to_db(self, start_offset=0, start_line=0) -> bool:
         """
         Read alternate names file into database
+        # Args:
+            start_offset: File position to start at.  Used to resume a build
+            start_line: Line number of line at start_offset - 1
         # Returns:
             True if error
         """
         self.geo_build.geodb.db.begin()
+        self.geo_build.start_bulk_insert()
+        self.checkpoint_lines = self.geo_build.checkpoint_lines
+        self.accepted = 0
         # Read in file.  This will call handle_line for each line in file
-        res = super().read()
+        res = super().read(start_offset=start_offset, start_line=start_line)
+        self.geo_build.end_bulk_insert()
         self.geo_build.geodb.db.commit()
         return res
 
+    def checkpoint(self, line_num: int, file_pos: int):
+        """
+        Commit and record position so an interrupted build can resume from here   
+        #Args:   
+            line_num: Number of lines handled   
+            file_pos: File position after the lines handled   
+        """
+        self.geo_build.save_checkpoint(alt_offset=file_pos, alt_line=line_num)
+        self.geo_build.geodb.db.commit()
+        self.geo_build.geodb.db.begin()
+
+    def prefilter(self, line: bytes) -> bool:
+        """
+        Skip line before it is decoded if the lang is not in lang_list or the geoid is not in the DB   
+        #Args:   
+            line: line from alternate names file as bytes   
+        #Returns:   
+            True if line should be passed to handle_line   
+        """
+        tab1 = line.find(b'\t')
+        tab2 = line.find(b'\t', tab1 + 1)
+        tab3 = line.find(b'\t', tab2 + 1)
+        if tab1 < 0 or tab2 < 0 or tab3 < 0:
+            # Let handle_line log the bad line
+            return True
+        if line[tab2 + 1:tab3] not in self.lang_bytes:
+            return False
+        return self.lookup_geoid or line[tab1 + 1:tab2] in self.geo_build.georow_store
+
     def handle_line(self, line_num, row):
         """
         For each line in file, add item to alternate name DB if we support that language
@@ -72,16 +116,11 @@ class AlternateNames(FileReader.FileReader):
         :param row: line in file to be handled
         :return: None
         """
-        if self.search == None:
-            # Create search instance
-            self.search  = GeoSearch.GeoSearch(self.geo_build.geodb)
-
         alt_tokens = row.split('\t', maxsplit=4)
         if len(alt_tokens) != 5:
             self.logger.debug(f'Incorrect number of tokens {len(alt_tokens)}: {alt_tokens} line {line_num}')
             return
 
-        self.place.georow_list = []
         if alt_tokens[ALT_LANG] == '':
             alt_tokens[ALT_LANG] = 'en'
 
@@ -89,39 +128,64 @@ class AlternateNames(FileReader.FileReader):
         if alt_tokens[ALT_LANG] in self.lang_list:
             # Only Add this alias if  DB  has an entry for it (since geoname DB is filtered )
 
-            # Check Main DB - see if item has an entry with same GEOID 
-            dbid = self.geo_build.geoid_main_dict.get(alt_tokens[ALT_GEOID])
-            if dbid is not None:
-                # Retrieve entry
-                self.search.lookup_dbid(self.place.georow_list, dbid, place=self.place, admin=False)
-            else:
-                # Check Admin DB - see if item has an entry with same GEOID 
-                dbid = self.geo_build.geoid_admin_dict.get(alt_tokens[ALT_GEOID])
-                if dbid is not None:
-                    # Retrieve entry
-                    self.search.lookup_dbid(self.place.georow_list, dbid, place=self.place, admin=True)
-
-            if len(self.place.georow_list) > 0:
-                # Create an entry in the alternate name DB  with this name and soundex
-
-                # Convert row to list. modify name and soundex 
-                # Update the name in the new row with the alternate name
-                update = list(self.place.georow_list[0][0:GeoSearch.Entry.SDX + 1])
-
-                # Make sure this entry has a different name from existing entry
-                if update[GeoSearch.Entry.NAME] != alt_tokens[ALT_NAME].lower():
-                    self.geo_build.update_geo_row_name(geo_row=update, name=alt_tokens[ALT_NAME])
-                    new_row = tuple(update)  # Convert back to tuple
-
-                    if 'ADM1' not in update[GeoSearch.Entry.FEAT] and 'ADM2' not in update[GeoSearch.Entry.FEAT]:
-                        #  Add to main DB if not English or not ADM1/ADM2
-                        self.geo_build.insert(geo_tuple=new_row, feat_code=update[GeoSearch.Entry.FEAT])
-                        self.count += 1
-
-                    # Add name to altnames table
-                    self.geo_build.insert_alternate_name(alt_tokens[ALT_NAME],
-                                                               alt_tokens[ALT_GEOID], alt_tokens[ALT_LANG])
-                    self.count += 1
+            # Get main entry for GEOID from the in-memory store
+            georow = self.geo_build.georow_store.get(alt_tokens[ALT_GEOID])
+            if georow is None and self.lookup_geoid:
+                georow = self.lookup_georow(alt_tokens[ALT_GEOID])
+
+            if georow is not None:
+                self.accepted += 1
+                self.add_alternate_name(georow=georow, alt_name=alt_tokens[ALT_NAME],
+                                        geoid=alt_tokens[ALT_GEOID], lang=alt_tokens[ALT_LANG], alt_id=alt_tokens[ALT_ID])
+
+    def lookup_georow(self, geoid: str):
+        """
+        Look up main entry for GEOID in Main DB then Admin DB   
+        #Args:   
+            geoid: geonames.org geoid   
+        #Returns:   
+            DB row or None if geoid isn't in DB   
+        """
+        if self.search is None:
+            # Create search instance
+            self.search = GeoSearch.GeoSearch(self.geo_build.geodb)
+
+        self.place.georow_list = []
+        self.search.lookup_geoid(self.place.georow_list, geoid, place=self.place, admin=False)
+        if len(self.place.georow_list) == 0:
+            self.search.lookup_geoid(self.place.georow_list, geoid, place=self.place, admin=True)
+        if len(self.place.georow_list) > 0:
+            return self.place.georow_list[0]
+        return None
+
+    def add_alternate_name(self, georow, alt_name: str, geoid: str, lang: str, alt_id):
+        """
+        Create an entry in the alternate name DB with this name and soundex.  Also add a copy of georow   
+        with the alternate name to the main DB unless it is an ADM1 or ADM2 entry   
+        #Args:   
+            georow: DB entry for geoid   
+            alt_name: alternate name   
+            geoid: geonames.org geoid   
+            lang: ISO lang code for alternate name   
+            alt_id: geonames.org alternateNameId   
+        """
+        # Convert row to list. modify name and soundex 
+        # Update the name in the new row with the alternate name
+        update = list(georow[0:GeoSearch.Entry.POP + 1])
+
+        # Make sure this entry has a different name from existing entry
+        if update[GeoSearch.Entry.NAME] != alt_name.lower():
+            self.geo_build.update_geo_row_name(geo_row=update, name=alt_name)
+            new_row = tuple(update)  # Convert back to tuple
+
+            if 'ADM1' not in update[GeoSearch.Entry.FEAT] and 'ADM2' not in update[GeoSearch.Entry.FEAT]:
+                #  Add to main DB if not English or not ADM1/ADM2
+                self.geo_build.insert(geo_tuple=new_row, feat_code=update[GeoSearch.Entry.FEAT])
+                self.count += 1
+
+            # Add name to altnames table
+            self.geo_build.insert_alternate_name(alt_name, geoid, lang, alt_id=alt_id)
+            self.count += 1
 
     def cancel(self):
         """
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2019.       Mike Herbert
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+"""
+Build manifest.  Records the inputs used to build the DB in the manifest table so a later open can tell whether
+the DB is still current for the geonames.org files and filter settings.
+"""
+import hashlib
+import logging
+import os
+
+from geodata import FileReader, Normalize
+
+# Results of BuildManifest.compare()
+SAME = 'same'  # Inputs are unchanged.  Use DB
+ALTNAMES = 'altnames'  # Only the language list or alternate names file changed.  Redo the alternate names pass
+REBUILD = 'rebuild'  # Geonames files, countries, features or normalization rules changed.  Rebuild DB
+UNKNOWN = 'unknown'  # DB has no manifest (built before manifests were added)
+
+# Items that only affect the alternate names pass
+ALTNAME_ITEMS = {'languages'}
+
+
+def _hash_set(values) -> str:
+    """ Returns: hash of a set of strings.  Order doesn't matter """
+    return hashlib.sha256('\n'.join(sorted(values)).encode('utf-8')).hexdigest()
+
+
+def _hash_file(path: str) -> str:
+    """ Returns: hash of file contents """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class BuildManifest:
+    """
+    The manifest has a row for each input:  file:<name> for each geonames.org file with its hash, size and modify time,   
+    and a hash for each filter set (countries, features, languages) and for the normalization rules.   
+    Files are only hashed if their size or modify time differs from the manifest, so checking a DB is cheap.   
+    """
+
+    def __init__(self, directory: str, geoname_files: [str], altname_file: str, languages_list_dct, feature_code_list_dct,
+                 supported_countries_dct):
+        """
+        #Args:
+            directory: directory with geonames.org files
+            geoname_files: names of the geonames.org place files that are read if present
+            altname_file: name of the alternate names file
+            languages_list_dct: languages loaded from alternate names
+            feature_code_list_dct: feature codes loaded
+            supported_countries_dct: countries loaded
+        """
+        self.logger = logging.getLogger(__name__)
+        self.directory = directory
+        self.geoname_files = geoname_files
+        self.altname_file = altname_file
+        self.filters = {'countries': supported_countries_dct, 'features': feature_code_list_dct,
+                        'languages': languages_list_dct}
+        self.changed = []  # Items that differed in last compare()
+        self.touched = {}  # Files in last compare() with the same hash but a new size or modify time
+
+    def read(self, db) -> [{}, None]:
+        """
+        Read manifest from DB
+        #Args:
+            db: DB instance
+        #Returns:
+            dictionary of item: (hash, size, mtime).  None if the DB has no manifest
+        """
+        if not db.table_exists('manifest'):
+            return None
+        manifest = {row[0]: (row[1], row[2], row[3]) for row in db.query('SELECT item, hash, size, mtime FROM manifest')}
+        return manifest if manifest else None
+
+    def get_items(self, previous=None) -> {}:
+        """
+        Get the manifest items for the current inputs
+        #Args:
+            previous: manifest read from DB or None.  A file hash is reused if the file size and modify time match
+        #Returns:
+            dictionary of item: (hash, size, mtime)
+        """
+        items = {}
+        for fname in self.geoname_files + [self.altname_file]:
+            item = f'file:{fname}'
+            val = self._get_file_item(fname, previous.get(item) if previous else None)
+            if val is not None:
+                items[item] = val
+
+        for name, values in self.filters.items():
+            items[name] = (_hash_set(values), len(values), 0)
+        items['normalize'] = (Normalize.get_rules_hash(), 0, 0)
+        return items
+
+    def _get_file_item(self, fname: str, prev) -> [(), None]:
+        """
+        Get the manifest item for a file.  The file hash is reused from prev if the file size and modify time match
+        #Returns:
+            (hash, size, mtime) or None if the file isn't found
+        """
+        # Use file or a zip/gz compressed version of it
+        path = FileReader.find_file(self.directory, fname)
+        if path is None:
+            return None
+        stat = os.stat(path)
+        if prev and prev[1] == stat.st_size and prev[2] == stat.st_mtime_ns:
+            return prev
+        return _hash_file(path), stat.st_size, stat.st_mtime_ns
+
+    def update_file(self, db, fname: str):
+        """
+        Update the manifest item for one geonames.org file, e.g. after the shard for a country was reloaded from it.   
+        Must be inside a DB transaction
+        #Args:
+            db: DB instance
+            fname: file name.  Not case sensitive
+        """
+        if not db.table_exists('manifest'):
+            return
+        for name in self.geoname_files:
+            if name.lower() == fname.lower():
+                val = self._get_file_item(name, None)
+                if val is not None:
+                    db.execute('INSERT OR REPLACE INTO manifest(item, hash, size, mtime) VALUES(?,?,?,?)',
+                               (f'file:{name}',) + tuple(val))
+
+    def update_touched(self, db):
+        """
+        Record the size and modify time of the files that were touched but unchanged in the last compare(), so they   
+        aren't hashed again on the next open.  Must be inside a DB transaction
+        #Args:
+            db: DB instance
+        """
+        db.executemany('INSERT OR REPLACE INTO manifest(item, hash, size, mtime) VALUES(?,?,?,?)',
+                       [(item,) + tuple(val) for item, val in sorted(self.touched.items())])
+
+    def write(self, db, items=None):
+        """
+        Replace the manifest in the DB.  Must be inside a DB transaction   
+        #Args:
+            db: DB instance
+            items: manifest items.  If None, items for the current inputs are created
+        """
+        if items is None:
+            items = self.get_items()
+        # noinspection SqlWithoutWhere
+        db.execute('DELETE FROM manifest', None)
+        db.executemany('INSERT INTO manifest(item, hash, size, mtime) VALUES(?,?,?,?)',
+                       [(item,) + tuple(val) for item, val in sorted(items.items())])
+
+    def compare(self, db, ignore_files=()) -> str:
+        """
+        Compare the manifest in the DB with the current inputs.  self.changed is set to the items that differ.   
+        Only file hashes matter.  A file that is touched but unchanged is not treated as a change.  A file that is   
+        no longer in the directory is not treated as a change either, since the DB can't be rebuilt without it   
+        #Args:
+            db: DB instance
+            ignore_files: names of files whose changes are ignored
+        #Returns:
+            SAME, ALTNAMES, REBUILD or UNKNOWN
+        """
+        self.changed = []
+        self.touched = {}
+        previous = self.read(db)
+        if previous is None:
+            return UNKNOWN
+        current = self.get_items(previous)
+        missing = sorted(item for item in previous if item.startswith('file:') and item not in current)
+        if missing:
+            self.logger.warning(f'Input files not found: {", ".join(missing)}.  Using the database built from them')
+        self.touched = {item: val for item, val in current.items()
+                        if item in previous and previous[item][0] == val[0] and previous[item] != val}
+        self.changed = sorted(item for item in set(previous) | set(current)
+                              if previous.get(item, (None,))[0] != current.get(item, (None,))[0]
+                              and item not in missing
+                              and item not in [f'file:{fname}' for fname in ignore_files])
+        if len(self.changed) == 0:
+            return SAME
+        if all(item in ALTNAME_ITEMS or item == f'file:{self.altname_file}' for item in self.changed):
+            return ALTNAMES
+        return REBUILD
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2019.       Mike Herbert
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+"""
+Collect timing and row counts for each stage of a database build and write them as a JSON report
+"""
+import json
+import logging
+import os
+import platform
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows.  Peak RSS is not reported
+    resource = None
+
+TABLES = ['geodata', 'admin', 'altname']
+
+
+class BuildReport:
+    """
+    Build profiling report.  For each build stage this records wall and CPU time (including worker processes),
+    lines read, rows accepted and rejected, rows added to each table, rows/sec, and peak RSS.  When the build is
+    done, the final table and index sizes are added and the report is written as JSON.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self.stages = []
+        self.stage = None
+        self.resumed = False
+        self._start_time = time.time()
+        self._start_cpu = _cpu_time()
+        self._stage_wall = 0.0
+        self._stage_cpu = 0.0
+        self._stage_ids = {}
+
+    def start_stage(self, name: str, db):
+        """
+        Start timing a build stage
+        #Args:
+            name: stage name, e.g. 'allCountries.txt'
+            db: DB instance being built
+        """
+        self.stage = {'stage': name, 'lines': 0, 'accepted': 0, 'rejected_country': 0, 'rejected_feature': 0}
+        self._stage_ids = {tbl: db.get_max_id(tbl) for tbl in TABLES}
+        self._stage_wall = time.time()
+        self._stage_cpu = _cpu_time()
+
+    def add(self, **kwargs):
+        """
+        Add to the counts for the current stage
+        #Args:
+            kwargs: count name and amount to add, e.g. lines=1000
+        """
+        if self.stage is None:
+            return
+        for key, val in kwargs.items():
+            self.stage[key] = self.stage.get(key, 0) + val
+
+    def end_stage(self, db):
+        """
+        Finish the current stage and record its times and counts.  Buffered rows must be written before this
+        #Args:
+            db: DB instance being built
+        """
+        if self.stage is None:
+            return
+        wall = time.time() - self._stage_wall
+        self.stage['wall_secs'] = round(wall, 3)
+        self.stage['cpu_secs'] = round(_cpu_time() - self._stage_cpu, 3)
+        # Rows removed in a stage (e.g. moved to shards) aren't counted
+        self.stage['rows_added'] = {tbl: max(0, db.get_max_id(tbl) - self._stage_ids[tbl]) for tbl in TABLES}
+        rows = sum(self.stage['rows_added'].values())
+        self.stage['rows_per_sec'] = round(rows / wall) if wall > 0 else 0
+        self.stage['peak_rss_mb'] = _peak_rss_mb()
+        self.stages.append(self.stage)
+        self.logger.info(f'Build stage {self.stage}')
+        self.stage = None
+
+    def write(self, path: str, db) -> bool:
+        """
+        Add totals and final table and index sizes and write the report as JSON
+        #Args:
+            path: path for report file
+            db: DB instance that was built
+        #Returns:
+            True if error
+        """
+        report = {
+            'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'resumed': self.resumed,
+            'wall_secs': round(time.time() - self._start_time, 3),
+            'cpu_secs': round(_cpu_time() - self._start_cpu, 3),
+            'peak_rss_mb': _peak_rss_mb(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'stages': self.stages,
+            'row_counts': {tbl: db.get_row_count(tbl) for tbl in TABLES},
+            'sizes': get_db_sizes(db)
+            }
+        try:
+            with open(path, 'w') as file:
+                json.dump(report, file, indent=2)
+        except OSError as e:
+            self.logger.warning(f'Unable to write build report {path}: {e}')
+            return True
+        self.logger.info(f'Build report written to {path}')
+        return False
+
+
+def get_db_sizes(db) -> {}:
+    """
+    Get the size of each table and index
+    #Args:
+        db: DB instance
+    #Returns:
+        Dictionary of name: bytes.  Uses the dbstat virtual table.  If sqlite was built without dbstat, only the
+        total DB size is returned
+    """
+    sizes = {}
+    if not db.test_database('name', 'dbstat', where='name = ?', args=('geodata',)):
+        for name, size in db.query('SELECT name, SUM(pgsize) FROM dbstat GROUP BY name ORDER BY name'):
+            sizes[name] = size
+    page_count = list(db.query('PRAGMA page_count'))
+    page_size = list(db.query('PRAGMA page_size'))
+    if page_count and page_size:
+        sizes['total'] = page_count[0][0] * page_size[0][0]
+    return sizes
+
+
+def _cpu_time() -> float:
+    """ Returns: user + system CPU seconds for this process and its finished child processes """
+    tms = os.times()
+    return tms.user + tms.system + tms.children_user + tms.children_system
+
+
+def _peak_rss_mb() -> [dict, None]:
+    """ Returns: peak resident set size in MB for this process and for its largest child process """
+    if resource is None:
+        return None
+    # ru_maxrss is in KB on linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return {'self': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1),
+            'children': round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1)}
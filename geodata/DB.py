@@ -20,22 +20,38 @@
 import logging
 import sqlite3
 import sys
+import threading
 import traceback
+import urllib.request
+from collections import OrderedDict
 from tkinter import messagebox
 
+# Size of the sqlite3 statement cache (the sqlite3 default is 128).  select() keeps the same number of statements.   
+# A sharded DB has a statement for each query shape and shard
+CACHED_STATEMENTS = 512
+# Page cache size in KB for each connection in the serving profile.  See set_serving_pragmas
+SERVING_CACHE_KB = 65536
+
 
 class DB:
     """
-    Sqlite3  helper functions
+    Sqlite3  helper functions.   
+    In read only mode the DB is opened with a read only URI and each thread gets its own connection, so one DB   
+    instance can serve lookups from many threads, and many processes can read the same file.   
     """
 
-    def __init__(self, db_filename: str, show_message: bool, exit_on_error: bool):
+    def __init__(self, db_filename: str, show_message: bool, exit_on_error: bool,
+                 cached_statements: int = None, read_only=False, immutable=False):
         """
             Initialize and create a database connection to db_filename
         # Args:
             db_filename: Database filename
             show_message: If true, show messagebox to user on errors
             exit_on_error: If true, sys exit on significant errors
+            cached_statements: Size of the sqlite3 statement cache.  Default is CACHED_STATEMENTS
+            read_only: If True, open the DB read only (URI mode=ro) with a connection for each thread
+            immutable: If True, also open with URI immutable=1 - sqlite doesn't lock or check for changes.  Only use   
+                if the file is never modified while open.  (A rebuild that replaces the file with os.replace is OK)
         # Raises:
             ValueError('Cannot open database')
         """
@@ -47,15 +63,88 @@ class DB:
         self.total_lookups = 0
         self.show_message = show_message
         self.exit_on_error = exit_on_error
+        self.db_filename = db_filename
+        self.read_only = read_only
+        self.immutable = immutable
+        self._local = threading.local()  # Connection, err and select() statements for this thread
+        self._lock = threading.Lock()
+        self._connections = []  # Connections opened for each thread in read only mode.  Closed by close()
+        self._pragmas = []  # Pragmas set so far.  Each new thread connection sets them
         self.err = ''
         self.collate = 'COLLATE NOCASE'
+        self._fts5 = None
+        self.cached_statements = cached_statements or CACHED_STATEMENTS
 
         # create database connection
-        self.conn = self._connect(db_filename=db_filename)
-        if self.conn is None:
+        self._conn = self._connect(db_filename=db_filename)
+        if self._conn is None:
             self.err = f"Error! cannot open database {db_filename}."
             self.logger.error(f"Error! cannot open database {db_filename}.")
             raise ValueError('Cannot open database')
+        if self.read_only:
+            self._local.conn = self._conn
+            self._connections.append(self._conn)
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """
+        Returns: connection for this DB.  In read only mode this is the connection for the current thread, which is   
+        opened the first time the thread uses the DB
+        """
+        if not self.read_only:
+            return self._conn
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._open_thread_connection()
+        return conn
+
+    @property
+    def err(self):
+        """ Returns: Exception text for the last error in this thread or '' """
+        return getattr(self._local, 'err', '')
+
+    @err.setter
+    def err(self, err):
+        self._local.err = err
+
+    @property
+    def statement_hits(self) -> int:
+        """ Returns: select() statement cache hits in this thread.  See _get_statement """
+        return getattr(self._local, 'statement_hits', 0)
+
+    @property
+    def statement_misses(self) -> int:
+        """ Returns: select() statement cache misses in this thread.  See _get_statement """
+        return getattr(self._local, 'statement_misses', 0)
+
+    def _open_thread_connection(self) -> sqlite3.Connection:
+        """
+        Open a read only connection for the current thread and set the pragmas set so far   
+        # Returns: Connection object
+        # Raises:
+            ValueError('Cannot open database')
+        """
+        conn = self._connect(db_filename=self.db_filename)
+        if conn is None:
+            raise ValueError('Cannot open database')
+        conn.isolation_level = None
+        with self._lock:
+            for pragma in self._pragmas:
+                conn.execute(pragma)
+            self._connections.append(conn)
+        self._local.conn = conn
+        return conn
+
+    def get_uri(self, db_filename: str) -> str:
+        """
+        Returns: db_filename as a read only URI in read only mode (also for ATTACH).  Otherwise db_filename
+        """
+        if not self.read_only:
+            return db_filename
+        uri = f'file:{urllib.request.pathname2url(db_filename)}?mode=ro'
+        if self.immutable:
+            uri += '&immutable=1'
+        return uri
 
     def _connect(self, db_filename: str):
         """
@@ -68,7 +157,12 @@ class DB:
         """
         self.err = ''
         try:
-            conn = sqlite3.connect(db_filename)
+            if self.read_only:
+                # Each connection is only used by its own thread, but close() can be called from any thread
+                conn = sqlite3.connect(self.get_uri(db_filename), uri=True, check_same_thread=False,
+                                       cached_statements=self.cached_statements)
+            else:
+                conn = sqlite3.connect(db_filename, cached_statements=self.cached_statements)
             self.logger.info(f'Using database {db_filename}')
             return conn
         except Exception as e:
@@ -132,6 +226,20 @@ class DB:
         cur = self.conn.cursor()
         cur.execute(pragma)
         self.conn.commit()
+        if self.read_only:
+            with self._lock:
+                self._pragmas.append(pragma)
+
+    def close(self):
+        """ Close the connection.  In read only mode the connection for each thread is closed """
+        if self.read_only:
+            with self._lock:
+                for conn in self._connections:
+                    conn.close()
+                self._connections.clear()
+            self._local = threading.local()
+        else:
+            self.conn.close()
 
     def create_table(self, create_table_sql: str):
         """
@@ -260,11 +368,126 @@ class DB:
 
         return self.cur.lastrowid
 
+    def executemany(self, sql, rows) -> bool:
+        """
+        Execute a SQL statement for each row in a list.  Used for bulk inserts
+        # Args:
+            sql: a full SQL statement with ? parameters
+            rows: list of argument tuples
+
+        # Returns: True if error.  Self.err is set to Exception text. Shows Messagebox on error if flag set.
+        # Raises: Nothing.  DB exceptions are suppressed.
+        """
+        self.err = ''
+        try:
+            self.cur.executemany(sql, rows)
+        except Exception as e:
+            self.logger.error(e)
+            self.logger.error(f'sql [{sql}]')
+            self.logger.error(f'rows {len(rows)}')
+            traceback.print_stack()
+
+            self.err = e
+            if self.show_message:
+                messagebox.showwarning('Error', f'Database Error\n {e}')
+            return True
+        return False
+
+    def execute_transaction(self, sql_list, args=()) -> bool:
+        """
+        Execute a list of SQL statements in a single transaction.  If a statement fails, the transaction is rolled back.
+        Rollback requires a journal, so journal_mode must not be off
+        # Args:
+            sql_list: list of full SQL statements
+            args: Args tuple used for each statement
+
+        # Returns: True if error.  Self.err is set to Exception text. Shows Messagebox on error if flag set.
+        # Raises: Nothing.  DB exceptions are suppressed.
+        """
+        self.err = ''
+        cur = self.conn.cursor()
+        try:
+            cur.execute('BEGIN')
+            for sql in sql_list:
+                cur.execute(sql, args)
+            cur.execute('COMMIT')
+        except Exception as e:
+            self.logger.error(e)
+            self.err = e
+            if self.conn.in_transaction:
+                cur.execute('ROLLBACK')
+            if self.show_message:
+                messagebox.showwarning('Error', f'Database Error\n {e}')
+            return True
+        return False
+
+    def get_max_id(self, table_name) -> int:
+        """
+        Get largest row ID in specified table
+        # Args:
+            table_name:
+        Returns: largest ID or 0 if table is empty
+        """
+        cur = self.conn.cursor()
+        cur.execute(f'SELECT MAX(id) FROM {table_name}')
+        res = cur.fetchall()
+        if res[0][0] is None:
+            return 0
+        return res[0][0]
+
+    def add_column(self, table_name, column_name, column_type) -> bool:
+        """
+        Add a column to a table if the table doesn't already have it
+        # Args:
+            table_name:
+            column_name:
+            column_type: SQL type for column, e.g. 'text'
+        # Returns: True if error.  Self.err is set to Exception text. Shows Messagebox on error if flag set.
+        # Raises: Nothing.  DB exceptions are suppressed.
+        """
+        self.err = ''
+        cur = self.conn.cursor()
+        try:
+            if not self.column_exists(table_name, column_name):
+                self.logger.info(f'Add column {column_name} to {table_name}')
+                cur.execute(f'ALTER TABLE {table_name} ADD COLUMN {column_name} {column_type}')
+        except Exception as e:
+            self.logger.error(e)
+            self.err = e
+            if self.show_message:
+                messagebox.showwarning('Error', f'Database add column error\n {e}')
+            return True
+        return False
+
+    def fts5_available(self) -> bool:
+        """
+        Returns: True if SQLite has the FTS5 full text search extension
+        """
+        if self._fts5 is None:
+            try:
+                self.conn.execute('CREATE VIRTUAL TABLE IF NOT EXISTS temp.fts5_check USING fts5(name)')
+                self.conn.execute('DROP TABLE temp.fts5_check')
+                self._fts5 = True
+            except sqlite3.OperationalError as e:
+                self.logger.info(f'FTS5 not available: {e}')
+                self._fts5 = False
+        return self._fts5
+
+    def column_exists(self, table_name, column_name) -> bool:
+        """
+        Returns: True if table has the column.  table_name can be schema.table
+        """
+        cur = self.conn.cursor()
+        schema, _, table = table_name.rpartition('.')
+        schema = f'{schema}.' if schema else ''
+        cur.execute(f'PRAGMA {schema}table_info({table})')
+        return column_name in [row[1] for row in cur.fetchall()]
+
     def commit(self):
         """ Commit transaction """
         self.cur.execute("commit")
 
-    def select(self, select_str, where, from_tbl, args):
+    def select(self, select_str, where, from_tbl, args, order_str=None):
         """
         Execute a SELECT statement   
 
@@ -273,7 +496,8 @@ class DB:
             where: Where clause   
             from_tbl: Table name   
             args: Args tuple for Select   
-            Note - ORDER clause and LIMIT clause are filled in with previously set values
+            order_str: ORDER clause for this query.  If None, the previously set ORDER clause is used   
+            Note - LIMIT clause is filled in with previously set value
 
         # Returns: Result list.  Self.err is set to Exception text. Shows Messagebox and/or exits on error if flags set.   
         # Raises: Nothing.  DB exceptions are suppressed. 
@@ -282,7 +506,8 @@ class DB:
         self.err = ''
 
         cur = self.conn.cursor()
-        sql = f"SELECT {select_str} FROM {from_tbl} WHERE {where} {self.order_string} {self.limit_string} {self.collate}"
+        order_str = self.order_string if order_str is None else order_str
+        sql = self._get_statement(select_str, where, from_tbl, order_str)
         #self.logger.debug(f'select {sql} val={args}')
         try:
             cur.execute(sql, args)
@@ -303,6 +528,120 @@ class DB:
                 result_list = None
         return result_list
 
+    def select_union(self, select_str, where_list, from_tbl, args, order_str=None):
+        """
+        Execute a SELECT for each where clause in a single UNION ALL statement.  Each SELECT has its own ORDER and   
+        LIMIT, so the rows are the same as calling select() for each where clause   
+
+        # Args:   
+            select_str: string for SELECT xx   
+            where_list: list of Where clauses   
+            from_tbl: Table name   
+            args: Args tuple for all the where clauses, in order   
+            order_str: ORDER clause for each SELECT.  If None, the previously set ORDER clause is used   
+
+        # Returns: Result list.  Each row starts with the index in where_list of the SELECT that returned it.   
+            Self.err is set to Exception text. Shows Messagebox and/or exits on error if flags set.   
+        # Raises: Nothing.  DB exceptions are suppressed. 
+        """
+        return self.select(select_str, tuple(where_list), from_tbl, args, order_str)
+
+    def explain_query_plan(self, select_str, where, from_tbl, args, order_str=None) -> [str]:
+        """
+        Get the sqlite query plan for the statement select() would run
+
+        # Args:
+            Same as select()
+
+        # Returns: List of query plan lines, e.g. 'SEARCH main.geodata USING INDEX name_idx (name=?)'.
+            Empty list on error.  Self.err is set to Exception text.
+        """
+        order_str = self.order_string if order_str is None else order_str
+        sql = self._get_statement(select_str, where, from_tbl, order_str)
+        return [row[3] for row in self.query('EXPLAIN QUERY PLAN ' + sql, args)]
+
+    def _get_statement(self, select_str, where, from_tbl, order_str) -> str:
+        """
+        Get the SELECT statement for a query shape.  Statements are kept in least recently used order and the   
+        number kept is the size of the sqlite3 statement cache.  That cache is also keyed by the statement text,   
+        so a hit here is a hit in the sqlite3 cache.  Each thread has its own statements, the same as the sqlite3   
+        cache for its connection, so threads don't wait on each other here   
+        # Args:   
+            select_str: string for SELECT xx   
+            where: Where clause, or tuple of Where clauses for a UNION ALL statement (see select_union)   
+            from_tbl: Table name   
+            order_str: ORDER clause   
+        # Returns: SELECT statement   
+        """
+        key = (select_str, where, from_tbl, order_str, self.limit_string)
+        local = self._local
+        statements = getattr(local, 'statements', None)
+        if statements is None:
+            # SELECT statement for each query shape in least recently used order
+            statements = local.statements = OrderedDict()
+            local.statement_hits = 0
+            local.statement_misses = 0
+        sql = statements.get(key)
+        if sql is None:
+            local.statement_misses += 1
+            if isinstance(where, tuple):
+                # sqlite only allows ORDER and LIMIT on the whole compound SELECT, so each SELECT is a subquery
+                sql = ' UNION ALL '.join(
+                    f"SELECT {idx}, * FROM (SELECT {select_str} FROM {from_tbl} WHERE {clause} {order_str} "
+                    f"{self.limit_string} {self.collate})" for idx, clause in enumerate(where))
+            else:
+                sql = f"SELECT {select_str} FROM {from_tbl} WHERE {where} {order_str} {self.limit_string} {self.collate}"
+            statements[key] = sql
+            if len(statements) > self.cached_statements:
+                statements.popitem(last=False)
+        else:
+            local.statement_hits += 1
+            statements.move_to_end(key)
+        return sql
+
+    def get_statement_stats(self) -> dict:
+        """
+        Returns: Dictionary of select() statement cache statistics for this thread: statements, hits, misses,   
+            hit_rate (percent)
+        """
+        total = self.statement_hits + self.statement_misses
+        statements = getattr(self._local, 'statements', {})
+        return {'statements': len(statements), 'hits': self.statement_hits, 'misses': self.statement_misses,
+                'hit_rate': round(self.statement_hits * 100 / total, 1) if total else 0.0}
+
+    def query(self, sql, args=()):
+        """
+        Execute a full SELECT statement.  Unlike select(), the ORDER and LIMIT settings are not added
+
+        # Args:
+            sql: SELECT statement
+            args: Args tuple for statement
+
+        # Returns: Cursor to iterate through result rows (an empty list on error).  Self.err is set to Exception text.
+        # Raises: Nothing.  DB exceptions are suppressed.
+        """
+        self.err = ''
+        cur = self.conn.cursor()
+        try:
+            return cur.execute(sql, args)
+        except Exception as e:
+            self.err = e
+            self.logger.error(e)
+            self.logger.error(sql)
+            return []
+
+    def check_integrity(self) -> bool:
+        """
+        Run 'PRAGMA quick_check' on the database
+        # Returns:
+            True if error
+        """
+        res = list(self.query('PRAGMA quick_check'))
+        if len(res) == 1 and res[0][0] == 'ok':
+            return False
+        self.logger.warning(f'Database integrity check failed: {res[0:5]} {self.err}')
+        return True
+
     def table_exists(self, table_name) -> bool:
         """
             Returns whether table exists
@@ -373,6 +712,8 @@ class DB:
         'PRAGMA journal_mode = off'   
         'PRAGMA locking_mode = exclusive'   
         'PRAGMA synchronous = 0   
+        'PRAGMA case_sensitive_like = ON'  Text columns use BINARY collation so LIKE must be case sensitive   
+        to use an index.  Search terms are lower case like the DB   
         """
         self.logger.debug('Database pragmas set for speed')
         self.conn.isolation_level = None
@@ -380,10 +721,51 @@ class DB:
                     'PRAGMA journal_mode = off',
                     'PRAGMA locking_mode = exclusive',
                     'PRAGMA synchronous = 0',
-                    'PRAGMA case_sensitive_like = OFF'
+                    'PRAGMA case_sensitive_like = ON'
                     ]:
             self.set_pragma(txt)
 
+    def set_read_pragmas(self):
+        """
+        Set DB pragmas for a read only DB.  Unlike set_speed_pragmas, the DB isn't locked so other   
+        connections and processes can read it   
+        'PRAGMA temp_store = memory'   
+        'PRAGMA case_sensitive_like = ON'  See set_speed_pragmas   
+        """
+        self.logger.debug('Database pragmas set for read only')
+        self.conn.isolation_level = None
+        for txt in ['PRAGMA temp_store = memory',
+                    'PRAGMA case_sensitive_like = ON'
+                    ]:
+            self.set_pragma(txt)
+
+    def set_serving_pragmas(self, mmap_size: int, cache_kb: int = SERVING_CACHE_KB):
+        """
+        Set DB pragmas for serving lookups from a read only DB.  Call after set_read_pragmas   
+        'PRAGMA mmap_size = N'  Read the DB through memory mapped I/O rather than copying each page into the page   
+        cache.  sqlite limits this to SQLITE_MAX_MMAP_SIZE (usually 2GB).  Shards attached later use the same size   
+        'PRAGMA cache_size = -N'  Page cache of N KB for each connection, used for the part of the DB beyond   
+        mmap_size.  Attached shards keep the default cache size   
+        'PRAGMA query_only = ON'  Any attempt to change the DB is an error   
+        # Args:
+            mmap_size: Bytes of each DB file to memory map.  Usually the size of the largest DB file
+            cache_kb: Page cache size in KB
+        """
+        self.logger.debug('Database pragmas set for serving')
+        for txt in [f'PRAGMA mmap_size = {mmap_size}',
+                    f'PRAGMA cache_size = -{cache_kb}',
+                    'PRAGMA query_only = ON'
+                    ]:
+            self.set_pragma(txt)
+
+    def analyze(self):
+        """
+        Run ANALYZE to gather statistics for the query planner and then set 'PRAGMA optimize'
+        """
+        self.logger.debug(' Database Analyze')
+        self.set_pragma('ANALYZE')
+        self.set_optimize_pragma()
+
     def set_optimize_pragma(self):
         """
         Set 'PRAGMA optimize'
@@ -18,8 +18,13 @@
 #   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
 
 """        Read a file and call a handler for each line. Update progress bar if present.  """
+import gzip
+import io
 import logging
+import mmap
 import os
+import time
+import zipfile
 
 
 class FileReader:
@@ -39,41 +44,82 @@ class FileReader:
         self.cache_changed = False
         self.count = 0
         self.prefix = prefix
+        self.skipped = 0  # Lines rejected by prefilter in last read
+        self.line_count = 0  # Lines read in last read
+        self.mb_per_sec = 0.0  # Scan speed of last read
+        self.checkpoint_lines = 0  # If non zero, checkpoint() is called every checkpoint_lines lines
 
-    def read(self) -> bool:
+    def read(self, start_offset=0, start_line=0) -> bool:
         """
-        Read a file and call a handler for each line.  Update progress bar
+        Read a file and call a handler for each line.  Update progress bar   
+        The file is scanned as bytes.  Each line is passed to prefilter() and only lines that pass are decoded   
+        and passed to handle_line().  An uncompressed file is memory mapped.  If the file isn't found, a zip or gz   
+        compressed version of it is read (see find_file)   
+        :param start_offset: File position to start reading at.  Used to resume from a checkpoint
+        :param start_line: Line number of line at start_offset - 1
         :return: Error
         """
-        line_num = 0
-        file_pos = 0
+        line_num = start_line
+        self.skipped = 0
 
-        path = os.path.join(self.directory, self.fname)
+        path = find_file(self.directory, self.fname)
         self.logger.info(f"Reading file {path}")
-        if os.path.exists(path):
+        if path is not None:
             fsize = os.path.getsize(path)
-            with open(path, 'r', newline="", encoding='utf-8', errors='replace') as file:
-                for row in file:
-                    line_num += 1
-                    file_pos += len(row)
-                    self.handle_line(line_num, row)
-                    if line_num % 80000 == 1:
-                        # Periodically update progress
-                        prog = file_pos * 100 / fsize
-                        self.progress(f"{self.prefix} Loading {self.fname} {prog:.0f}%", prog)
+            start = time.time()
+            if fsize > 0:
+                with InputFile(path, self.fname, use_mmap=True) as file:
+                    file.seek(start_offset)
+                    for line in iter(file.readline, b''):
+                        line_num += 1
+                        if self.checkpoint_lines and line_num % self.checkpoint_lines == 0:
+                            # All lines before this one are handled
+                            self.checkpoint(line_num - 1, file.tell() - len(line))
+                        if line_num % 80000 == 1:
+                            # Periodically update progress
+                            prog = file.progress()
+                            self.progress(f"{self.prefix} Loading {self.fname} {prog:.0f}%", prog)
+                        if not self.prefilter(line):
+                            self.skipped += 1
+                            continue
+                        self.handle_line(line_num, line.decode('utf-8', errors='replace'))
 
+            elapsed = time.time() - start
+            self.line_count = line_num - start_line
+            self.mb_per_sec = fsize / (1024 * 1024) / elapsed if elapsed > 0 else 0.0
             self.cache_changed = True
             self.progress("", 100)
-            self.logger.info(f'Added {self.count} items')
+            self.logger.info(f'Added {self.count} items.  Read {line_num:,} lines.  Prefilter skipped {self.skipped:,} lines.  '
+                             f'{self.mb_per_sec:.1f} MB/sec')
             return False
         else:
-            self.logger.error(f'Unable to open {path}')
+            self.logger.error(f'Unable to open {os.path.join(self.directory, self.fname)}')
             return True
 
     def cancel(self):
         # User requested cancel of file read
         pass
 
+    def checkpoint(self, line_num: int, file_pos: int):
+        """
+        Called every checkpoint_lines lines.  Subclasses override this to save progress   
+        #Args:   
+            line_num: Number of lines handled   
+            file_pos: File position after the lines handled   
+        """
+        pass
+
+    def prefilter(self, line: bytes) -> bool:
+        """
+        Quick check on the raw bytes of a line before it is decoded.  Subclasses override this to skip lines   
+        without creating strings   
+        #Args:   
+            line: line from file as bytes   
+        #Returns:   
+            True if line should be passed to handle_line   
+        """
+        return True
+
     def handle_line(self, line_num: int, row: str) -> int:
         # Handle the line we read
         pass
@@ -89,3 +135,107 @@ class FileReader:
         else:
             self.logger.debug(f'{val:.1f}%  {msg}')
 
+
+
+def find_file(directory: str, filename: str) -> [str, None]:
+    """
+    Find a geonames file.  If the file itself isn't found, a zip or gzip compressed version is used, e.g. for   
+    allCountries.txt:  allCountries.zip, allCountries.txt.gz, or allCountries.gz.  The file name match is not case   
+    sensitive since geonames.org country zips are upper case (GB.zip)   
+    #Args:   
+        directory: directory for file   
+        filename: name of uncompressed file   
+    #Returns:   
+        path of file or None if not found   
+    """
+    if os.path.exists(os.path.join(directory, filename)):
+        return os.path.join(directory, filename)
+    try:
+        names = {name.lower(): name for name in os.listdir(directory)}
+    except OSError:
+        return None
+    stem = os.path.splitext(filename)[0]
+    for candidate in [filename, stem + '.zip', filename + '.gz', stem + '.gz']:
+        if candidate.lower() in names:
+            return os.path.join(directory, names[candidate.lower()])
+    return None
+
+
+class InputFile:
+    """
+    Binary input for a file that may be zip or gzip compressed.  Compressed files are decompressed as they are read.   
+    Supports readline, read, seek, tell and iteration by line.  Positions are in uncompressed bytes.   
+    progress() gives percent done based on the (compressed) bytes read from disk   
+    """
+
+    def __init__(self, path: str, member: str, use_mmap=False):
+        """
+        Open file
+        #Args:   
+            path: path to file.  Files ending in .zip or .gz are decompressed   
+            member: name of file to read from a zip archive.  If not found, the first .txt file is used   
+            use_mmap: If True, an uncompressed file is memory mapped   
+        """
+        self.size = os.path.getsize(path)
+        self.raw = open(path, 'rb')
+        self.zip = None
+        self.mm = None
+        lower_path = path.lower()
+        if lower_path.endswith('.gz'):
+            self.file = io.BufferedReader(gzip.GzipFile(fileobj=self.raw), buffer_size=1024 * 1024)
+        elif lower_path.endswith('.zip'):
+            self.zip = zipfile.ZipFile(self.raw)
+            names = self.zip.namelist()
+            matches = [name for name in names if name.lower() == member.lower()] + \
+                      [name for name in names if name.lower().endswith('.txt')]
+            if len(matches) == 0:
+                self.close()
+                raise ValueError(f'No text file in {path}')
+            self.file = io.BufferedReader(self.zip.open(matches[0]), buffer_size=1024 * 1024)
+        elif use_mmap and self.size > 0:
+            self.mm = mmap.mmap(self.raw.fileno(), 0, access=mmap.ACCESS_READ)
+            self.file = self.mm
+        else:
+            self.file = self.raw
+        self.compressed = self.zip is not None or lower_path.endswith('.gz')
+
+    def readline(self) -> bytes:
+        return self.file.readline()
+
+    def read(self, size=-1) -> bytes:
+        return self.file.read(size)
+
+    def seek(self, pos: int):
+        """ Seek to uncompressed position.  For compressed files this decompresses up to pos """
+        if pos > 0:
+            self.file.seek(pos)
+
+    def tell(self) -> int:
+        """ Returns: uncompressed position """
+        return self.file.tell()
+
+    def progress(self) -> float:
+        """ Returns: percent of file read, based on bytes read from disk """
+        if self.size == 0:
+            return 100.0
+        if self.mm is not None:
+            return self.mm.tell() * 100 / self.size
+        return self.raw.tell() * 100 / self.size
+
+    def __iter__(self):
+        if self.mm is not None:
+            return iter(self.mm.readline, b'')
+        return iter(self.file)
+
+    def close(self):
+        if self.mm is not None:
+            self.mm.close()
+        if self.zip is not None:
+            self.zip.close()
+        self.raw.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -20,23 +20,43 @@
 geoname database support routines.  Add locations to geoname DB, create geoname tables and indices.   
 Provides a number of methods to lookup locations by name, feature, admin ID, etc.
 """
+import json
 import logging
+import math
 import os
 import sys
+import threading
 import time
 from tkinter import messagebox
 
-from geodata import Loc, DB, GeoSearch, MatchScore
+from geodata import Loc, DB, GeoSearch, MatchScore, ShardSet
 from geodata.GeoUtil import Query, Result, Entry
 from geodata import Normalize
 
+# Queries on the geodata and admin tables return the most important entries first, so LIMIT keeps those
+PRIORITY_ORDER = 'ORDER BY priority DESC'
+RANKED_TABLES = {'geodata', 'admin'}
+# Narrow a query to the rows with the words in Query.word.  Formatted with the schema of the table
+WORD_INDEX_CLAUSE = 'id IN (SELECT rowid FROM {}.geodata_fts WHERE geodata_fts MATCH ?)'
+# Narrow a query to the rows with the most trigrams in Query.grams.  Formatted with the schema of the table and a   
+# parameter for each trigram.  Args after the trigrams are the minimum trigrams in common and the row limit.   
+# The trigram parameters are padded with NULL to a multiple of TRIGRAM_PARAM_STEP so there are only a few statements
+TRIGRAM_CLAUSE = 'id IN (SELECT id FROM {}.trigram WHERE gram IN ({}) GROUP BY id HAVING count(*) >= ? ' \
+                 'ORDER BY count(*) DESC LIMIT ?)'
+TRIGRAM_MIN_SHARED = 0.5  # Fraction of the trigrams in the name that a row must have
+TRIGRAM_LIMIT = 10  # Most rows returned for a trigram query
+TRIGRAM_PARAM_STEP = 8
+# Tables with the indices read by warm_cache
+WARM_TABLES = ('geodata', 'admin')
+
 
 class GeoDB:
     """
     geoname database routines.  
     """
 
-    def __init__(self, db_path, show_message: bool, exit_on_error: bool, set_speed_pragmas: bool, db_limit: int):
+    def __init__(self, db_path, show_message: bool, exit_on_error: bool, set_speed_pragmas: bool, db_limit: int,
+                 read_only=False, immutable=False, serving=False):
         """
             geoname data database init. Open database if present otherwise raise error
         # Args:
@@ -45,6 +65,11 @@ class GeoDB:
             exit_on_error: If True, exit if significant error occurs
             set_speed_pragmas: If True, set DB pragmas for maximum performance. 
             db_limit: SQL LIMIT parameter
+            read_only: If True, open the DB read only with a connection for each thread.  Lookups can then be run   
+                from several threads.  See DB.DB
+            immutable: If True (and read_only), sqlite doesn't lock the file or check it for changes
+            serving: If True (and read_only), set the serving profile - the DB files are memory mapped and the page   
+                cache is larger.  See DB.set_serving_pragmas and warm_cache
         # Raises:
             ValueError('Cannot open database'), ValueError('Database empty or corrupt')
         """
@@ -52,9 +77,7 @@ class GeoDB:
         self.show_message = show_message
         self.exit_on_error = exit_on_error
         self.max_query_results = 50
-        self.total_time = 0
-        self.total_lookups = 0
-        self.slow_lookup = 0
+        self._local = threading.local()  # Query times for this thread
         self.match = MatchScore.MatchScore()
         self.norm = Normalize.Normalize()
         
@@ -67,7 +90,9 @@ class GeoDB:
         else:
             db_existed = False
 
-        self.db = DB.DB(db_filename=db_path, show_message=show_message, exit_on_error=exit_on_error)
+        self.read_only = read_only
+        self.db = DB.DB(db_filename=db_path, show_message=show_message, exit_on_error=exit_on_error,
+                        read_only=read_only, immutable=immutable)
         if self.db.err != '':
             self.logger.error(f"Error! cannot open database {db_path}.")
             raise ValueError('Cannot open database')
@@ -92,15 +117,111 @@ class GeoDB:
                 else:
                     raise ValueError('Database empty or corrupt')
 
-        if set_speed_pragmas:
+        if read_only:
+            self.db.set_read_pragmas()
+        elif set_speed_pragmas:
             self.db.set_speed_pragmas()
             
+        self.shards = None  # ShardSet if geodata rows are in per-country shard files
+        if db_existed:
+            self.open_shards()
+        if read_only and serving:
+            self.db.set_serving_pragmas(mmap_size=self.get_mmap_size())
+
         self.db_limit = db_limit
+        # If True, geodata and admin queries return the highest priority entries first.  See GeodataBuild.get_priority
+        self.order_by_priority = True
+        # If True, the queries in a query list are run as one UNION ALL statement and scored in one pass.   
+        # See _process_union
+        self.union_queries = True
+        self.index_tables = {}  # Dictionary of (table, index table): True if table has the index.  See has_word_index
         self.db.order_string = ''
         self.db.limit_string = f'LIMIT {self.db_limit}'
         self.place_type = ''
         self.s:GeoSearch.GeoSearch = GeoSearch.GeoSearch(geodb=self)
     
+    @property
+    def total_time(self) -> float:
+        """ Returns: total query time in seconds in this thread """
+        return getattr(self._local, 'total_time', 0)
+
+    @total_time.setter
+    def total_time(self, total_time: float):
+        self._local.total_time = total_time
+
+    @property
+    def total_lookups(self) -> int:
+        """ Returns: number of queries in this thread """
+        return getattr(self._local, 'total_lookups', 0)
+
+    @total_lookups.setter
+    def total_lookups(self, total_lookups: int):
+        self._local.total_lookups = total_lookups
+
+    @property
+    def slow_lookup(self) -> float:
+        """ Returns: total time in seconds of slow queries in this thread """
+        return getattr(self._local, 'slow_lookup', 0)
+
+    @slow_lookup.setter
+    def slow_lookup(self, slow_lookup: float):
+        self._local.slow_lookup = slow_lookup
+
+    def open_shards(self):
+        """
+        If this is a sharded DB (the version table lists the countries with shards), set self.shards so   
+        geodata queries are routed to the shard for the country   
+        """
+        self.shards = None
+        if self.db.table_exists('version') and self.db.column_exists('version', 'shards'):
+            row_list = list(self.db.query('SELECT shards FROM version WHERE shards IS NOT NULL'))
+            if row_list:
+                countries = json.loads(row_list[0][0])
+                self.shards = ShardSet.ShardSet(self.db, self.db_path, countries)
+                self.logger.info(f'Sharded database.  {len(countries)} country shards')
+
+    def get_mmap_size(self) -> int:
+        """
+        Returns: Size in bytes of the largest DB file (the main DB or a shard).  The mmap size that maps every file
+        """
+        paths = [self.db_path]
+        if self.shards:
+            paths.extend(ShardSet.get_shard_path(self.db_path, iso) for iso in self.shards.countries)
+        return max(os.path.getsize(path) for path in paths if os.path.exists(path))
+
+    def warm_cache(self) -> int:
+        """
+        Read every page of the indices on the geodata and admin tables, and the trigram index, so the first lookups   
+        after the DB is opened don't wait for disk reads.  The pages stay in the OS file cache, so this helps each   
+        connection and each process that reads the DB.  Table pages aren't read   
+        #Returns:   
+            Number of indices read   
+        """
+        start = time.time()
+        count = self._warm_schema('main')
+        if self.shards:
+            for iso in list(self.shards.countries):
+                schema = self.shards.attach(iso)
+                if schema:
+                    count += self._warm_schema(schema)
+        self.logger.info(f'Cache warmed.  {count} indices read in {time.time() - start:.2f} sec')
+        return count
+
+    def _warm_schema(self, schema: str) -> int:
+        """ Read the indices in one schema.  See warm_cache.  Returns: number of indices read """
+        sql = f"SELECT name, tbl_name FROM {schema}.sqlite_master WHERE type = 'index' AND tbl_name IN " \
+              f"({', '.join('?' * len(WARM_TABLES))})"
+        index_list = list(self.db.query(sql, WARM_TABLES))
+        for index, table in index_list:
+            column = list(self.db.query(f'PRAGMA {schema}.index_info({index})'))[0][2]
+            # A range on the first column reads the whole index.  With count(*) alone sqlite picks the smallest index
+            list(self.db.query(f'SELECT count(*) FROM {schema}.{table} INDEXED BY {index} WHERE {column} IS NOT NULL'))
+        if self.has_trigram_index(f'{schema}.geodata'):
+            # The trigram table is WITHOUT ROWID so its primary key is the whole table
+            list(self.db.query(f'SELECT count(*) FROM {schema}.trigram'))
+            return len(index_list) + 1
+        return len(index_list)
+
     def get_db_version(self) -> int:
         """
         Get schema version of database   
@@ -174,8 +295,8 @@ class GeoDB:
             place.admin1_id = row[Entry.ADM1]
             place.admin2_id = row[Entry.ADM2]
             place.city = row[Entry.NAME]
-            
-        self.s.update_names(place)
+
+        self.s.copy_names(row, place)
 
         if place.admin2_name is None:
             place.admin2_name = ''
@@ -193,7 +314,7 @@ class GeoDB:
             pass
 
     def process_query_list(self, place, result_list, select_fields, from_tbl: str, query_list: [Query],
-                           stop_on_match=False, debug=False):
+                           stop_on_match=False, debug=False, country=''):
         """
 
         Args:
@@ -201,6 +322,8 @@ class GeoDB:
             select_fields: fields to select
             from_tbl: table to select from
             query_list: .where is where clause, .args are query arguments
+            country: country ISO for the queries if known.  In a sharded DB, queries on main.geodata go to   
+                this country's shard, or to every shard if country is ''
 
         Returns: Result type. Result.NO_MATCH on failure.  Result_list contains matches
 
@@ -210,11 +333,120 @@ class GeoDB:
         if result_list is None:
             return best_score
 
+        if self.shards is not None and from_tbl == 'main.geodata':
+            table_list = self.shards.get_tables(country)
+        else:
+            table_list = [from_tbl]
+
+        if self.union_queries and len(query_list) > 1:
+            process = self._process_union
+        else:
+            process = self._process_queries
+
+        for from_tbl in table_list:
+            count = len(result_list)
+            best_score = min(best_score, process(place, result_list, select_fields, from_tbl, query_list,
+                                                 stop_on_match, debug))
+            if stop_on_match and len(result_list) > count:
+                break
+        return best_score
+
+    def _get_query_clause(self, query: Query, from_tbl: str) -> (str, tuple):
+        """
+        Get the where clause and args for a query on one table.  The word and trigram index clauses are added if   
+        the query has words or trigrams   
+        #Returns:   
+            (where, args).  (None, None) if the query needs an index the table doesn't have   
+        """
+        where = query.where
+        args = query.args
+        schema = from_tbl.rpartition('.')[0] or 'main'
+        if query.word and self.has_word_index(from_tbl):
+            where = f'{where} AND {WORD_INDEX_CLAUSE.format(schema)}'
+            args = args + (query.word,)
+        if query.grams:
+            if not self.has_trigram_index(from_tbl):
+                return None, None
+            params = math.ceil(len(query.grams) / TRIGRAM_PARAM_STEP) * TRIGRAM_PARAM_STEP
+            where = f'{where} AND {TRIGRAM_CLAUSE.format(schema, ", ".join("?" * params))}'
+            min_shared = max(2, math.ceil(len(query.grams) * TRIGRAM_MIN_SHARED))
+            args = args + tuple(query.grams) + (None,) * (params - len(query.grams)) + (min_shared, TRIGRAM_LIMIT)
+        return where, args
+
+    def _get_order(self, from_tbl: str) -> str:
+        """ Returns: ORDER clause for queries on from_tbl """
+        ranked = self.order_by_priority and from_tbl.rpartition('.')[2] in RANKED_TABLES
+        return PRIORITY_ORDER if ranked else ''
+
+    def _process_union(self, place, result_list, select_fields, from_tbl: str, query_list: [Query],
+                       stop_on_match, debug):
+        """
+        Run the queries in query_list on one table as a single UNION ALL statement.  A row returned by more than one   
+        query is only kept for the first query.  The rows are scored in one pass.  See process_query_list   
+        """
+        best_score = 9999
+        start = time.time()
+        where_list = []
+        args = ()
+        for query in query_list:
+            where, query_args = self._get_query_clause(query, from_tbl)
+            if where is not None:
+                where_list.append(where)
+                args += query_args
+        if not where_list:
+            return best_score
+
+        tagged_list = self.db.select_union(select_fields, where_list, from_tbl, args, order_str=self._get_order(from_tbl))
+        if tagged_list is None:
+            return best_score
+
+        # Drop the tag and any duplicate rows.  Keep the first query for each row
+        rows = {}
+        for tagged in tagged_list:
+            rows.setdefault(tagged[1:], tagged[0])
+        if stop_on_match and rows:
+            first = min(rows.values())
+            rows = {row: idx for row, idx in rows.items() if idx == first}
+        row_list = list(rows)
+
+        if debug:
+            for idx, where in enumerate(where_list):
+                self.logger.debug(f'{idx}) SELECT from {from_tbl} where {where}')
+                for row, row_idx in rows.items():
+                    if row_idx == idx:
+                        self.logger.debug(f'   FOUND {row}')
+
+        if row_list:
+            feat = place.feature if place else ''
+            best_score = self._assign_scores(georow_list=row_list, place=place, target_feature=feat,
+                                             fast=True, quiet=False)
+            result_list.extend(row_list)
+
+        elapsed = time.time() - start
+        self.total_time += elapsed
+        self.total_lookups += 1
+        if elapsed > .01:
+            self.slow_lookup += elapsed
+            self.logger.info(f'Slow lookup. Time={elapsed:.4f}  '
+                             f'len {len(result_list)} from {from_tbl} '
+                             f'where {where_list} val={args} ')
+        if len(result_list) > self.max_query_results:
+            self.logger.debug('MAX QUERIES HIT')
+        return best_score
+
+    def _process_queries(self, place, result_list, select_fields, from_tbl: str, query_list: [Query],
+                         stop_on_match, debug):
+        """ Run the queries in query_list on one table.  See process_query_list """
+        best_score = 9999
+        order = self._get_order(from_tbl)
         for idx, query in enumerate(query_list):
             start = time.time()
+            where, args = self._get_query_clause(query, from_tbl)
+            if where is None:
+                continue
 
-            row_list = self.db.select(select_fields, query.where, from_tbl,
-                                      query.args)
+            row_list = self.db.select(select_fields, where, from_tbl,
+                                      args, order_str=order)
             
             if len(row_list) > 0:
                 result_type = query.result
@@ -252,6 +484,38 @@ class GeoDB:
         
         return best_score
     
+    def has_word_index(self, from_tbl: str) -> bool:
+        """
+        Check if a geodata table has an FTS5 word index (geodata_fts).  DBs built without FTS5 don't have one   
+        #Args:   
+            from_tbl: table name, e.g. main.geodata or s_gb.geodata   
+        #Returns:   
+            True if table has a word index that can be used   
+        """
+        return self.db.fts5_available() and self._has_index_table(from_tbl, 'geodata_fts')
+
+    def has_trigram_index(self, from_tbl: str) -> bool:
+        """
+        Check if a geodata table has a trigram index (trigram table).  DBs built before V9 don't have one   
+        #Args:   
+            from_tbl: table name, e.g. main.geodata or s_gb.geodata   
+        #Returns:   
+            True if table has a trigram index   
+        """
+        return self._has_index_table(from_tbl, 'trigram')
+
+    def _has_index_table(self, from_tbl: str, index_table: str) -> bool:
+        """ True if from_tbl is a geodata table and its schema has index_table.  Result is cached in index_tables """
+        key = (from_tbl, index_table)
+        if key not in self.index_tables:
+            schema, _, table = from_tbl.rpartition('.')
+            found = False
+            if table == 'geodata':
+                sql = f"SELECT name FROM {schema or 'main'}.sqlite_master WHERE type = 'table' AND name = ?"
+                found = len(list(self.db.query(sql, (index_table,)))) > 0
+            self.index_tables[key] = found
+        return self.index_tables[key]
+
     def _assign_scores(self, georow_list, place, target_feature, fast=False, quiet=False) -> float:
         """
                     Assign match score to each result in list   
@@ -331,18 +595,23 @@ class GeoDB:
 
     def get_row_count(self) -> int:
         """
-        Get row count of main.geodata
+        Get row count of main.geodata (or of all shards in a sharded DB)
         :return:
         """
+        if self.shards is not None:
+            return self.shards.get_row_count()
         return self.db.get_row_count('main.geodata')
 
     def close(self):
         """
-        Close database.  Set optimize pragma
+        Close database.  Set optimize pragma unless the DB is read only
         """
-        self.db.set_optimize_pragma()
+        if not self.read_only:
+            self.db.set_optimize_pragma()
         self.logger.info('Closing Database')
         
         self.logger.info(f'Total query time = {self.total_time:.2f}\n                  Slow DB query time = {self.slow_lookup:.2f}')
-        self.db.conn.close()
+        stats = self.db.get_statement_stats()
+        self.logger.info(f'Statement cache hit rate = {stats["hit_rate"]}%  ({stats["statements"]} statements)')
+        self.db.close()
 
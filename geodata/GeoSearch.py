@@ -44,14 +44,13 @@ class GeoSearch:
         self.detailed_debug = True
         self.start = 0
         self.use_wildcards = True
+        self.trigram_lookup = False  # If True, deep_lookup tries the trigram index first if the DB has one
         self.total_lookups = 0
-        self.cache = {}
         self.place_type = ''
-        self.select_str = 'name, country, admin1_id, admin2_id, lat, lon, feature, geoid, sdx'
+        self.select_str = 'name, country, admin1_id, admin2_id, lat, lon, feature, geoid, sdx, pop, admin1_name, admin2_name, country_name'
         self.geodb = geodb
         self.match = MatchScore.MatchScore()
         self.norm = Normalize.Normalize()
-        self.place = Loc.Loc()
 
     def lookup_place(self, place: Loc) -> []:
         """
@@ -89,15 +88,26 @@ class GeoSearch:
 
     def deep_lookup(self, place: Loc) -> []:
         """
-        Do a lookup based on soundex and combinations of words
+        Do a lookup based on trigrams, or on soundex and combinations of words.  If trigram_lookup is set and   
+        the DB has a trigram index, the entries with the most trigrams in common with the name are used.   
+        If that finds nothing or only poor matches, the soundex searches are done as well   
         Args:
             place: 
 
         Returns: best score found
 
         """
-        # Get more results unless we have a high score
         row_list = []
+        trigram_score = 999
+        if self.trigram_lookup:
+            trigram_score = self.search_trigrams(row_list, place.city, place, 'main.geodata')
+            if len(row_list) > 0:
+                place.georow_list.extend(row_list)
+                if trigram_score < MatchScore.Score.POOR_CUTOFF:
+                    return trigram_score
+                row_list = []
+
+        # Get more results unless we have a high score
         best_score = self.search_for_combinations(row_list, place.city, place, 'main.geodata')
         if len(row_list) > 0:
             place.georow_list.extend(row_list)
@@ -107,7 +117,7 @@ class GeoSearch:
             best_score = self.search_each_term(row_list, place.city, place, 'main.geodata')
             if len(row_list) > 0:
                 place.georow_list.extend(row_list)
-        return best_score
+        return min(best_score, trigram_score)
 
     def get_admin2_name(self, admin1_id, admin2_id, iso) -> str:
         """
@@ -158,14 +168,12 @@ class GeoSearch:
              name or ''
         """
         row_list = []
-        key = f'{admin1_id}_{admin2_id}_{iso}_{feature}'
         if len(admin1_id + admin2_id + iso) == 0:
             return ''
 
         self._search(georow_list=row_list, place=None, name='', admin1_id=admin1_id, admin2_id=admin2_id, iso=iso, feature=feature, sdx=sdx)
 
         if len(row_list) > 0:
-            self.cache[key] = row_list[0][Entry.NAME]
             return row_list[0][Entry.NAME]
         else:
             return ''
@@ -253,9 +261,9 @@ class GeoSearch:
             admin1_id
         """
         row_list = []
-        self.place.clear()
-        self.place.admin1_name = admin1_name
-        self.place.country_iso = country_iso
+        place = Loc.Loc()
+        place.admin1_name = admin1_name
+        place.country_iso = country_iso
         admin1_name = self.norm.admin1_normalize(admin1_name, country_iso)
         self.logger.debug(f'GET ADMIN1 ID from [{admin1_name}]')
         self._search(georow_list=row_list, place=None, name=admin1_name, admin1_id='', admin2_id='', iso=country_iso, feature='ADM1', sdx='')
@@ -263,7 +271,7 @@ class GeoSearch:
         if len(row_list) == 0:
             # Nothing found.  Try deeper search
             self.logger.debug(f'not found - search for combo [{admin1_name}]')
-            self.search_for_combinations(row_list=row_list, target=admin1_name, place=self.place, table='main.admin')
+            self.search_for_combinations(row_list=row_list, target=admin1_name, place=place, table='main.admin')
         else:
             self.logger.debug(f'found {row_list}')
             pass
@@ -286,26 +294,26 @@ class GeoSearch:
             Country ISO or ''.     
         """
         row_list = []
-        self.place.clear()
-        self.place.country_name = country_name
+        place = Loc.Loc()
+        place.country_name = country_name
 
         country_name, modified = self.norm.country_normalize(country_name)
         if len(country_name) == 0:
             return ''
         sdx = get_soundex(country_name) + '*'
 
-        best = self._search(georow_list=row_list, place=self.place, name=country_name, admin1_id='', admin2_id='', iso='', feature='ADM0', sdx='')
+        best = self._search(georow_list=row_list, place=place, name=country_name, admin1_id='', admin2_id='', iso='', feature='ADM0', sdx='')
 
-        if self.place.result_type == Result.STRONG_MATCH:
+        if place.result_type == Result.STRONG_MATCH:
             iso = row_list[0][Entry.ISO]
-            self.place.country_name = row_list[0][Entry.NAME]
+            place.country_name = row_list[0][Entry.NAME]
         else:
             # Lookup by soundex
-            best = self._search(georow_list=row_list, place=self.place, name='', admin1_id='', admin2_id='', iso='', feature='ADM0',
+            best = self._search(georow_list=row_list, place=place, name='', admin1_id='', admin2_id='', iso='', feature='ADM0',
                                 sdx=sdx)
-            if self.place.result_type == Result.STRONG_MATCH:
+            if place.result_type == Result.STRONG_MATCH:
                 iso = row_list[0][Entry.ISO]
-                self.place.country_name = row_list[0][Entry.NAME]
+                place.country_name = row_list[0][Entry.NAME]
             else:
                 iso = ''
         return iso
@@ -319,6 +327,25 @@ class GeoSearch:
                 place.admin2_name = self.get_admin2_name(place.admin1_id, place.admin2_id, place.country_iso)
         place.country_name = str(self.get_country_name(place.country_iso))
 
+    def copy_names(self, row, place):
+        """
+        Fill in the admin1, admin2 and country names for a DB row the same way update_names() does, but from the   
+        names stored on the row at build time (see GeodataBuild.set_admin_names) instead of follow-up queries.   
+        Admin1 and admin2 names already set in place are kept.  The country name is always set from the row.   
+        Rows without stored names (DBs built before they were added) fall back to update_names()   
+        #Args:   
+            row: georow from geoname database   
+            place: Loc instance.  Its admin1_id, admin2_id and country_iso must be set from the row   
+        """
+        if len(row) > Entry.COUNTRY_NAME and row[Entry.COUNTRY_NAME] is not None:
+            if place.admin1_name == '':
+                place.admin1_name = row[Entry.ADM1_NAME]
+            if place.admin2_name == '':
+                place.admin2_name = row[Entry.ADM2_NAME]
+            place.country_name = row[Entry.COUNTRY_NAME]
+        else:
+            self.update_names(place)
+
     def _search(self, georow_list, place, name, admin1_id, admin2_id, iso, feature, sdx=''):
         """
 
@@ -343,10 +370,12 @@ class GeoSearch:
         where_clauses = ["name", "country", "admin1_id", "admin2_id", "feature"]
         terms = [name, iso, admin1_id, admin2_id, feature]
         ql.add_clauses(where_clauses=where_clauses, terms=terms)  # add 
-        query_list.append(Query(where=ql.where, args=ql.args, result=Result.PARTIAL_MATCH))
+        query_list.append(Query(where=ql.where, args=ql.args, result=Result.PARTIAL_MATCH, word=ql.word))
 
         ql.clear()
-        if len(sdx) > 0:
+        # Soundex of a name with a leading wildcard also starts with a wildcard.  sdx_idx can't be used for that,
+        # so it would scan the whole table
+        if len(sdx) > 0 and sdx[0] != '*':
             where_clauses = ["country", "feature", "sdx"]
             terms = [iso, feature, sdx]
             ql.add_clauses(where_clauses=where_clauses, terms=terms)  # add 
@@ -356,7 +385,7 @@ class GeoSearch:
         self.add_feature_query(query_list, name, iso)
 
         best = self.geodb.process_query_list(result_list=georow_list, place=place, select_fields=self.select_str, from_tbl=ql.table,
-                                             query_list=query_list, debug=True)
+                                             query_list=query_list, debug=True, country=iso)
         return best
 
     def search_each_term(self, row_list, target, place, table):
@@ -407,7 +436,7 @@ class GeoSearch:
                     query_list.append(Query(where=where, args=args, result=Result.SOUNDEX_MATCH))
 
             best = self.geodb.process_query_list(result_list=row_list, place=place, select_fields=self.select_str,
-                                                 from_tbl=table, query_list=query_list, debug=True)
+                                                 from_tbl=table, query_list=query_list, debug=True, country=place.country_iso)
         return best
 
     def search_for_combinations(self, row_list, target, place, table):
@@ -463,11 +492,37 @@ class GeoSearch:
                                                 result=Result.SOUNDEX_MATCH))
 
             best = self.geodb.process_query_list(result_list=row_list, place=place, select_fields=self.select_str,
-                                                 from_tbl=table, query_list=query_list, debug=True)
+                                                 from_tbl=table, query_list=query_list, debug=True, country=place.country_iso)
 
             self.logger.debug(f'search_for_combos ')
         return best
 
+    def search_trigrams(self, row_list, target, place, table):
+        """
+        Search for the entries with the most trigrams in common with target.  A misspelled name keeps most of   
+        its trigrams, e.g. carddif has 5 of the 8 trigrams in cardiff.  The number of entries is bounded by   
+        GeoDB.TRIGRAM_LIMIT.  Nothing is found if the DB doesn't have a trigram index   
+        Args:
+            row_list: 
+            target: 
+            place: 
+            table: 
+
+        Returns: best score found
+        """
+        best = 999
+        grams = tuple(get_trigram_keys(target, place.country_iso))
+        if len(grams) > 0 and len(place.country_iso) > 0:
+            self.logger.debug(f'TRIGRAM SEARCH {grams}')
+            if place.feature:
+                query = Query(where='country = ? AND feature = ?', args=(place.country_iso, place.feature,),
+                              result=Result.SOUNDEX_MATCH, grams=grams)
+            else:
+                query = Query(where='country = ?', args=(place.country_iso,), result=Result.SOUNDEX_MATCH, grams=grams)
+            best = self.geodb.process_query_list(result_list=row_list, place=place, select_fields=self.select_str,
+                                                 from_tbl=table, query_list=[query], debug=True, country=place.country_iso)
+        return best
+
     def lookup_geoid(self, georow_list, geoid, place: Loc, admin=False) -> None:
         """
         Search by GEOID 
@@ -560,12 +615,7 @@ class GeoSearch:
             place.admin2_id = row[Entry.ADM2]
             place.city = row[Entry.NAME]
 
-        if place.admin1_id != '':
-            if place.admin1_name == '':
-                place.admin1_name = self.get_admin1_name(place.admin1_id, place.country_iso)
-            if place.admin2_name == '':
-                place.admin2_name = self.get_admin2_name(place.admin1_id, place.admin2_id, place.country_iso)
-        place.country_name = str(self.get_country_name(row[Entry.ISO]))
+        self.copy_names(row, place)
 
         if place.admin2_name is None:
             place.admin2_name = ''
@@ -687,6 +737,19 @@ def get_soundex(text) -> str:
     return res.lower()
 
 
+def get_trigram_keys(text, iso) -> [str]:
+    """
+    Returns: Trigram index keys for text.  Each word is padded with two spaces in front and one after so   
+    the start of a word has its own trigrams.  A key is the country ISO followed by the trigram, so   
+    the keys for a country are together in the index
+    """
+    grams = set()
+    for word in text.split():
+        word = f'  {word} '
+        grams.update(word[idx:idx + 3] for idx in range(len(word) - 2))
+    return sorted(iso + gram for gram in grams)
+
+
 @functools.lru_cache(maxsize=CACHE_SIZE)
 def get_word_soundex(word):
     if len(word) > 1:
@@ -44,8 +44,12 @@ class Entry:
     ID = 7
     SDX = 8
     PREFIX = 8  # Note - item 8 is overloaded:  Soundex in DB and Prefix in result
-    SCORE = 9
-    MAX = 9
+    POP = 9  # Population
+    ADM1_NAME = 10  # Names resolved at build time.  Only present in lookup results
+    ADM2_NAME = 11
+    COUNTRY_NAME = 12
+    SCORE = 13
+    MAX = 10  # Number of fields in a row built for insert
 
 
 class Result:
@@ -66,7 +70,11 @@ class Result:
 successful_match = [Result.STRONG_MATCH, Result.PARTIAL_MATCH, Result.WILDCARD_MATCH, Result.WORD_MATCH,
                     Result.SOUNDEX_MATCH, Result.MULTIPLE_MATCHES]
 
-Query = collections.namedtuple('Query', 'where args result')
+# word is an optional FTS5 MATCH string for the name.  If the table has a word index, it is added to the where clause.   
+# grams is an optional tuple of trigram keys (see GeoSearch.get_trigram_keys).  The query is limited to the rows   
+# with the most trigrams in common.  It is skipped if the table has no trigram index
+Query = collections.namedtuple('Query', 'where args result word grams')
+Query.__new__.__defaults__ = (None, None)
 
 
 class RegexList():
@@ -38,10 +38,26 @@ Provides a place lookup gazeteer based on files from geonames.org.
 import collections
 import copy
 import logging
+import time
 from operator import itemgetter
 
 from geodata import GeoUtil, GeodataBuild, Loc, MatchScore, GeoSearch
 
+# Lookup tiers in find_matches, in the order they are run.  The standard lookup is always run.   
+# deep - trigram or soundex lookup of the city (if the standard lookup score is POOR_CUTOFF or worse).   
+# admin2 - the second token as the city.  admin2_deep - deep lookup of the second token (if admin2 found entries   
+# and its score is POOR_CUTOFF or worse).  rescore - the full MatchScore scoring of all the entries found
+TIERS = ['standard', 'deep', 'admin2', 'admin2_deep', 'rescore']
+# A tier is also skipped if the best score so far is below its threshold, so once there is a confident match   
+# the remaining tiers are skipped.  If rescore is skipped the entries keep their fast scores.   
+# The defaults of 0 run every tier the same as the lookup did before tiers.  Use math.inf to never run a tier.   
+# See Geodata.tier_thresholds.   
+# Scores here are from MatchScore.fast_score (100 - fuzzy ratio of the titles).  An exact match is about 15-20
+CONFIDENT_SCORE = 20
+# Same as MatchScore.Score.POOR_CUTOFF.  MatchScore can't be used here since it imports this module
+POOR_CUTOFF = 45
+TIER_THRESHOLDS = {'deep': 0, 'admin2': 0, 'admin2_deep': 0, 'rescore': 0}
+
 
 class Geodata:
     """
@@ -51,7 +67,7 @@ Provide a place lookup gazeteer based on files from geonames.org
 
     def __init__(self, directory_name: str, display_progress,
                  show_message: bool, exit_on_error: bool, languages_list_dct, feature_code_list_dct,
-                 supported_countries_dct, volume=''):
+                 supported_countries_dct, volume='', workers=1, sharded=False):
         """
             Init
 
@@ -63,18 +79,22 @@ Provide a place lookup gazeteer based on files from geonames.org
             languages_list_dct: Dictionary of ISO-2 languages to import from AlternateNamesV2.txt   
             feature_code_list_dct: Dictionary of Geoname Feature codes to import into DB   
             supported_countries_dct: Dictionary of ISO-2 Country codes to import into DB   
+            workers: Number of processes to use for parsing geonames files when building the DB   
+            sharded: If True, a new DB is built with the geodata rows for each country in a separate shard file   
         """
         self.logger = logging.getLogger(__name__)
         self.display_progress = display_progress
-        self.save_place: Loc = Loc.Loc()
         self.miss_diag_file = None
         self.distance_cutoff = 0.6  # Value to determine if two lat/longs are similar based on Rectilinear Distance
+        self.tier_thresholds = dict(TIER_THRESHOLDS)  # Score thresholds for the lookup tiers in find_matches
+        self.tier_stats = {}  # Runs, skips, hits and time for each lookup tier.  See get_tier_stats
+        self.clear_tier_stats()
         self.geo_build = GeodataBuild.GeodataBuild(str(directory_name), display_progress=self.display_progress,
                                                    show_message=show_message, exit_on_error=exit_on_error,
                                                    languages_list_dct=languages_list_dct,
                                                    feature_code_list_dct=feature_code_list_dct,
                                                    supported_countries_dct=supported_countries_dct,
-                                                   volume=volume)
+                                                   volume=volume, workers=workers, sharded=sharded)
 
     def find_matches(self, location: str, place: Loc) :
         """
@@ -107,7 +127,7 @@ Provide a place lookup gazeteer based on files from geonames.org
         # Adm1=[{place.admin1_name}] Pref=[{place.prefix}] Cntry=[{place.country_name}] iso=[{place.country_iso}]  Type={place.place_type} ')
 
         # Save a shallow copy of place so we can restore fields
-        self.save_place = copy.copy(place)
+        save_place = copy.copy(place)
 
         # After parsing, last token is either country or underscore. 
         # Second to last is either Admin1 or underscore
@@ -115,6 +135,7 @@ Provide a place lookup gazeteer based on files from geonames.org
         # If >3 tokens:  token[1] is placed in Admin2 and appended to Prefix
 
         # 1) Try lookup based on standard parsing: lookup city, county, state/province, or country as parsed
+        # Then run the more expensive tiers.  See TIER_THRESHOLDS
         self.logger.debug(f'  1) Standard, based on parsing.  pref [{place.prefix}] city [{place.city}]'
                           f' sdx={GeoSearch.get_soundex(place.city)} '
                           f'feat={place.feature} typ=[{place.place_type}]')
@@ -122,45 +143,31 @@ Provide a place lookup gazeteer based on files from geonames.org
         if place.place_type != Loc.PlaceType.COUNTRY and place.place_type != Loc.PlaceType.ADMIN1 \
                 and place.place_type != Loc.PlaceType.ADMIN1:
             self.logger.debug('find std place  - not ADM*  ')
-            best_score = self.geo_build.geodb.s.lookup_place(place=place)
+            search = self.geo_build.geodb.s
+            best_score = self._run_tier('standard', place, search.lookup_place, best_score, result_list)
             self.logger.debug(f'std: best={best_score}')
 
-            if place.georow_list:
-                result_list.extend(place.georow_list)
-            # self.logger.debug(result_list)
-            
-            if best_score >= MatchScore.Score.POOR_CUTOFF:
+            if best_score >= POOR_CUTOFF:
                 # No good matches found.  Try a deep search on soundex of combinations of terms
-                self.logger.debug('--- DEEP SEARCH city ---')
-                best_score = self.geo_build.geodb.s.deep_lookup(place=place)
-                # self.logger.debug(place.georow_list)
-                if place.georow_list:
-                    result_list.extend(place.georow_list)
+                best_score = min(best_score, self._run_tier('deep', place, search.deep_lookup, best_score, result_list))
 
             # Restore fields
-            self._restore_fields(place, self.save_place)
+            self._restore_fields(place, save_place)
 
             # 2) Try second token (Admin2) as a city 
             if place.admin2_name != '':
                 self.logger.debug(f'try 2nd token as city')
                 place.georow_list.clear()
-                best_score = self._find_type_as_city(place, Loc.PlaceType.ADMIN2)
-                self.logger.debug(f'2nd token best={best_score}')
-
-                if place.georow_list:
-                    result_list.extend(place.georow_list)
-                    # self.logger.debug(result_list)
-
-                    # See if we found any good scoring matches
-                    if best_score >= MatchScore.Score.POOR_CUTOFF:
-                        # No good matches found.  Try a deep search on soundex of combinations of terms
-                        self.logger.debug('--- DEEP SEARCH city ---')
-                        best_score = self.geo_build.geodb.s.deep_lookup(place=place)
-                        # self.logger.debug(place.georow_list)
-                        if place.georow_list:
-                            result_list.extend(place.georow_list)
+                count = len(result_list)
+                score = self._run_tier('admin2', place, lambda pl: self._find_type_as_city(pl, Loc.PlaceType.ADMIN2),
+                                       best_score, result_list)
+                self.logger.debug(f'2nd token best={score}')
+                best_score = min(best_score, score)
+                if len(result_list) > count and score >= POOR_CUTOFF:
+                    best_score = min(best_score, self._run_tier('admin2_deep', place, search.deep_lookup, best_score,
+                                                                result_list))
                             
-                self._restore_fields(place, self.save_place)
+                self._restore_fields(place, save_place)
 
             #  Move result_list into place georow list
             place.georow_list.clear()
@@ -171,7 +178,8 @@ Provide a place lookup gazeteer based on files from geonames.org
             return place.result_type
 
         if len(place.georow_list) > 0:
-            best_score = self.geo_build.geodb._assign_scores(place.georow_list, place, '', fast=False, quiet=True)
+            self._run_tier('rescore', place, lambda pl: self.geo_build.geodb._assign_scores(pl.georow_list, pl, '', fast=False,
+                                                                                           quiet=True), best_score)
 
             # self.logger.debug('process results')
             self.process_results(place=place, flags=flags)
@@ -254,6 +262,52 @@ Provide a place lookup gazeteer based on files from geonames.org
             place.result_type = GeoUtil.Result.NO_MATCH
             # self.logger.debug(f'NOT FOUND geoid {geoid}')
 
+    def _run_tier(self, tier: str, place: Loc, lookup, best_score: float, result_list=None) -> float:
+        """
+        Run a lookup tier unless the best score so far is below the tier's threshold   
+        #Args:   
+            tier: tier name.  See TIERS   
+            place: Loc instance   
+            lookup: function(place) that does the lookup, updates place.georow_list and returns the best score   
+            best_score: best score so far   
+            result_list: place.georow_list is appended to this unless it is None   
+        #Returns:   
+            best score from the tier's lookup.  9999 if the tier was skipped   
+        """
+        stats = self.tier_stats[tier]
+        if best_score < self.tier_thresholds.get(tier, 0):
+            stats['skips'] += 1
+            return 9999
+        start = time.perf_counter()
+        score = lookup(place)
+        stats['time'] += time.perf_counter() - start
+        stats['runs'] += 1
+        if place.georow_list:
+            if result_list is not None:
+                result_list.extend(place.georow_list)
+            if score < CONFIDENT_SCORE:
+                stats['hits'] += 1
+        return score
+
+    def clear_tier_stats(self):
+        """ Clear the lookup tier statistics """
+        self.tier_stats = {tier: {'runs': 0, 'skips': 0, 'hits': 0, 'time': 0.0} for tier in TIERS}
+
+    def get_tier_stats(self) -> dict:
+        """
+        Get statistics for the lookup tiers in find_matches.  Used to tune tier_thresholds for latency vs recall   
+        #Returns:   
+            Dictionary by tier name of runs, skips, hits (runs that found a match better than CONFIDENT_SCORE),   
+            hit_rate (percent of runs that were hits) and msec (mean time per run)   
+        """
+        res = {}
+        for tier, stats in self.tier_stats.items():
+            runs = stats['runs']
+            res[tier] = {'runs': runs, 'skips': stats['skips'], 'hits': stats['hits'],
+                         'hit_rate': round(stats['hits'] * 100 / runs, 1) if runs else 0.0,
+                         'msec': round(stats['time'] * 1000 / runs, 2) if runs else 0.0}
+        return res
+
     def _find_type_as_city(self, place: Loc, typ)-> int:
         """
             Do a lookup using the field specifed by typ as a city name.  E.g. if typ is PlaceType.ADMIN1 then   
@@ -395,7 +449,8 @@ Provide a place lookup gazeteer based on files from geonames.org
             return
         try:
             rows_sorted_by_latlon = sorted(place.georow_list, key=itemgetter(GeoUtil.Entry.LON, GeoUtil.Entry.LAT, GeoUtil.Entry.SCORE))
-        except IndexError as e:
+        except (IndexError, TypeError) as e:
+            # TypeError if an entry has no lat/lon
             rows_sorted_by_latlon = place.georow_list
             
         place.georow_list.clear()
@@ -438,8 +493,8 @@ Provide a place lookup gazeteer based on files from geonames.org
                     place.georow_list[row_idx] = geo_row
                     self.logger.debug(f'Better score {geo_row[GeoUtil.Entry.SCORE]} < '
                                       f'{old_row[GeoUtil.Entry.SCORE]} {geo_row[GeoUtil.Entry.NAME]}')
-            elif self.distance(float(prev_geo_row[GeoUtil.Entry.LAT]), float(prev_geo_row[GeoUtil.Entry.LON]),
-                               float(geo_row[GeoUtil.Entry.LAT]), float(geo_row[GeoUtil.Entry.LON])) > self.distance_cutoff:
+            elif self.distance(prev_geo_row[GeoUtil.Entry.LAT], prev_geo_row[GeoUtil.Entry.LON],
+                               geo_row[GeoUtil.Entry.LAT], geo_row[GeoUtil.Entry.LON]) > self.distance_cutoff:
                 # Add this item to georow list since Lat/lon is different from previous item.  Also add its idx to geoid dict 
                 place.georow_list.append(geo_row)
                 geoid_dict[geo_row[GeoUtil.Entry.ID]] = georow_idx
@@ -541,17 +596,73 @@ Provide a place lookup gazeteer based on files from geonames.org
 
         return ResultFlags(limited=limited_flag, filtered=date_filtered)
 
-    def open(self, repair_database: bool, query_limit: int):
+    def open(self, repair_database: bool, query_limit: int, staged_rebuild=False, read_only=False, immutable=False,
+             serving=False, warm_cache=False):
         """
         Open geodb.  Create DB if needed   
         #Args:  
             repair_database: If True, create DB if missing or damaged. 
             query_limit:  SQL query limit 
+            staged_rebuild: If True, build a new DB in a staging file and swap it into place rather than   
+                deleting the current DB.  See rebuild()   
+            read_only: If True, open an existing DB read only.  find_best_match() can then be called from several   
+                threads and other processes can read the DB at the same time.  The DB isn't built or repaired   
+            immutable: If True (and read_only), sqlite doesn't lock the DB file or check it for changes.  Don't use   
+                if another process runs apply_updates() on the DB   
+            serving: If True, open the DB read only with the serving profile for a read heavy service - the DB is   
+                memory mapped, the page cache is larger and the DB can't be changed   
+            warm_cache: If True (and read_only or serving), read the index pages at open so the first lookups after   
+                a deploy aren't slowed by disk reads   
         #Returns:  
             True if error  
         """
         self._progress("Reading Geoname files...", 70)
-        return self.geo_build.open_geodb(repair_database=repair_database, query_limit=query_limit)
+        return self.geo_build.open_geodb(repair_database=repair_database, query_limit=query_limit,
+                                         staged_rebuild=staged_rebuild, read_only=read_only, immutable=immutable,
+                                         serving=serving, warm_cache=warm_cache)
+
+    def rebuild(self, query_limit: int) -> bool:
+        """
+        Rebuild the DB from the geonames.org files without taking the current DB offline.   
+        The new DB is built in a staging file, validated, and then swapped into place.  This instance   
+        switches to the new DB.  Other processes can call reopen_if_changed() to switch.   
+        #Args:  
+            query_limit:  SQL query limit 
+        #Returns:  
+            True if error.  The current DB is kept on error   
+        """
+        return self.geo_build.rebuild_geodb(query_limit=query_limit)
+
+    def apply_updates(self) -> bool:
+        """
+        Apply the geonames.org daily modification and deletion files in the geoname directory to the DB.
+        Only files dated after the last update applied are read.  You must call open() before this.
+        #Returns:
+            True if error
+        """
+        return self.geo_build.apply_updates()
+
+    def refresh_shard(self, iso: str) -> bool:
+        """
+        Rebuild the shard for one country in a sharded DB from the geonames.org file for the country, e.g. GB.txt.   
+        You must call open() before this.
+        #Args:
+            iso: country ISO code
+        #Returns:
+            True if error
+        """
+        return self.geo_build.refresh_shard(iso)
+
+    def reopen_if_changed(self) -> bool:
+        """
+        If geodata.db was replaced by a rebuild in another process, close the DB and open the new file   
+        #Returns:  
+            True if the DB was reopened   
+        """
+        if self.geo_build.db_file_changed():
+            self.logger.info('Database file changed.  Reopening')
+            return not self.geo_build.reopen_geodb()
+        return False
 
     def _progress(self, msg: str, percent: int):
         if self.display_progress is not None:
@@ -670,6 +781,9 @@ Provide a place lookup gazeteer based on files from geonames.org
         Returns: None   
 
         """
+        for tier, stats in self.get_tier_stats().items():
+            self.logger.info(f'Lookup tier {tier}: runs={stats["runs"]} skips={stats["skips"]} '
+                             f'hit rate={stats["hit_rate"]}% msec={stats["msec"]}')
         if self.geo_build:
             self.geo_build.geodb.close()
 
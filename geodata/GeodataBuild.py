@@ -16,19 +16,185 @@
 #   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
 """ Build database for geonames.org data """
 import csv
+import io
+import json
 import logging
+import multiprocessing
 import os
+import re
+import shutil
 import sys
 import time
 from collections import namedtuple
 from tkinter import messagebox
 from typing import Dict
 
-from geodata import GeoUtil, Loc, Country, GeoSearch, Normalize, CachedDictionary, AlternateNames, GeoDB
+from geodata import GeoUtil, Loc, Country, GeoSearch, Normalize, CachedDictionary, AlternateNames, GeoDB, GeorowStore, \
+    BuildReport, FileReader, DB, ShardSet, BuildManifest, Geodata
 from geodata.GeoUtil import Entry
 
 DB_REBUILDING = -1
 
+# geonames.org place files.  Each file found in the directory is loaded
+GEONAME_FILES = ['allCountries.txt', 'ca.txt', 'gb.txt', 'de.txt', 'fr.txt', 'nl.txt']
+
+# geonames.org daily update files, e.g. modifications-2019-11-23.txt.  Files for a date are applied in this order
+UPDATE_FILE_TYPES = ['modifications', 'deletes', 'alternateNamesModifications', 'alternateNamesDeletes']
+UPDATE_FILE_PATTERN = re.compile(r'^(' + '|'.join(UPDATE_FILE_TYPES) + r')-(\d{4}-\d{2}-\d{2})\.txt$')
+
+# Schema V6.  Lat/lon are REAL and geoid is INTEGER (non numeric geoids such as 'HIST' are stored as text).   
+# Text uses the default BINARY collation since names, soundex and country are stored lower case and feature codes upper case.   
+# The UNIQUE constraints make INSERT OR IGNORE skip duplicate entries.  Their indices also serve lookups by geoid.   
+# The names for a row's admin1_id, admin2_id and country are filled in by set_admin_names() at the end of the build.   
+# Priority ranks entries by feature and population (see get_priority) so queries return the most important entries first.   
+# rev_name is the name reversed so a leading wildcard search (e.g. *minster) is a range on rev_name_idx (see QueryList)
+TABLE_SQL = {
+    # name, country, admin1_id, admin2_id, lat, lon, feature, geoid, sdx, admin1_name, admin2_name, country_name, pop, priority, rev_name
+    'geodata': """CREATE TABLE IF NOT EXISTS geodata    (
+                id           integer primary key autoincrement not null,
+                name     text,
+                country     text,
+                admin1_id     text,
+                admin2_id text,
+                lat      real,
+                lon       real,
+                feature      text,
+                geoid      integer,
+                sdx     text,
+                admin1_name     text,
+                admin2_name     text,
+                country_name     text,
+                pop     integer,
+                priority     integer,
+                rev_name     text,
+                UNIQUE(geoid, name, feature)
+                                    );""",
+
+    # name, country, admin1_id, admin2_id, lat, lon, feature, geoid, sdx, admin1_name, admin2_name, country_name, pop, priority, rev_name
+    'admin': """CREATE TABLE IF NOT EXISTS admin    (
+                id           integer primary key autoincrement not null,
+                name     text,
+                country     text,
+                admin1_id     text,
+                admin2_id text,
+                lat      real,
+                lon       real,
+                feature      text,
+                geoid      integer,
+                sdx     text,
+                admin1_name     text,
+                admin2_name     text,
+                country_name     text,
+                pop     integer,
+                priority     integer,
+                rev_name     text,
+                UNIQUE(geoid, name, feature)
+                                    );""",
+
+    # version, date of last geonames.org update file applied
+    'version': """CREATE TABLE IF NOT EXISTS version    (
+                id           integer primary key autoincrement not null,
+                version     integer,
+                update_date     text,
+                checkpoint     text
+                                    );""",
+
+    # name, lang, geoid
+    'altname': """CREATE TABLE IF NOT EXISTS altname    (
+                id           integer primary key autoincrement not null,
+                name     text,
+                lang     text,
+                geoid      integer,
+                sdx     text,
+                alt_id     integer,
+                UNIQUE(geoid, name, lang)
+                                    );""",
+
+    # Input files and filter settings used to build the DB.  See BuildManifest
+    'manifest': """CREATE TABLE IF NOT EXISTS manifest    (
+                id           integer primary key autoincrement not null,
+                item     text,
+                hash     text,
+                size     integer,
+                mtime     integer,
+                UNIQUE(item)
+                                    );"""
+    }
+
+# Feature codes of the entries that admin names are looked up from
+ADMIN_FEATURES = {'ADM0', 'ADM1', 'ADM2'}
+# Columns with the names for a row's admin1_id, admin2_id and country
+NAME_COLUMNS = ['admin1_name', 'admin2_name', 'country_name']
+# Which of a row's IDs its names are for.  Country rows have no admin names and ADM1 rows don't use admin2_id
+NAME_KIND_SQL = "CASE feature WHEN 'ADM0' THEN 0 WHEN 'ADM1' THEN 1 ELSE 2 END"
+
+# Indices for geodata table.  These are also created in each shard of a sharded DB.   
+# Priority follows the name and country in name_idx so an exact name lookup reads its rows in ORDER BY priority order
+GEODATA_INDEX_SQL = [
+    'CREATE INDEX IF NOT EXISTS name_idx ON geodata(name  , country, priority, admin1_id  )',
+    'CREATE INDEX IF NOT EXISTS name_idx2 ON geodata(name  , country, feature  )',
+    'CREATE INDEX IF NOT EXISTS admin1_idx ON geodata(admin1_id , country, feature  )',
+    'CREATE INDEX IF NOT EXISTS sdx_idx ON geodata(sdx  , country, feature   )',
+    'CREATE INDEX IF NOT EXISTS admin2_idx ON geodata(admin1_id  , feature  , admin2_id )',
+    'CREATE INDEX IF NOT EXISTS rev_name_idx ON geodata(rev_name  , country  )'
+    ]
+
+# Indices for admin table
+ADMIN_INDEX_SQL = [
+    'CREATE INDEX IF NOT EXISTS adm_name_idx ON admin(name  , country, priority  )',
+    'CREATE INDEX IF NOT EXISTS adm_admin1_idx ON admin(admin1_id  , feature  )',
+    'CREATE INDEX IF NOT EXISTS adm_country_idx ON admin(country  , feature  )',
+    'CREATE INDEX IF NOT EXISTS adm_sdx_idx ON admin(sdx  )',
+    'CREATE INDEX IF NOT EXISTS adm_rev_name_idx ON admin(rev_name  , country  )'
+    ]
+
+MAIN_INDEX_SQL = GEODATA_INDEX_SQL + ADMIN_INDEX_SQL
+
+# FTS5 word index of geodata names (including alternate names and aliases) for wildcard searches.  It is an   
+# external content table so names aren't stored twice.  detail=none keeps it small since only token and   
+# token prefix queries are used (see QueryList.get_word_match)
+WORD_INDEX_SQL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS {schema}.geodata_fts USING fts5(name, content='geodata', content_rowid='id', "
+    "detail='none', prefix='3')",
+    "INSERT INTO {schema}.geodata_fts(geodata_fts) VALUES('rebuild')"
+    ]
+
+# Triggers to keep the word index in step with changes to geodata (updates and redoing alternate names)
+WORD_TRIGGER_SQL = [
+    '''CREATE TRIGGER IF NOT EXISTS {schema}.geodata_fts_insert AFTER INSERT ON geodata BEGIN
+        INSERT INTO geodata_fts(rowid, name) VALUES (new.id, new.name); END''',
+    '''CREATE TRIGGER IF NOT EXISTS {schema}.geodata_fts_delete AFTER DELETE ON geodata BEGIN
+        INSERT INTO geodata_fts(geodata_fts, rowid, name) VALUES ('delete', old.id, old.name); END''',
+    '''CREATE TRIGGER IF NOT EXISTS {schema}.geodata_fts_update AFTER UPDATE OF name ON geodata BEGIN
+        INSERT INTO geodata_fts(geodata_fts, rowid, name) VALUES ('delete', old.id, old.name);
+        INSERT INTO geodata_fts(rowid, name) VALUES (new.id, new.name); END'''
+    ]
+
+# Trigram index of geodata names for misspelled names (see GeoSearch.search_trigrams).  Each key is the country   
+# ISO and a trigram (see GeoSearch.get_trigram_keys), so a lookup only reads the keys for the country
+TRIGRAM_SQL = 'CREATE TABLE IF NOT EXISTS {schema}.trigram (gram text, id integer, PRIMARY KEY(gram, id)) WITHOUT ROWID'
+TRIGRAM_BATCH = 100000  # Trigram keys per executemany
+
+# Triggers to log changes to geodata in trigram_pending.  Trigrams can't be computed in a trigger, so   
+# update_trigrams() applies the logged changes to the trigram index after updates and redoing alternate names
+TRIGRAM_TRIGGER_SQL = [
+    'CREATE TABLE IF NOT EXISTS {schema}.trigram_pending (id integer, name text, country text, added integer)',
+    '''CREATE TRIGGER IF NOT EXISTS {schema}.trigram_insert AFTER INSERT ON geodata BEGIN
+        INSERT INTO trigram_pending VALUES (new.id, new.name, new.country, 1); END''',
+    '''CREATE TRIGGER IF NOT EXISTS {schema}.trigram_delete AFTER DELETE ON geodata BEGIN
+        INSERT INTO trigram_pending VALUES (old.id, old.name, old.country, 0); END''',
+    '''CREATE TRIGGER IF NOT EXISTS {schema}.trigram_update AFTER UPDATE OF name, country ON geodata BEGIN
+        INSERT INTO trigram_pending VALUES (old.id, old.name, old.country, 0);
+        INSERT INTO trigram_pending VALUES (new.id, new.name, new.country, 1); END'''
+    ]
+
+ALT_INDEX_SQL = ['CREATE INDEX IF NOT EXISTS alt_sdx_idx ON altname(sdx  )']
+
+# Columns in geonames.org allCountries.txt and per country files
+Geofile_row = namedtuple('Geofile_row',
+                         'id name name_asc alt lat lon feat_class feat_code iso iso2 admin1_id'
+                         ' admin2_id admin3_id admin4_id pop elev dem timezone mod')
+
 
 class GeodataBuild:
     """
@@ -46,7 +212,8 @@ class GeodataBuild:
 
     def __init__(self, directory: str, display_progress,
                  show_message:bool, exit_on_error:bool, languages_list_dct:{}, feature_code_list_dct:{}, 
-                 supported_countries_dct:{},volume=''):
+                 supported_countries_dct:{},volume='', bulk_insert=True, workers=1,
+                 sharded=False):
         """
         Read in datafiles needed for geodata, filter them and create a sql db.
         Filter dictionary examples:   
@@ -62,21 +229,60 @@ class GeodataBuild:
             feature_code_list_dct: dictionary containing the Geonames.org feature codes to load
             supported_countries_dct: dictionary containing the ISO-2 countries to load
             volume: disk volume to use - e.g. C: for Windows or /Volumes/xyz for OSX, /media/xyz for linux
+            bulk_insert: If True, buffer rows while reading geoname files and write them with executemany
+            workers: Number of processes used to parse geoname files.  If > 1, lines are parsed, normalized and soundexed   
+                in a process pool and this process only writes to the DB
+            sharded: If True, the geodata rows for each country are moved into their own shard file after the build   
+                (see ShardSet).  Shard indices are built by workers processes
         """
         self.logger = logging.getLogger(__name__)
         self.geodb:[GeoDB.GeoDB, None] = None
         self.show_message = show_message
-        self.geoid_main_dict = {}  # Key is GEOID, Value is DB ID for entry
-        self.geoid_admin_dict = {}  # Key is GEOID, Value is DB ID for entry
+        # Main entry for each GEOID.  Used by AlternateNames for fast lookup during DB build
+        self.georow_store = GeorowStore.GeorowStore()
+
+        # Bulk insert support.  Rows are buffered and written with executemany in batches of batch_size
+        self.bulk_insert = bulk_insert
+        self.batch_size = 50000
+        self._bulk_active = False
+        self._insert_buffer = {'geodata': [], 'admin': [], 'altname': []}
+        self._next_id = {}  # Key is table.  Value is the DB ID that will be assigned to the next buffered row
+
+        # Parallel build support.  Geoname files are split into chunks of chunk_size bytes and parsed by a process pool
+        self.workers = workers
+        self.chunk_size = 4 * 1024 * 1024
+
+        # Sharded DB support.  Geodata rows are split into a file per country at the end of the build
+        self.sharded = sharded
+
+        # Resumable build support.  Build progress is committed and recorded in the version table every   
+        # checkpoint_lines lines
+        self.checkpoint_lines = 1000000
+        self.checkpoint = {}
+        self.file_pos = 0
+
+        # Countries with admin entries changed by apply_updates().  None when updates aren't being applied
+        self.admin_changes = None
+
+        # Build profiling report.  Written as build_report.json next to the DB
+        self.report = BuildReport.BuildReport()
         # TODO fix volume handling
         self.volume = volume
-        self.collate = 'COLLATE NOCASE'
 
 
         self.exit_on_error = exit_on_error
-        self.required_db_version = 4
+        self.db_file_id = None  # Inode and modify time of geodata.db when it was opened
+        # Serving mode.  If True, the DB is opened read only with a connection for each thread.  See open_geodb
+        self.read_only = False
+        self.immutable = False
+        self.serving = False  # If True, the read only DB has the serving profile.  See open_geodb
+        self.warm_cache = False
+        self.required_db_version = 10
         # Message to user upgrading from earlier DB version  
-        self.db_upgrade_text = 'Renamed column to Feature'
+        self.db_upgrade_text = 'Reversed name index for leading wildcard searches'
+        # Schema migrations.  Key is DB version, value is function that upgrades a DB from that version to the next
+        self.migrations = {4: self._migrate_v4_to_v5, 5: self._migrate_v5_to_v6, 6: self._migrate_v6_to_v7,
+                           7: self._migrate_v7_to_v8, 8: self._migrate_v8_to_v9, 9: self._migrate_v9_to_v10}
         self.directory: str = directory
         self.progress_bar = display_progress
         self.line_num = 0
@@ -117,15 +323,22 @@ class GeodataBuild:
                                                              progress_bar=self.progress_bar, prefix="Step 3 of 4) " , filename='alternateNamesV2.txt',
                                                              lang_list=self.lang_list)
 
+        # Record of the inputs used to build the DB.  Used to tell if the DB needs to be rebuilt
+        self.manifest = BuildManifest.BuildManifest(self.directory, GEONAME_FILES, self.alternate_names.fname,
+                                                    languages_list_dct, feature_code_list_dct, supported_countries_dct)
 
-    def create_geonames_database(self)->bool:
+
+    def create_geonames_database(self, resume=False)->bool:
         """
         Create geonames database from geonames.org files.
-        You must call self.geodb = GeoDB.GeoDB(...) before this
+        You must call self.geodb = GeoDB.GeoDB(...) before this   
+        Progress is recorded in a checkpoint in the version table as the build runs.   
+        # Args:   
+            resume: If True, continue a build that was interrupted, starting from its last checkpoint.   
+                If there is no usable checkpoint, the DB is built from the start   
         # Returns:
             True if error
         """
-        # todo determine why some entries are duplicates
         # DB didnt exist.  Create tables.
         if self.geodb is None:
             self.logger.error('Cannot create DB: geodb is None')
@@ -134,61 +347,173 @@ class GeodataBuild:
         if self.volume != '':
             os.chdir(self.volume)
 
-        self.create_tables()
-        
-        # Set DB version to DB_REBUILDING until DB is  built, then set proper version
-        self.insert_version(DB_REBUILDING)
+        # Clear anything left from a previous build
+        self.georow_store.clear()
+        self.alternate_names.search = None
+        self.report = BuildReport.BuildReport()
+        self.report.resumed = resume
 
-        # Add country names
-        self.country = Country.Country(progress=self.progress_bar, geo_files=self, lang_list=self.lang_list)
-        self.country.add_country_names_to_db(geobuild=self)
+        # Use a rollback journal while building so each checkpoint commit is atomic and a build that is killed  
+        # can resume from its last checkpoint.  Pages added to the end of the DB aren't journaled, so this is cheap
+        self.geodb.db.set_pragma('PRAGMA journal_mode = truncate')
 
-        # Add historic names
-        self.country.add_historic_names_to_db(geobuild=self)
+        if resume and self._resume_from_checkpoint():
+            self.logger.info(f'Resuming database build from checkpoint {self.checkpoint}')
+        else:
+            self.create_tables()
+            if resume:
+                # Clear partial build
+                for tbl in ['geodata', 'admin', 'altname']:
+                    self.geodb.db.delete_table(tbl)
+
+            # Set DB version to DB_REBUILDING until DB is  built, then set proper version
+            self.insert_version(DB_REBUILDING)
+            self.checkpoint = {'files_done': [], 'file_count': 0, 'file': '', 'offset': 0, 'line': 0,
+                               'indices': False, 'altnames': False, 'alt_offset': 0, 'alt_line': 0}
+
+            # Add country names
+            self.report.start_stage('country names', self.geodb.db)
+            self.country = Country.Country(progress=self.progress_bar, geo_files=self, lang_list=self.lang_list)
+            self.country.add_country_names_to_db(geobuild=self)
+
+            # Add historic names
+            self.country.add_historic_names_to_db(geobuild=self)
+            self.geodb.db.begin()
+            self.save_checkpoint()
+            self.geodb.db.commit()
+            self.report.end_stage(self.geodb.db)
         
         start_time = time.time()
 
         # Add geonames.org country files (or allCountries.txt)
-        file_count = 0
-        for fname in ['allCountries.txt', 'ca.txt', 'gb.txt', 'de.txt', 'fr.txt', 'nl.txt']:
+        for fname in GEONAME_FILES:
+            if fname in self.checkpoint['files_done']:
+                continue
             # Read  geoname files
             error = self._add_geoname_file_to_db(fname, 'Step 1 of 4) ')  # Read in info (lat/long) for all places from
             if error:
                 self.logger.warning(f'geoname file {fname} not found')
             else:
-                file_count += 1
+                self.checkpoint['file_count'] += 1
+            self.checkpoint['files_done'].append(fname)
+            self.geodb.db.begin()
+            self.save_checkpoint(file='', offset=0, line=0)
+            self.geodb.db.commit()
 
-        if file_count == 0:
+        if self.checkpoint['file_count'] == 0:
             self.logger.error(f'No geonames files found in {os.path.join(self.directory, "*.txt")}')
             return True
         
         self.logger.info(f'Geonames.org files done.  Elapsed ={(time.time() - start_time):.0f} seconds')
         
         # Create Main Indices
-        self.progress("Step 2 of 4) Creating Indices for Database...", 95)
-        start_time = time.time()
-        self.create_geoid_index()
-        self.create_main_indices()
-        self.logger.debug(f'Indices done.  Elapsed = {(time.time() - start_time):.0f} seconds')
+        if not self.checkpoint['indices']:
+            self.progress("Step 2 of 4) Creating Indices for Database...", 95)
+            start_time = time.time()
+            self.report.start_stage('indices', self.geodb.db)
+            self.create_main_indices()
+            self.report.end_stage(self.geodb.db)
+            self.logger.debug(f'Indices done.  Elapsed = {(time.time() - start_time):.0f} seconds')
+            self.geodb.db.begin()
+            self.save_checkpoint(indices=True)
+            self.geodb.db.commit()
 
         # Add geonames.org alternate names
-        self.progress("4) Step 4 of 4: Adding Alternate Names to Database...", 95)
-
-        start_time = time.time()
-        err = self.alternate_names.add_alternate_names_to_db()
-        if err:
-            self.logger.warning(f'Error reading Alternate names.')
+        err = False
+        if not self.checkpoint['altnames']:
+            self.progress("4) Step 4 of 4: Adding Alternate Names to Database...", 95)
+
+            start_time = time.time()
+            self.report.start_stage('alternate names', self.geodb.db)
+            # Rows added from here on are from alternate names and aliases.  See redo_alternate_names()
+            self.checkpoint.setdefault('alt_start', self._get_last_ids())
+            err = self.alternate_names.add_alternate_names_to_db(start_offset=self.checkpoint['alt_offset'],
+                                                                 start_line=self.checkpoint['alt_line'])
+            if err:
+                self.logger.warning(f'Error reading Alternate names.')
+            else:
+                self.logger.info(f'Alternate names done.  Elapsed ={(time.time() - start_time):.0f} seconds')
+            self.georow_store.clear()
+
+            self.create_alt_indices()
+            self.report.add(lines=self.alternate_names.line_count, accepted=self.alternate_names.accepted,
+                            rejected_prefilter=self.alternate_names.skipped,
+                            mb_per_sec=round(self.alternate_names.mb_per_sec, 1))
+            self.report.end_stage(self.geodb.db)
+            self.geodb.db.begin()
+            self.save_checkpoint(altnames=True, alt_err=err)
+            self.geodb.db.commit()
         else:
-            self.logger.info(f'Alternate names done.  Elapsed ={(time.time() - start_time):.0f} seconds')
-            
-        self.create_alt_indices()
+            err = self.checkpoint.get('alt_err', False)
         #self.logger.info(f'Geonames entries = {self.geodb.get_row_count():,}')
 
-        # Add aliases
-        self.norm.add_aliases_to_db(self)
+        if not self.checkpoint.get('names'):
+            # Add aliases
+            self.report.start_stage('aliases', self.geodb.db)
+            self.norm.add_aliases_to_db(self)
+            self.report.end_stage(self.geodb.db)
+
+            # Store the admin and country names on each row
+            self.progress("Adding admin names to Database...", 96)
+            self.report.start_stage('admin names', self.geodb.db)
+            if self.set_admin_names():
+                return True
+            self.report.end_stage(self.geodb.db)
+            self.geodb.db.begin()
+            self.save_checkpoint(names=True)
+            self.geodb.db.commit()
+
+        # Word index for wildcard searches.  This is built after the alternate names and aliases are added.   
+        # Shards each get their own word index when they are written
+        if not self.sharded and not self.checkpoint.get('words'):
+            self.progress("Creating word index for Database...", 96)
+            self.report.start_stage('word index', self.geodb.db)
+            if self.create_word_index():
+                return True
+            self.report.end_stage(self.geodb.db)
+            self.geodb.db.begin()
+            self.save_checkpoint(words=True)
+            self.geodb.db.commit()
+
+        # Trigram index for misspelled names.  Shards each get their own trigram index when they are written
+        if not self.sharded and not self.checkpoint.get('trigrams'):
+            self.progress("Creating trigram index for Database...", 96)
+            self.report.start_stage('trigram index', self.geodb.db)
+            if self.create_trigram_index():
+                return True
+            self.report.end_stage(self.geodb.db)
+            self.geodb.db.begin()
+            self.save_checkpoint(trigrams=True)
+            self.geodb.db.commit()
+
+        # Move geodata rows into per-country shard files
+        if self.sharded and not self.checkpoint.get('shards'):
+            self.progress("Creating country shards...", 97)
+            self.report.start_stage('shards', self.geodb.db)
+            if self.create_shards():
+                return True
+            self.report.end_stage(self.geodb.db)
+
+        # Planner stats, so LIKE and range queries pick the name indices
+        self.progress("Optimizing Database...", 98)
+        self.geodb.db.analyze()
 
         # Done - Set Database Version
         self.insert_version(self.required_db_version)
+        self.set_version_info('alt_start', self.checkpoint.get('alt_start'))
+        self.geodb.db.begin()
+        self.manifest.write(self.geodb.db)
+        self.geodb.db.commit()
+        if self.checkpoint.get('shards'):
+            self.set_version_info('shards', sorted(self.checkpoint['shards']))
+            # Reclaim the space used by the rows moved to shards
+            self.geodb.db.set_pragma('VACUUM')
+            self.geodb.open_shards()
+        self.geodb.db.set_pragma('PRAGMA journal_mode = off')
+        # In exclusive locking mode the empty journal file is left in place
+        if os.path.exists(self.geodb.db_path + '-journal'):
+            os.remove(self.geodb.db_path + '-journal')
+        self.report.write(os.path.join(os.path.dirname(self.geodb.db_path), 'build_report.json'), self.geodb.db)
         return err
 
     def _add_geoname_file_to_db(self, file, prefix) -> bool:
@@ -201,36 +526,58 @@ class GeodataBuild:
 
             2. Since Geonames supports over 25M entries, the db is filtered to only the countries and feature types we want
         # Args:
-            file: filename (not path) for DB file.  Will be placed in directory from init call
+            file: filename (not path) for geonames file in directory from init call.  A zip or gz compressed   
+                version of the file is used if the file isn't found, e.g. allCountries.zip
 
         Returns:
             True if error
         """
-        Geofile_row = namedtuple('Geofile_row',
-                                 'id name name_asc alt lat lon feat_class feat_code iso iso2 admin1_id'
-                                 ' admin2_id admin3_id admin4_id pop elev dem timezone mod')
+        # If resuming, start from the last checkpoint in this file
         self.line_num = 0
+        self.file_pos = 0
+        if self.checkpoint.get('file') == file:
+            self.line_num = self.checkpoint['line']
+            self.file_pos = self.checkpoint['offset']
         self.progress("Reading {}...".format(file), 0)
         if self.volume != '':
             os.chdir(self.volume)
-        path = os.path.join(self.volume, self.directory, file)
+        # Use file or a zip/gz compressed version of it
+        path = FileReader.find_file(os.path.join(self.volume, self.directory), file)
         self.logger.info(f'Path = [{path}]')
 
-        if os.path.exists(path):
-            fsize = os.path.getsize(path)
-            bytes_per_line = 128  # Approximate bytes per line for progress indicator
-            with open(path, 'r', newline="", encoding='utf-8', errors='replace') as geofile:
+        if path is not None and self.workers > 1:
+            return self._add_geoname_file_parallel(path, file, prefix)
+        elif path is not None:
+            self.report.start_stage(file, self.geodb.db)
+            start_line = self.line_num
+            accepted = 0
+            rejected_country = 0
+            rejected_feature = 0
+            duplicates = 0
+            with FileReader.InputFile(path, file) as geofile:
                 self.progress("Building Database from {}".format(file), 2)  # initialize progress bar
-                reader = csv.reader(geofile, delimiter='\t')
+                geofile.seek(self.file_pos)
+                reader = csv.reader(self._decode_lines(geofile), delimiter='\t')
                 self.geodb.db.begin()
+                self.start_bulk_insert()
+                checkpoint_line = self.line_num + self.checkpoint_lines
+                line_start = self.file_pos  # File position of the line being handled
 
                 # Map line from csv reader into GeonameData namedtuple
                 for line in reader:
                     self.line_num += 1
                     if self.line_num % 30000 == 0:
                         # Periodically update progress
-                        prog = self.line_num * bytes_per_line * 100 / fsize
+                        prog = geofile.progress()
                         self.progress(msg=f"{prefix} Building Database from {file}            {prog:.1f}%", val=prog)
+                    if self.line_num >= checkpoint_line:
+                        # All lines before this one are handled.  Commit and record position so an interrupted  
+                        # build can resume from here
+                        self.save_checkpoint(file=file, offset=line_start, line=self.line_num - 1)
+                        self.geodb.db.commit()
+                        self.geodb.db.begin()
+                        checkpoint_line = self.line_num + self.checkpoint_lines
+                    line_start = self.file_pos
                     try:
                         geoname_row = Geofile_row._make(line)
                     except TypeError:
@@ -238,19 +585,99 @@ class GeodataBuild:
                         continue
 
                     # Only handle line if it's for a country and Feature tag we are interested in
-                    if geoname_row.iso.lower() in self.supported_countries_dct and \
-                            geoname_row.feat_code in self.feature_code_list_dct:
-                        self.insert_georow(geoname_row)
+                    if geoname_row.iso.lower() not in self.supported_countries_dct:
+                        rejected_country += 1
+                    elif geoname_row.feat_code not in self.feature_code_list_dct:
+                        rejected_feature += 1
+                    elif geoname_row.id in self.georow_store:
+                        # Already loaded from another file (e.g. allCountries.txt and gb.txt)
+                        duplicates += 1
+                    else:
+                        geo_tuple = self.insert_georow(geoname_row)
                         #if geoname_row.name.lower() != self.norm.normalize(geoname_row.name, remove_commas=True):
-                        self.insert_alternate_name(geoname_row.name, geoname_row.id, 'ut8')
+                        self.insert_alternate_name(geoname_row.name, geoname_row.id, 'ut8', sdx=geo_tuple[Entry.SDX])
+                        accepted += 1
 
             self.progress("Write Database", 90)
+            self.end_bulk_insert()
             self.geodb.db.commit()
+            self.report.add(lines=self.line_num - start_line, accepted=accepted, rejected_country=rejected_country,
+                            rejected_feature=rejected_feature, duplicates=duplicates)
+            self.report.end_stage(self.geodb.db)
             self.progress("Database created", 100)
             return False
         else:
             return True
-        
+
+    def _add_geoname_file_parallel(self, path, file, prefix) -> bool:
+        """
+            Pipelined version of _add_geoname_file_to_db.   
+            This process reads the file in chunks of about chunk_size bytes (split on line boundaries).  A pool of   
+            workers processes filters, normalizes, and soundexes each chunk and this process writes the resulting   
+            rows to the DB.  Chunks are written in file order so the DB is the same as a single process build.   
+        # Args:
+            path: full path of geonames file
+            file: filename for progress messages
+            prefix: prefix for progress messages
+
+        Returns:
+            True if error
+        """
+        self.logger.info(f'Parallel build with {self.workers} workers')
+
+        with FileReader.InputFile(path, file) as geofile:
+            self.progress("Building Database from {}".format(file), 2)  # initialize progress bar
+            geofile.seek(self.file_pos)
+            self.report.start_stage(file, self.geodb.db)
+            self.geodb.db.begin()
+            self.start_bulk_insert()
+            checkpoint_line = self.line_num + self.checkpoint_lines
+
+            with multiprocessing.Pool(processes=self.workers, initializer=_init_parse_worker,
+                                      initargs=(self.supported_countries_dct, self.feature_code_list_dct)) as pool:
+                for chunk_len, line_count, bad_lines, rejects, row_list in pool.imap(_parse_geoname_chunk,
+                                                                                     _read_chunks(geofile, self.chunk_size)):
+                    duplicates = 0
+                    prev_geoid = None
+                    skip = False
+                    for feat_code, geo_tuple, alt_name in row_list:
+                        # The rows for a line are together and have the same geoid
+                        if geo_tuple[Entry.ID] != prev_geoid:
+                            prev_geoid = geo_tuple[Entry.ID]
+                            # Skip line if already loaded from another file (e.g. allCountries.txt and gb.txt)
+                            skip = prev_geoid in self.georow_store
+                            if skip:
+                                duplicates += 1
+                        if skip:
+                            continue
+                        self.insert(geo_tuple=geo_tuple, feat_code=feat_code)
+                        if alt_name is not None:
+                            self.insert_alternate_name(alt_name, geo_tuple[Entry.ID], 'ut8', sdx=geo_tuple[Entry.SDX])
+
+                    for line_num in bad_lines:
+                        self.logger.error(f'Unable to parse geoname location info in {file}  line {self.line_num + line_num}')
+                    self.line_num += line_count
+                    self.file_pos += chunk_len
+                    self.report.add(lines=line_count, rejected_country=rejects[0], rejected_feature=rejects[1],
+                                    duplicates=duplicates,
+                                    accepted=line_count - len(bad_lines) - rejects[0] - rejects[1] - duplicates)
+                    prog = geofile.progress()
+                    self.progress(msg=f"{prefix} Building Database from {file}            {prog:.1f}%", val=prog)
+
+                    if self.line_num >= checkpoint_line:
+                        # Commit and record position so an interrupted build can resume from here
+                        self.save_checkpoint(file=file, offset=self.file_pos, line=self.line_num)
+                        self.geodb.db.commit()
+                        self.geodb.db.begin()
+                        checkpoint_line = self.line_num + self.checkpoint_lines
+
+        self.progress("Write Database", 90)
+        self.end_bulk_insert()
+        self.geodb.db.commit()
+        self.report.end_stage(self.geodb.db)
+        self.progress("Database created", 100)
+        return False
+
     def insert(self, geo_tuple: (), feat_code: str):
         """
         Insert a geo_row into geonames database   
@@ -262,51 +689,142 @@ class GeodataBuild:
         """
         # We split the data into 2  tables, 1) admin: ADM0/ADM1,  and 2) geodata:  all other place types (city, county, ADM2, etc)
         if feat_code == 'ADM1' or feat_code == 'ADM0':
-            sql = ''' INSERT OR IGNORE INTO admin(name,country, admin1_id,admin2_id,lat,lon,feature, geoid, sdx)
-                      VALUES(?,?,?,?,?,?,?,?,?) '''
-            row_id = self.geodb.db.execute(sql, geo_tuple)
-            # Add name to dictionary.  Used by AlternateNames for fast lookup during DB build
-            self.geoid_admin_dict[geo_tuple[Entry.ID]] = row_id
+            table = 'admin'
         else:
-            sql = ''' INSERT OR IGNORE INTO geodata(name, country, admin1_id, admin2_id, lat, lon, feature, geoid, sdx)
-                      VALUES(?,?,?,?,?,?,?,?,?) '''
+            table = 'geodata'
+
+        if self.admin_changes is not None and geo_tuple[Entry.FEAT] in ADMIN_FEATURES:
+            self.admin_changes.add(geo_tuple[Entry.ISO])
+
+        # Add population, priority and reversed name.  Country and historic rows have no population
+        pop = int(geo_tuple[Entry.POP] or 0) if len(geo_tuple) > Entry.POP else 0
+        geo_tuple = tuple(geo_tuple[0:Entry.POP]) + (pop, get_priority(geo_tuple[Entry.FEAT], pop),
+                                                     geo_tuple[Entry.NAME][::-1])
+
+        if self._bulk_active:
+            # Assign the row ID here since executemany doesn't return it
+            row_id = self._next_id[table]
+            self._next_id[table] += 1
+            self._insert_buffer[table].append((row_id,) + tuple(geo_tuple))
+            if len(self._insert_buffer[table]) >= self.batch_size:
+                self.flush_inserts()
+        else:
+            sql = f''' INSERT OR IGNORE INTO {table}(name, country, admin1_id, admin2_id, lat, lon, feature, geoid, sdx, 
+                      pop, priority, rev_name) VALUES(?,?,?,?,?,?,?,?,?,?,?,?) '''
             row_id = self.geodb.db.execute(sql, geo_tuple)
-            # Add name to dictionary.  Used by AlternateNames for faster lookup during DB build
-            self.geoid_main_dict[geo_tuple[Entry.ID]] = row_id
 
+        self.georow_store.add(geo_tuple)
         return row_id
+
+    def start_bulk_insert(self):
+        """
+        Start buffering inserts (if bulk_insert is set).  Rows are written with executemany when the buffer reaches batch_size   
+        or when end_bulk_insert() is called.  Must be inside a DB transaction.   
+        """
+        if not self.bulk_insert:
+            return
+        self._bulk_active = True
+        # Don't reuse the ids of deleted rows.  In a sharded DB, ids must be unique across shards
+        last_ids = self._get_last_ids()
+        for table in ['geodata', 'admin']:
+            self._next_id[table] = last_ids[table] + 1
+
+    def end_bulk_insert(self):
+        """
+        Write any buffered rows and stop buffering inserts   
+        """
+        self.flush_inserts()
+        self._bulk_active = False
+
+    def flush_inserts(self):
+        """
+        Write buffered rows to the database with executemany   
+        """
+        for table in ['geodata', 'admin']:
+            if self._insert_buffer[table]:
+                sql = f''' INSERT OR IGNORE INTO {table}(id, name, country, admin1_id, admin2_id, lat, lon, feature, geoid, 
+                          sdx, pop, priority, rev_name) VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?) '''
+                self.geodb.db.executemany(sql, self._insert_buffer[table])
+                self._insert_buffer[table].clear()
+
+        if self._insert_buffer['altname']:
+            sql = ''' INSERT OR IGNORE INTO altname(name,lang, geoid, sdx, alt_id)
+                      VALUES(?,?,?,?,?) '''
+            self.geodb.db.executemany(sql, self._insert_buffer['altname'])
+            self._insert_buffer['altname'].clear()
         
-    def open_geodb(self, repair_database: bool, query_limit:int) -> bool:
+    def open_geodb(self, repair_database: bool, query_limit:int, staged_rebuild=False, read_only=False,
+                   immutable=False, serving=False, warm_cache=False) -> bool:
         """
          Open Geoname DB file - this is the db of geoname.org city files and is stored in cache directory under geonames_data.
          The db only contains important fields and only for supported countries.
          If the db doesn't exist and repair flag is True, read the geonames.org files and build DB.   
          The DB has a version table for the schema version.  If the schema changes, the version should be updated.   
          This will check DB schema version and rebuild DB if version is out of date.   
+         If a build was interrupted and repair flag is True, the build is resumed from its last checkpoint.   
         # Args:   
             repair_database: If True, rebuild database if error or missing   
+            query_limit: SQL LIMIT for queries   
+            staged_rebuild: If True, a rebuild is done with rebuild_geodb() - the new DB is built in a staging file and   
+                swapped into place when complete, rather than deleting the DB and exiting   
+            read_only: If True, open the DB read only for serving lookups from several threads and processes.  The DB   
+                is not built, repaired or migrated - that must be done by a process that opens it without read_only   
+            immutable: If True (and read_only), sqlite doesn't lock the file or check it for changes.  Only use if   
+                the DB is never updated in place (apply_updates).  A rebuild swaps in a new file so is OK   
+            serving: If True, open the DB read only with the serving profile - the DB files are memory mapped, the   
+                page cache is larger and the connections are query only.  See DB.set_serving_pragmas   
+            warm_cache: If True (and read only), read the index pages when the DB is opened (or reopened) so the   
+                first lookups are as fast as later ones.  See GeoDB.warm_cache   
         Returns:   
             True if error   
         """
 
         # Use db if it exists and has data and is correct version
-        cache_dir = GeoUtil.get_cache_directory(self.directory)
-        db_path = os.path.join(cache_dir, 'geodata.db')
+        db_path = self.get_db_path()
 
         self.logger.debug(f'path for geodata.db: {db_path}')
         err_msg = ''
+        self.read_only = read_only or serving
+        self.immutable = immutable and self.read_only
+        self.serving = serving
+        self.warm_cache = warm_cache and self.read_only
+
+        if self.read_only:
+            if not os.path.exists(db_path):
+                self.logger.error(f'Database not found at {db_path}')
+                return True
+            try:
+                self._open_geodb(db_path=db_path, query_limit=query_limit)
+            except ValueError as e:
+                self.logger.error(f'Unable to open database read only: {e}')
+                return True
+            ver = self.geodb.get_db_version()
+            if ver != self.required_db_version:
+                self.logger.error(f'Database is V {ver}.  V {self.required_db_version} is required.  '
+                                  f'Open without read_only to upgrade or rebuild')
+                return True
+            return False
 
         # Validate Database setup
         if os.path.exists(db_path):
             # DB was Found
             self.logger.debug(f'DB found at {db_path}')
-            self.geodb = GeoDB.GeoDB(db_path=db_path, 
-                                     show_message=self.show_message, exit_on_error=self.exit_on_error,
-                                     set_speed_pragmas=True, db_limit=query_limit)
+            self._open_geodb(db_path=db_path, query_limit=query_limit)
 
             # Make sure DB is correct version
             ver = self.geodb.get_db_version()
-            if ver != self.required_db_version:
+            if ver == DB_REBUILDING and repair_database and not staged_rebuild:
+                # DB didn't complete rebuild.  Continue from the last checkpoint
+                self.logger.info('Database only partially built.  Resuming build')
+                return self.create_geonames_database(resume=True)
+            if ver != self.required_db_version and ver in self.migrations:
+                # Upgrade DB in place.  If that fails, DB is rebuilt below
+                if not self.migrate_geodb(ver):
+                    ver = self.required_db_version
+            if ver == self.required_db_version and repair_database:
+                # Rebuild if geonames files or filter settings changed since the DB was built
+                err_msg = self.check_manifest()
+            elif ver != self.required_db_version:
                 # Bad DB version 
                 if ver == DB_REBUILDING:
                     # DB didn't complete rebuild
@@ -315,6 +833,14 @@ class GeodataBuild:
                     # DB is out of date
                     err_msg = f'Database version will be upgraded:\n\n{self.db_upgrade_text}\n\n' \
                         f'Upgrading database from V {ver} to V {self.required_db_version}.'
+                if not self.geoname_files_found():
+                    # Don't delete a DB that can't be rebuilt
+                    self.logger.error(f'{err_msg}\ngeonames.org files not found in {self.directory}.  Keeping {db_path}')
+                    return True
+                if staged_rebuild and repair_database:
+                    # Keep the current DB until the new DB is built and validated
+                    self.logger.info(err_msg)
+                    return self.rebuild_geodb(query_limit=query_limit)
                 self.geodb.close()
                 os.remove(db_path)
                 self.logger.info(err_msg)
@@ -338,7 +864,13 @@ class GeodataBuild:
 
             self.logger.debug(err_msg)
 
-            if repair_database:
+            if repair_database and os.path.exists(db_path) and not self.geoname_files_found():
+                # The DB is the current version.  Keep using it since it can't be rebuilt
+                self.logger.error(f'geonames.org files not found in {self.directory}.  Keeping {db_path}')
+                return False
+            if repair_database and staged_rebuild:
+                return self.rebuild_geodb(query_limit=query_limit)
+            elif repair_database:
                 if os.path.exists(db_path):
                     self.geodb.close()
                     os.remove(db_path)
@@ -346,12 +878,160 @@ class GeodataBuild:
                     if self.show_message:
                         messagebox.showinfo('Database Deleted. Will rebuild on start up', err_msg)
 
-                self.geodb = GeoDB.GeoDB(db_path=db_path,
-                                                 show_message=self.show_message, exit_on_error=self.exit_on_error,
-                                                 set_speed_pragmas=True, db_limit=query_limit)
+                self._open_geodb(db_path=db_path, query_limit=query_limit)
                 return self.create_geonames_database()
         return False
 
+    def geoname_files_found(self) -> bool:
+        """ Returns: True if any of the geonames.org place files (or a zip or gz of it) is in the directory """
+        directory = os.path.join(self.volume, self.directory)
+        return any(FileReader.find_file(directory, fname) is not None for fname in GEONAME_FILES)
+
+    def get_db_path(self) -> str:
+        """ Returns: full path for geodata.db """
+        return os.path.join(GeoUtil.get_cache_directory(self.directory), 'geodata.db')
+
+    def _open_geodb(self, db_path, query_limit):
+        """ Open GeoDB and save the file status so we can tell if the DB file is replaced """
+        self.geodb = GeoDB.GeoDB(db_path=db_path,
+                                 show_message=self.show_message, exit_on_error=self.exit_on_error,
+                                 set_speed_pragmas=True, db_limit=query_limit,
+                                 read_only=self.read_only, immutable=self.immutable, serving=self.serving)
+        self.db_file_id = self._get_file_id(db_path)
+        if self.warm_cache:
+            self.geodb.warm_cache()
+
+    @staticmethod
+    def _get_file_id(path):
+        """ Returns: (inode, modify time) for path or None if path doesn't exist """
+        try:
+            st = os.stat(path)
+            return st.st_ino, st.st_mtime_ns
+        except OSError:
+            return None
+
+    def rebuild_geodb(self, query_limit: int) -> bool:
+        """
+        Rebuild the database without taking the current DB offline.   
+        The new DB is built in a staging file in the cache directory, analyzed, optimized and validated.  Only then  
+        is it renamed (os.replace) to geodata.db.  The shards of a sharded DB are built in shards.building and swapped   
+        in with it.  If the staging file is left from an interrupted rebuild, the rebuild is resumed from its last   
+        checkpoint.  Other processes keep reading the old file until the swap and can   
+        call reopen_geodb() to switch to the new DB.  If this instance had a DB open, it is reopened on the new file.   
+        # Args:   
+            query_limit: SQL LIMIT for queries   
+        # Returns:   
+            True if error.  The current DB is left in place on error   
+        """
+        db_path = self.get_db_path()
+        staging_path = db_path + ShardSet.STAGING_SUFFIX
+        serving_geodb = self.geodb
+
+        # If an earlier rebuild was interrupted, resume it
+        self.geodb = None
+        if os.path.exists(staging_path):
+            try:
+                self.geodb = GeoDB.GeoDB(db_path=staging_path, show_message=False, exit_on_error=False,
+                                         set_speed_pragmas=True, db_limit=query_limit)
+            except ValueError:
+                self.logger.info(f'Unable to resume build in {staging_path}')
+                self._remove_staging(staging_path)
+        resume = self.geodb is not None
+
+        self.logger.info(f'Building database in {staging_path}')
+        if not resume:
+            self.geodb = GeoDB.GeoDB(db_path=staging_path, show_message=self.show_message,
+                                     exit_on_error=self.exit_on_error, set_speed_pragmas=True, db_limit=query_limit)
+        err = self.create_geonames_database(resume=resume)
+        self.geodb.close()
+        self.geodb = serving_geodb
+
+        if not err:
+            err = self._validate_geodb(staging_path, query_limit)
+
+        if err:
+            self.logger.error(f'Database rebuild failed.  Keeping {db_path}')
+            self._remove_staging(staging_path)
+            return True
+
+        # Swap new DB (and its shards) into place and switch this instance to it
+        os.replace(staging_path, db_path)
+        self._swap_shard_directory(staging_path, db_path)
+        self.logger.info(f'New database is now in {db_path}')
+        if serving_geodb is not None:
+            serving_geodb.close()
+        self._open_geodb(db_path=db_path, query_limit=query_limit)
+        return False
+
+    @staticmethod
+    def _remove_staging(staging_path):
+        """ Remove the staging DB file and its shard directory """
+        if os.path.exists(staging_path):
+            os.remove(staging_path)
+        shutil.rmtree(ShardSet.get_shard_directory(staging_path), ignore_errors=True)
+
+    @staticmethod
+    def _swap_shard_directory(staging_path, db_path):
+        """
+        Move the shards built for the staging DB into the shard directory of the DB.  The old shards are removed.   
+        Nothing is done if the new DB isn't sharded   
+        """
+        staging_dir = ShardSet.get_shard_directory(staging_path)
+        if not os.path.isdir(staging_dir):
+            return
+        shard_dir = ShardSet.get_shard_directory(db_path)
+        old_dir = shard_dir + '.old'
+        shutil.rmtree(old_dir, ignore_errors=True)
+        if os.path.isdir(shard_dir):
+            os.replace(shard_dir, old_dir)
+        os.replace(staging_dir, shard_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+    def _validate_geodb(self, db_path, query_limit) -> bool:
+        """
+        Run sanity test on a newly built DB.  Check version and that there are entries   
+        # Returns:   
+            True if error   
+        """
+        try:
+            test_db = GeoDB.GeoDB(db_path=db_path, show_message=False, exit_on_error=False,
+                                  set_speed_pragmas=False, db_limit=query_limit)
+        except ValueError as e:
+            self.logger.error(f'New database failed sanity test: {e}')
+            return True
+        ver = test_db.get_db_version()
+        count = test_db.get_row_count()
+        test_db.db.conn.close()
+        if ver != self.required_db_version or count == 0:
+            self.logger.error(f'New database failed validation: version={ver} rows={count}')
+            return True
+        return False
+
+    def db_file_changed(self) -> bool:
+        """
+        Returns: True if geodata.db has been replaced since we opened it (e.g. by rebuild_geodb() in another process)
+        """
+        file_id = self._get_file_id(self.get_db_path())
+        return file_id is not None and file_id != self.db_file_id
+
+    def reopen_geodb(self) -> bool:
+        """
+        Close the DB and open geodata.db again.  Used to switch to a DB that was rebuilt by another process.   
+        # Returns:   
+            True if error   
+        """
+        if self.geodb is None:
+            return True
+        query_limit = self.geodb.db_limit
+        self.geodb.close()
+        self.geodb = None
+        try:
+            self._open_geodb(db_path=self.get_db_path(), query_limit=query_limit)
+        except ValueError as e:
+            self.logger.error(f'Unable to reopen database: {e}')
+            return True
+        return False
+
     def update_geo_row_name(self, geo_row:[], name:str, normalize=True):
         """
             Update the name entry and soundex entry with a new location name
@@ -381,28 +1061,12 @@ class GeodataBuild:
             geoname_row: ('paris', 'fr', '07', '012', 12.345, 45.123, 'PPL', '34124')
 
         Returns:
-            None
-        """
-        geo_row = [None] * GeoSearch.Entry.MAX
-        self.update_geo_row_name(geo_row=geo_row, name=geoname_row.name)
-        geo_row[GeoSearch.Entry.ISO] = geoname_row.iso.lower()
-        geo_row[GeoSearch.Entry.ADM1] = geoname_row.admin1_id
-        geo_row[GeoSearch.Entry.ADM2] = geoname_row.admin2_id
-        geo_row[GeoSearch.Entry.LAT] = geoname_row.lat
-        geo_row[GeoSearch.Entry.LON] = geoname_row.lon
-        geo_row[GeoSearch.Entry.FEAT] = geoname_row.feat_code
-        geo_row[GeoSearch.Entry.ID] = geoname_row.id
-            
-        # Simplify feature type for Abbey/Priory, Castle, and Church.  Set feature based on population
-        geo_row[GeoSearch.Entry.FEAT] = self.norm.feature_normalize(feature=geo_row[GeoSearch.Entry.FEAT],
-                                                                    name=geo_row[GeoSearch.Entry.NAME], pop=int(geoname_row.pop))
-            
-        self.insert(geo_tuple=geo_row, feat_code=geoname_row.feat_code)
-
-        # Add abbreviations for USA states
-        if geo_row[GeoSearch.Entry.ISO] == 'us' and geoname_row.feat_code == 'ADM1':
-            self.update_geo_row_name(geo_row=geo_row, name=geo_row[GeoSearch.Entry.ADM1])
-            self.insert(geo_tuple=geo_row, feat_code=geoname_row.feat_code)
+            The geo tuple that was inserted for the entry
+        """
+        geo_tuple_list = make_georows(geoname_row, self.norm)
+        for geo_tuple in geo_tuple_list:
+            self.insert(geo_tuple=geo_tuple, feat_code=geoname_row.feat_code)
+        return geo_tuple_list[0]
 
     def get_supported_countries(self) -> [str, int]:
         """ Convert list of supported countries into sorted string """
@@ -446,70 +1110,35 @@ class GeodataBuild:
 
     def create_tables(self):
         """
-        Create all the tables needed for the geoname database
+        Create all the tables needed for the geoname database   
         """
-        # name, country, admin1_id, admin2_id, lat, lon, feature, geoid
-        sql_geodata_table = f"""CREATE TABLE IF NOT EXISTS geodata    (
-                id           integer primary key autoincrement not null,
-                name     text {self.collate},
-                country     text COLLATE NOCASE,
-                admin1_id     text COLLATE NOCASE,
-                admin2_id text COLLATE NOCASE,
-                lat      text  COLLATE NOCASE,
-                lon       text COLLATE NOCASE,
-                feature      text COLLATE NOCASE,
-                geoid      text COLLATE NOCASE,
-                sdx     text COLLATE NOCASE
-                                    );"""
-
-        # name, country, admin1_id, admin2_id, lat, lon, feature, geoid
-        sql_admin_table = """CREATE TABLE IF NOT EXISTS admin    (
-                id           integer primary key autoincrement not null,
-                name     text COLLATE NOCASE,
-                country     text COLLATE NOCASE,
-                admin1_id     text COLLATE NOCASE,
-                admin2_id text COLLATE NOCASE,
-                lat      text  COLLATE NOCASE,
-                lon       text COLLATE NOCASE,
-                feature      text COLLATE NOCASE,
-                geoid      text COLLATE NOCASE,
-                sdx     text COLLATE NOCASE
-                                    );"""
-
-        # name, lang, geoid
-        sql_alt_name_table = """CREATE TABLE IF NOT EXISTS altname    (
-                id           integer primary key autoincrement not null,
-                name     text COLLATE NOCASE,
-                lang     text COLLATE NOCASE,
-                geoid      text COLLATE NOCASE,
-                sdx     text COLLATE NOCASE
-                                    );"""
-
-        # version
-        sql_version_table = """CREATE TABLE IF NOT EXISTS version    (
-                id           integer primary key autoincrement not null,
-                version     integer
-                                    );"""
+        for sql in TABLE_SQL.values():
+            self.geodb.db.create_table(sql)
 
-        for tbl in [sql_geodata_table, sql_admin_table, sql_version_table, sql_alt_name_table]:
-            self.geodb.db.create_table(tbl)
-
-    def insert_alternate_name(self, alternate_name: str, geoid: str, lang: str):
+    def insert_alternate_name(self, alternate_name: str, geoid: str, lang: str, sdx=None, alt_id=None):
         """
         Add alternate name to altname table
         #Args:   
             alternate_name: alternate name to add for this geoid   
             geoid: geonames.org geoid   
             lang: ISO lang code for this entry   
+            sdx: soundex for alternate name if caller already has it.  Otherwise it is calculated
+            alt_id: geonames.org alternateNameId (None for names from the geoname file)
 
         #Returns: None   
 
         """
-        sdx = GeoSearch.get_soundex(self.norm.normalize(alternate_name, True))
-        row = (alternate_name, lang, geoid, sdx)
-        sql = ''' INSERT OR IGNORE INTO altname(name,lang, geoid, sdx)
-                  VALUES(?,?,?,?) '''
-        self.geodb.db.execute(sql, row)
+        if sdx is None:
+            sdx = GeoSearch.get_soundex(self.norm.normalize(alternate_name, True))
+        row = (alternate_name, lang, geoid, sdx, alt_id)
+        if self._bulk_active:
+            self._insert_buffer['altname'].append(row)
+            if len(self._insert_buffer['altname']) >= self.batch_size:
+                self.flush_inserts()
+        else:
+            sql = ''' INSERT OR IGNORE INTO altname(name,lang, geoid, sdx, alt_id)
+                      VALUES(?,?,?,?,?) '''
+            self.geodb.db.execute(sql, row)
 
     def insert_version(self, db_version: int):
         """
@@ -534,33 +1163,991 @@ class GeodataBuild:
         self.geodb.db.execute(sql, args)
         self.geodb.db.commit()
 
-    def create_geoid_index(self):
+    def save_checkpoint(self, **kwargs):
+        """
+        Update the build checkpoint and save it in the version table.  Buffered inserts are written first   
+        so the checkpoint matches the DB.  Must be inside a DB transaction.  The checkpoint is durable once the   
+        caller commits.   
+        #Args:   
+            kwargs: checkpoint fields to update   
+        """
+        self.checkpoint.update(kwargs)
+        self.flush_inserts()
+        self.checkpoint['max_id'] = {tbl: self.geodb.db.get_max_id(tbl) for tbl in ['geodata', 'admin', 'altname']}
+        # noinspection SqlWithoutWhere
+        self.geodb.db.execute('UPDATE version SET checkpoint = ?', (json.dumps(self.checkpoint),))
+
+    def get_checkpoint(self) -> [Dict, None]:
+        """
+        Get the build checkpoint from the version table   
+        #Returns:   
+            Checkpoint dictionary or None if there is no checkpoint   
+        """
+        if self.geodb.db.add_column('version', 'checkpoint', 'text'):
+            return None
+        row_list = self.geodb.db.select('checkpoint', 'checkpoint IS NOT NULL', 'version', ())
+        if not row_list:
+            return None
+        try:
+            return json.loads(row_list[0][0])
+        except ValueError as e:
+            self.logger.warning(f'Invalid build checkpoint: {e}')
+            return None
+
+    def _resume_from_checkpoint(self) -> bool:
+        """
+        Prepare to resume an interrupted build.  Rows written after the last checkpoint are removed   
+        and the georow store is reloaded from the DB   
+        #Returns:   
+            True if build can be resumed   
+        """
+        checkpoint = self.get_checkpoint()
+        if checkpoint is None:
+            self.logger.info('No build checkpoint found.  Building database from start')
+            return False
+        if self.geodb.db.check_integrity():
+            self.logger.warning('Partial database is damaged.  Building database from start')
+            return False
+
+        self.checkpoint = checkpoint
+        self.geodb.db.begin()
+        for tbl, max_id in checkpoint['max_id'].items():
+            self.geodb.db.execute(f'DELETE FROM {tbl} WHERE id > ?', (max_id,))
+            # The removed rows were never part of a finished DB, so their ids are used again.  This gives the same
+            # ids as a build that wasn't interrupted
+            self.geodb.db.execute('UPDATE sqlite_sequence SET seq = ? WHERE name = ? AND seq > ?', (max_id, tbl, max_id))
+        self.geodb.db.commit()
+
+        if not checkpoint['altnames']:
+            self._load_georow_store()
+        return True
+
+    def _load_georow_store(self):
+        """
+        Load the georow store from the DB.  The alternate names step needs the main entry for each geoid.   
+        The first row for a geoid is the main entry   
+        """
+        for tbl in ['geodata', 'admin']:
+            for row in self.geodb.db.query(f'SELECT name, country, admin1_id, admin2_id, lat, lon, feature, geoid, sdx, pop '
+                                           f'FROM {tbl} ORDER BY id'):
+                self.georow_store.add(row)
+        self.logger.info(f'Loaded {len(self.georow_store):,} entries from database')
+
+    def _get_last_ids(self) -> Dict[str, int]:
+        """ Returns: dictionary of table: last row id used.  Ids of deleted rows are included (see start_bulk_insert) """
+        last_ids = {}
+        for tbl in ['geodata', 'admin', 'altname']:
+            seq_list = list(self.geodb.db.query('SELECT seq FROM sqlite_sequence WHERE name = ?', (tbl,)))
+            last_ids[tbl] = max(self.geodb.db.get_max_id(tbl), seq_list[0][0] if seq_list else 0)
+        return last_ids
+
+    def _decode_lines(self, file):
+        """ Generator - decode lines from binary file and track position in self.file_pos """
+        for line in file:
+            self.file_pos += len(line)
+            yield line.decode('utf-8', errors='replace')
+
+    def get_update_date(self) -> str:
+        """
+        Get date of the last geonames.org update files applied to DB   
+        #Returns:   
+            Date as YYYY-MM-DD.  '' if no updates have been applied since DB was built   
+        """
+        row_list = self.geodb.db.select('update_date', 'update_date IS NOT NULL', 'version', ())
+        if row_list:
+            return row_list[0][0]
+        return ''
+
+    def set_update_date(self, update_date: str):
+        """
+        Record date of the last geonames.org update files applied to DB.  Must be inside a DB transaction   
+        #Args:   
+            update_date: Date as YYYY-MM-DD   
+        """
+        # noinspection SqlWithoutWhere
+        self.geodb.db.execute('UPDATE version SET update_date = ?', (update_date,))
+
+    def apply_updates(self) -> bool:
         """
-        Create database indices for GEOID
+        Apply geonames.org daily update files in directory to the DB.  Files with a date after the last update   
+        recorded in the version table are applied in date order:   
+            modifications-YYYY-MM-DD.txt: new or changed entries (same format as allCountries.txt)   
+            deletes-YYYY-MM-DD.txt: deleted entries   
+            alternateNamesModifications-YYYY-MM-DD.txt: new or changed alternate names   
+            alternateNamesDeletes-YYYY-MM-DD.txt: deleted alternate names   
+        Changed entries are filtered and have name, soundex and feature calculated the same way as a full build.   
+        You must call open_geodb() before this.   
+        #Returns:   
+            True if error   
         """
-        self.geodb.db.create_index(create_index_sql='CREATE INDEX IF NOT EXISTS geoid_idx ON geodata(geoid  )')
-        self.geodb.db.create_index(create_index_sql='CREATE INDEX IF NOT EXISTS admgeoid_idx ON admin(geoid  )')
-        self.geodb.db.create_index(create_index_sql='CREATE INDEX IF NOT EXISTS altnamegeoid_idx ON altname(geoid  )')
+        if self.geodb is None:
+            self.logger.error('Cannot apply updates: geodb is None')
+            return True
+        if self.geodb.shards is not None:
+            self.logger.error('Cannot apply updates to a sharded database.  Use refresh_shard() for the country')
+            return True
+
+        # DBs built before update support don't have these columns
+        if self.geodb.db.add_column('version', 'update_date', 'text') or \
+                self.geodb.db.add_column('altname', 'alt_id', 'integer'):
+            return True
+
+        # Find update files that are newer than last update.  Dict key is date, value is dict of file type:path
+        last_date = self.get_update_date()
+        update_dct = {}
+        for fname in os.listdir(self.directory):
+            match = UPDATE_FILE_PATTERN.match(fname)
+            if match and match.group(2) > last_date:
+                update_dct.setdefault(match.group(2), {})[match.group(1)] = os.path.join(self.directory, fname)
+
+        if len(update_dct) == 0:
+            self.logger.info(f'No geonames update files after [{last_date}]')
+            return False
+
+        self.alternate_names.lookup_geoid = True
+        self.admin_changes = set()
+        start_time = time.time()
+
+        for idx, update_date in enumerate(sorted(update_dct)):
+            self.progress(f'Applying geonames updates for {update_date}', 100 * idx / len(update_dct))
+            files = update_dct[update_date]
+            self.geodb.db.begin()
+            if 'modifications' in files:
+                self._apply_modifications(files['modifications'])
+            if 'deletes' in files:
+                self._apply_deletes(files['deletes'])
+            if 'alternateNamesModifications' in files:
+                self._apply_alternate_name_modifications(files['alternateNamesModifications'])
+            if 'alternateNamesDeletes' in files:
+                self._apply_alternate_name_deletes(files['alternateNamesDeletes'])
+            self.set_update_date(update_date)
+            self.geodb.db.commit()
+
+        self.alternate_names.lookup_geoid = False
+        self.georow_store.clear()
+
+        # Set the names on new entries.  If admin entries changed, names for the whole country are set again
+        where = 'country_name IS NULL'
+        args = tuple(sorted(self.admin_changes))
+        if args:
+            where += f' OR country IN ({", ".join("?" * len(args))})'
+        self.admin_changes = None
+        if self.set_admin_names(where=where, args=args) or self.update_trigrams():
+            return True
+
+        self.geodb.db.set_optimize_pragma()
+        self.progress('Geonames updates applied', 100)
+        self.logger.info(f'Geonames updates applied through {max(update_dct)}. '
+                         f'Elapsed ={(time.time() - start_time):.1f} seconds')
+        return False
+
+    def _apply_modifications(self, path):
+        """
+        Replace the entries for each geoid in a geonames modifications file.  The entry's alternate names are   
+        added back with the new name, location, etc.   
+        #Args:   
+            path: path of modifications file   
+        """
+        self.logger.info(f'Apply modifications {path}')
+        with open(path, 'r', newline="", encoding='utf-8', errors='replace') as geofile:
+            reader = csv.reader(geofile, delimiter='\t')
+            for line_num, line in enumerate(reader):
+                try:
+                    geoname_row = Geofile_row._make(line)
+                except TypeError:
+                    self.logger.error(f'Unable to parse geoname location info in {path}  line {line_num + 1}')
+                    continue
+
+                # Get alternate names for this geoid before they are removed
+                alt_list = self.geodb.db.select('name, lang, alt_id', "geoid = ? AND lang != 'ut8'", 'altname',
+                                                (geoname_row.id,))
+                self._delete_geoid(geoname_row.id)
+
+                # Only add entry back if it's for a country and Feature tag we are interested in
+                if geoname_row.iso.lower() in self.supported_countries_dct and \
+                        geoname_row.feat_code in self.feature_code_list_dct:
+                    geo_tuple = self.insert_georow(geoname_row)
+                    self.insert_alternate_name(geoname_row.name, geoname_row.id, 'ut8', sdx=geo_tuple[Entry.SDX])
+                    for alt_name, lang, alt_id in alt_list:
+                        self.alternate_names.add_alternate_name(georow=geo_tuple, alt_name=alt_name,
+                                                                geoid=geoname_row.id, lang=lang, alt_id=alt_id)
+
+    def _apply_deletes(self, path):
+        """
+        Remove the entries for each geoid in a geonames deletes file   
+        #Args:   
+            path: path of deletes file   
+        """
+        self.logger.info(f'Apply deletes {path}')
+        with open(path, 'r', encoding='utf-8', errors='replace') as delete_file:
+            for line in delete_file:
+                geoid = line.split('\t', maxsplit=1)[0].strip()
+                if geoid != '':
+                    self._delete_geoid(geoid)
+
+    def _apply_alternate_name_modifications(self, path):
+        """
+        Replace each alternate name in a geonames alternateNamesModifications file   
+        #Args:   
+            path: path of alternateNamesModifications file   
+        """
+        self.logger.info(f'Apply alternate name modifications {path}')
+        with open(path, 'r', encoding='utf-8', errors='replace') as alt_file:
+            for line_num, line in enumerate(alt_file):
+                alt_id = line.split('\t', maxsplit=1)[0]
+                self._delete_alternate_name(alt_id)
+                self.alternate_names.handle_line(line_num + 1, line.rstrip('\n'))
+
+    def _apply_alternate_name_deletes(self, path):
+        """
+        Remove each alternate name in a geonames alternateNamesDeletes file   
+        #Args:   
+            path: path of alternateNamesDeletes file   
+        """
+        self.logger.info(f'Apply alternate name deletes {path}')
+        with open(path, 'r', encoding='utf-8', errors='replace') as alt_file:
+            for line in alt_file:
+                self._delete_alternate_name(line.split('\t', maxsplit=1)[0])
+
+    def _delete_geoid(self, geoid: str):
+        """ Remove all entries and alternate names for geoid """
+        self.georow_store.remove(geoid)
+        for table in ['geodata', 'admin']:
+            for row in self.geodb.db.query(f'SELECT country, feature FROM {table} WHERE geoid = ?', (geoid,)):
+                if row[1] in ADMIN_FEATURES:
+                    self.admin_changes.add(row[0])
+        for table in ['geodata', 'admin', 'altname']:
+            self.geodb.db.execute(f'DELETE FROM {table} WHERE geoid = ?', (geoid,))
+
+    def _delete_alternate_name(self, alt_id):
+        """
+        Remove an alternate name and the main DB entry that was created for it.   
+        Alternate names in DBs built before update support don't have an alt_id and aren't found   
+        #Args:   
+            alt_id: geonames.org alternateNameId   
+        """
+        row_list = self.geodb.db.select('name, geoid', 'alt_id = ?', 'altname', (alt_id,))
+        for alt_name, geoid in row_list:
+            # The entry for the alternate name is in the same table as the main entry.  ADM0 and ADM1 entries are in
+            # admin (see insert()).  The first entry for a geoid is the main entry.  Don't remove that
+            for table in ['geodata', 'admin']:
+                # Admin names are looked up from ADM0, ADM1 and ADM2 entries
+                for row in self.geodb.db.query(f'SELECT country, feature FROM {table} WHERE geoid = ? LIMIT 1', (geoid,)):
+                    if row[1] in ADMIN_FEATURES:
+                        self.admin_changes.add(row[0])
+                sql = f'''DELETE FROM {table} WHERE id = (SELECT MAX(id) FROM {table} WHERE geoid = ? AND name = ?)
+                         AND id > (SELECT MIN(id) FROM {table} WHERE geoid = ?)'''
+                self.geodb.db.execute(sql, (geoid, self.norm.normalize(alt_name, remove_commas=True), geoid))
+        self.geodb.db.execute('DELETE FROM altname WHERE alt_id = ?', (alt_id,))
 
     def create_main_indices(self):
         """
         Create indices for geoname database
         """
-        # Indices for geodata table
-        self.geodb.db.create_index(create_index_sql='CREATE INDEX IF NOT EXISTS name_idx ON geodata(name  , country, admin1_id  )')
-        self.geodb.db.create_index(create_index_sql='CREATE INDEX IF NOT EXISTS name_idx2 ON geodata(name  , country, feature  )')
-        self.geodb.db.create_index(create_index_sql='CREATE INDEX IF NOT EXISTS admin1_idx ON geodata(admin1_id , country, feature  )')
-        self.geodb.db.create_index(create_index_sql='CREATE INDEX IF NOT EXISTS sdx_idx ON geodata(sdx  , country, feature   )')
-        self.geodb.db.create_index(create_index_sql='CREATE INDEX IF NOT EXISTS admin2_idx ON geodata(admin1_id  , feature  , admin2_id )')
+        for sql in MAIN_INDEX_SQL:
+            self.geodb.db.create_index(create_index_sql=sql)
+
+    def create_word_index(self, schema='main', triggers=True) -> bool:
+        """
+        Create the FTS5 word index for a geodata table (see WORD_INDEX_SQL).  If SQLite doesn't have FTS5,   
+        no index is created and wildcard searches use LIKE on the table   
+        # Args:   
+            schema: schema of the geodata table, e.g. main or s_gb   
+            triggers: If True, add triggers to keep the index in step with changes to the table   
+        # Returns:   
+            True if error   
+        """
+        db = self.geodb.db
+        if not db.fts5_available():
+            self.logger.info('SQLite FTS5 is not available.  No word index created')
+            return False
+        sql_list = WORD_INDEX_SQL + (WORD_TRIGGER_SQL if triggers else [])
+        err = db.execute_transaction([sql.format(schema=schema) for sql in sql_list])
+        self.geodb.index_tables = {}
+        return err
+
+    def create_trigram_index(self, schema='main', triggers=True) -> bool:
+        """
+        Create the trigram index for a geodata table (see TRIGRAM_SQL)   
+        # Args:   
+            schema: schema of the geodata table, e.g. main or s_gb   
+            triggers: If True, add triggers to log changes to the table for update_trigrams()   
+        # Returns:   
+            True if error   
+        """
+        err = add_trigrams(self.geodb.db, schema)
+        if not err and triggers:
+            err = self.geodb.db.execute_transaction([sql.format(schema=schema) for sql in TRIGRAM_TRIGGER_SQL])
+        self.geodb.index_tables = {}
+        return err
 
-        # Indices for admin table
-        self.geodb.db.create_index(create_index_sql='CREATE INDEX IF NOT EXISTS adm_name_idx ON admin(name  , country  )')
-        self.geodb.db.create_index(create_index_sql='CREATE INDEX IF NOT EXISTS adm_admin1_idx ON admin(admin1_id  , feature  )')
-        self.geodb.db.create_index(create_index_sql='CREATE INDEX IF NOT EXISTS adm_country_idx ON admin(country  , feature  )')
-        self.geodb.db.create_index(create_index_sql='CREATE INDEX IF NOT EXISTS adm_sdx_idx ON admin(sdx  )')
+    def update_trigrams(self) -> bool:
+        """
+        Apply the geodata changes logged in trigram_pending by the trigram triggers to the trigram index   
+        # Returns:   
+            True if error   
+        """
+        db = self.geodb.db
+        if not db.table_exists('trigram_pending'):
+            return False
+        row_list = list(db.query('SELECT id, name, country, added FROM trigram_pending ORDER BY rowid'))
+        if len(row_list) == 0:
+            return False
+        err = False
+        db.begin()
+        for row_id, name, iso, added in row_list:
+            keys = [(key, row_id) for key in GeoSearch.get_trigram_keys(name or '', iso or '')]
+            if added:
+                err = db.executemany('INSERT OR IGNORE INTO trigram(gram, id) VALUES (?, ?)', keys) or err
+            else:
+                err = db.executemany('DELETE FROM trigram WHERE gram = ? AND id = ?', keys) or err
+        # noinspection SqlWithoutWhere
+        db.execute('DELETE FROM trigram_pending', None)
+        db.commit()
+        self.logger.info(f'Trigram index updated for {len(row_list)} changes')
+        return err
 
     def create_alt_indices(self):
         # Indices for altname table
         self.logger.debug('create alt index')
-        self.geodb.db.create_index(create_index_sql='CREATE INDEX IF NOT EXISTS alt_sdx_idx ON altname(sdx  )')
+        for sql in ALT_INDEX_SQL:
+            self.geodb.db.create_index(create_index_sql=sql)
+
+    def set_admin_names(self, where='1', args=()) -> bool:
+        """
+        Store the admin1, admin2 and country names on each geodata and admin row so a lookup result has its   
+        names without follow-up queries.  The names are looked up from the row's IDs the same way   
+        GeoSearch.update_names() does.  Names that aren't found are stored as ''   
+        # Args:   
+            where: SQL condition for the rows to update, e.g. "country = ?"   
+            args: Args tuple for where   
+        # Returns:   
+            True if error   
+        """
+        start_time = time.time()
+        db = self.geodb.db
+        # Names cached by earlier lookups may be out of date
+        GeoSearch.GeoSearch._get_name.cache_clear()
+
+        # Rows with the same IDs have the same names, so only look up each set of IDs once
+        key_set = set()
+        for table in self._get_row_tables():
+            key_set.update(db.query(f'SELECT DISTINCT country, admin1_id, admin2_id, {NAME_KIND_SQL} '
+                                    f'FROM {table} WHERE {where}', args))
+        name_rows = [key + self._get_admin_names(*key) for key in key_set]
+
+        db.begin()
+        db.execute('CREATE TEMP TABLE IF NOT EXISTS admin_names(country text, admin1_id text, admin2_id text, '
+                   'kind integer, admin1_name text, admin2_name text, country_name text, '
+                   'PRIMARY KEY(country, admin1_id, admin2_id, kind))', None)
+        # noinspection SqlWithoutWhere
+        db.execute('DELETE FROM temp.admin_names', None)
+        err = db.executemany('INSERT OR IGNORE INTO temp.admin_names VALUES(?,?,?,?,?,?,?)', name_rows)
+        db.commit()
+
+        for table in self._get_row_tables():
+            if err:
+                break
+            tbl = table.rpartition('.')[2]
+            err = db.execute_transaction([
+                f'''UPDATE {table} SET ({', '.join(NAME_COLUMNS)}) = 
+                    (SELECT n.admin1_name, n.admin2_name, n.country_name FROM temp.admin_names n 
+                     WHERE n.country = {tbl}.country AND n.admin1_id = {tbl}.admin1_id 
+                     AND n.admin2_id = {tbl}.admin2_id AND n.kind = {NAME_KIND_SQL}) 
+                    WHERE {where}'''], args)
+        db.execute_transaction(['DROP TABLE IF EXISTS temp.admin_names'])
+        self.logger.info(f'Admin names set for {len(name_rows):,} sets of IDs.  '
+                         f'Elapsed = {(time.time() - start_time):.1f} seconds')
+        return err
+
+    def _get_admin_names(self, iso, admin1_id, admin2_id, kind) -> (str, str, str):
+        """
+        Look up the names for a row's IDs the way GeoSearch.update_names() does   
+        # Args:   
+            iso, admin1_id, admin2_id: IDs from row   
+            kind: 0 for country rows, 1 for ADM1 rows, 2 for all others.  See NAME_KIND_SQL   
+        # Returns:   
+            (admin1_name, admin2_name, country_name)   
+        """
+        admin1_name = ''
+        admin2_name = ''
+        if kind != 0 and admin1_id != '':
+            admin2_id = admin2_id if kind == 2 else ''
+            admin1_name = self.geodb.s.get_admin1_name(admin1_id, str(iso)) or ''
+            admin2_name = self.geodb.s.get_admin2_name(admin1_id, admin2_id, str(iso)) or ''
+        return admin1_name, admin2_name, str(self.geodb.s.get_country_name(str(iso)))
+
+    def _get_row_tables(self):
+        """
+        Generator - the geodata and admin tables.  In a sharded DB each shard is attached as it is reached   
+        """
+        yield 'main.admin'
+        if self.geodb.shards is not None:
+            yield from self.geodb.shards.get_tables('')
+        else:
+            yield 'main.geodata'
+
+    def check_manifest(self) -> str:
+        """
+        Compare the inputs recorded in the DB manifest with the current geonames.org files and filter settings.   
+        If only the language list or the alternate names file changed, the alternate names are redone   
+        # Returns:   
+            '' if the DB can be used.  Otherwise a message with the reason the DB must be rebuilt   
+        """
+        # In a sharded DB, changes to a country file are loaded with refresh_shard()
+        country_files = GEONAME_FILES[1:] if self.geodb.shards is not None else []
+        change = self.manifest.compare(self.geodb.db, ignore_files=country_files)
+        if change == BuildManifest.UNKNOWN:
+            self.logger.info('Database has no build manifest.  Unable to check inputs')
+        elif change == BuildManifest.ALTNAMES:
+            self.logger.info(f'Inputs changed: {self.manifest.changed}.  Redoing alternate names')
+            if self.redo_alternate_names():
+                change = BuildManifest.REBUILD
+        elif change == BuildManifest.SAME and self.manifest.touched:
+            self.geodb.db.begin()
+            self.manifest.update_touched(self.geodb.db)
+            self.geodb.db.commit()
+        if change == BuildManifest.REBUILD:
+            return f'Database inputs changed:\n\n{", ".join(self.manifest.changed)}\n\nRebuilding database.'
+        return ''
+
+    def redo_alternate_names(self) -> bool:
+        """
+        Delete the rows added by the alternate names and aliases steps of the build and the country names, and   
+        add them again for the current language list.  This is used when only the language list or alternate names file changed.  It isn't possible for a DB that   
+        has had updates applied, is sharded, or was built without the id where the alternate names step started   
+        # Returns:   
+            True if error.  The DB must be rebuilt   
+        """
+        alt_start = self.get_version_info('alt_start')
+        if alt_start is None or self.get_update_date() != '' or self.geodb.shards is not None:
+            self.logger.info('Alternate names cannot be redone for this database')
+            return True
+
+        start_time = time.time()
+        db = self.geodb.db
+        # Use a rollback journal so an interrupted pass leaves a consistent DB.  Since the manifest isn't  
+        # updated until the end, the pass is redone on the next open
+        db.set_pragma('PRAGMA journal_mode = truncate')
+        sql_list = [f'DELETE FROM {tbl} WHERE id > {int(last_id)}' for tbl, last_id in alt_start.items()]
+        # Country names are localized for the language list
+        sql_list.append("DELETE FROM admin WHERE feature = 'ADM0' AND typeof(geoid) = 'text'")
+        err = db.execute_transaction(sql_list)
+        if not err:
+            self.georow_store.clear()
+            self.alternate_names.lookup_geoid = False
+            self.country = Country.Country(progress=self.progress_bar, geo_files=self, lang_list=self.lang_list)
+            self.country.add_country_names_to_db(geobuild=self)
+            self._load_georow_store()
+            self.checkpoint = {}
+            err = self.alternate_names.add_alternate_names_to_db()
+            self.georow_store.clear()
+        if not err:
+            self.norm.add_aliases_to_db(self)
+            # The country names are localized, so all names are set again
+            err = self.set_admin_names() or self.update_trigrams()
+        if not err:
+            db.begin()
+            self.manifest.write(db)
+            # noinspection SqlWithoutWhere
+            db.execute('UPDATE version SET checkpoint = NULL', None)
+            db.commit()
+            db.analyze()
+
+        db.set_pragma('PRAGMA journal_mode = off')
+        if os.path.exists(self.geodb.db_path + '-journal'):
+            os.remove(self.geodb.db_path + '-journal')
+        self.logger.info(f'Alternate names redone.  Elapsed = {(time.time() - start_time):.1f} seconds')
+        return err
+
+    def migrate_geodb(self, ver: int) -> bool:
+        """
+        Upgrade the DB schema in place, one version at a time, using the functions in self.migrations.   
+        This is much faster than rebuilding from the geonames.org files   
+        # Args:   
+            ver: current DB version   
+        # Returns:   
+            True if error.  The DB is left at the last version that was completed   
+        """
+        self.progress(f'Upgrading database from V {ver} to V {self.required_db_version}', 50)
+        # Use a rollback journal so a failed step leaves the DB unchanged
+        self.geodb.db.set_pragma('PRAGMA journal_mode = truncate')
+        err = False
+        while ver != self.required_db_version:
+            if ver not in self.migrations:
+                self.logger.warning(f'No migration from V {ver}')
+                err = True
+                break
+            start_time = time.time()
+            err = self.migrations[ver]()
+            if err:
+                self.logger.error(f'Database migration from V {ver} failed: {self.geodb.db.err}')
+                break
+            ver += 1
+            self.logger.info(f'Database upgraded to V {ver}.  Elapsed = {(time.time() - start_time):.1f} seconds')
+        self.geodb.db.set_pragma('PRAGMA journal_mode = off')
+        if os.path.exists(self.geodb.db_path + '-journal'):
+            os.remove(self.geodb.db_path + '-journal')
+        if not err:
+            # Reclaim the space freed by the smaller schema
+            self.geodb.db.set_pragma('VACUUM')
+            self.geodb.db.analyze()
+        self.progress('', 100)
+        return err
+
+    def _migrate_v4_to_v5(self) -> bool:
+        """
+        V5 stores lat/lon as REAL and geoid as INTEGER, and uses BINARY collation for text.   
+        Copy each table into the new schema and recreate the indices.   
+        # Returns:   
+            True if error   
+        """
+        db = self.geodb.db
+        # V4 DBs built before alt_id was added
+        if db.add_column('altname', 'alt_id', 'integer'):
+            return True
+
+        sql_list = [f'DROP INDEX IF EXISTS {row[0]}' for row in
+                    db.query("SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL")]
+        geo_columns = 'id, name, country, admin1_id, admin2_id, lat, lon, feature, geoid, sdx'
+        for tbl, columns in [('geodata', geo_columns), ('admin', geo_columns),
+                             ('altname', 'id, name, lang, geoid, sdx, alt_id')]:
+            sql_list.append(f'ALTER TABLE {tbl} RENAME TO {tbl}_v4')
+            sql_list.append(TABLE_SQL[tbl])
+            # Column affinity converts lat/lon and numeric geoids.  Duplicates from older builds are dropped
+            sql_list.append(f'INSERT OR IGNORE INTO {tbl}({columns}) SELECT {columns} FROM {tbl}_v4 ORDER BY id')
+            sql_list.append(f'DROP TABLE {tbl}_v4')
+        sql_list.extend(MAIN_INDEX_SQL + ALT_INDEX_SQL)
+        sql_list.append('UPDATE version SET version = 5')
+        return db.execute_transaction(sql_list)
+
+
+    def _migrate_v5_to_v6(self) -> bool:
+        """
+        V6 adds the admin1, admin2 and country names to each geodata and admin row.  Add the columns   
+        (to each shard in a sharded DB) and fill them in   
+        # Returns:   
+            True if error   
+        """
+        db = self.geodb.db
+        for table in self._get_row_tables():
+            for column in NAME_COLUMNS:
+                if db.add_column(table, column, 'text'):
+                    return True
+        if self.set_admin_names():
+            return True
+        return db.execute_transaction(['UPDATE version SET version = 6'])
+
+    def _migrate_v6_to_v7(self) -> bool:
+        """
+        V7 adds population and priority to each geodata and admin row and adds priority to the name indices.   
+        Population isn't known without the geonames.org files, so priority is set from the feature only   
+        # Returns:   
+            True if error   
+        """
+        db = self.geodb.db
+        for table in self._get_row_tables():
+            schema, _, tbl = table.rpartition('.')
+            for column in ['pop', 'priority']:
+                if db.add_column(table, column, 'integer'):
+                    return True
+            index_sql = ADMIN_INDEX_SQL if tbl == 'admin' else GEODATA_INDEX_SQL
+            sql_list = [f'UPDATE {table} SET pop = 0, priority = {get_priority_sql()}',
+                        f'DROP INDEX IF EXISTS {schema}.{"adm_name_idx" if tbl == "admin" else "name_idx"}']
+            sql_list.extend(sql.replace('IF NOT EXISTS ', f'IF NOT EXISTS {schema}.') for sql in index_sql)
+            sql_list.append(f'ANALYZE {schema}.{tbl}')
+            if db.execute_transaction(sql_list):
+                return True
+        return db.execute_transaction(['UPDATE version SET version = 7'])
+
+    def _migrate_v7_to_v8(self) -> bool:
+        """
+        V8 adds the FTS5 word index to the geodata table, or to each shard in a sharded DB   
+        # Returns:   
+            True if error   
+        """
+        for table in self._get_row_tables():
+            schema, _, tbl = table.rpartition('.')
+            if tbl == 'geodata' and self.create_word_index(schema=schema, triggers=self.geodb.shards is None):
+                return True
+        return self.geodb.db.execute_transaction(['UPDATE version SET version = 8'])
 
+    def _migrate_v8_to_v9(self) -> bool:
+        """
+        V9 adds the trigram index to the geodata table, or to each shard in a sharded DB   
+        # Returns:   
+            True if error   
+        """
+        for table in self._get_row_tables():
+            schema, _, tbl = table.rpartition('.')
+            if tbl == 'geodata' and self.create_trigram_index(schema=schema, triggers=self.geodb.shards is None):
+                return True
+        return self.geodb.db.execute_transaction(['UPDATE version SET version = 9'])
+
+    def _migrate_v9_to_v10(self) -> bool:
+        """
+        V10 adds the reversed name and its index to each geodata and admin row   
+        # Returns:   
+            True if error   
+        """
+        db = self.geodb.db
+        # SQLite doesn't have a string reverse function
+        db.conn.create_function('reverse_name', 1, lambda name: name[::-1] if name else name)
+        for table in self._get_row_tables():
+            schema, _, tbl = table.rpartition('.')
+            if db.add_column(table, 'rev_name', 'text'):
+                return True
+            index_sql = ADMIN_INDEX_SQL if tbl == 'admin' else GEODATA_INDEX_SQL
+            sql_list = [f'UPDATE {table} SET rev_name = reverse_name(name)']
+            sql_list.extend(sql.replace('IF NOT EXISTS ', f'IF NOT EXISTS {schema}.') for sql in index_sql)
+            sql_list.append(f'ANALYZE {schema}.{tbl}')
+            if db.execute_transaction(sql_list):
+                return True
+        return db.execute_transaction(['UPDATE version SET version = 10'])
+
+    def create_shards(self) -> bool:
+        """
+        Move the geodata rows for each country into its own shard file (see ShardSet).  The admin, altname and   
+        version tables stay in the main DB.  The list of countries is saved in the build checkpoint and is   
+        written to the version table when the build completes   
+        # Returns:   
+            True if error   
+        """
+        db = self.geodb.db
+        db.create_index('CREATE INDEX IF NOT EXISTS shard_country_idx ON geodata(country)')
+        countries = sorted(row[0] for row in db.query('SELECT DISTINCT country FROM geodata'))
+        self.report.add(rows_moved=db.get_row_count('geodata'))
+        if self._write_shards(countries):
+            return True
+
+        # Remove shards for countries that are no longer loaded
+        for fname in os.listdir(ShardSet.get_shard_directory(self.geodb.db_path)):
+            match = re.match(r'^geodata_(\w+)\.db$', fname)
+            if match and match.group(1) not in countries:
+                os.remove(os.path.join(ShardSet.get_shard_directory(self.geodb.db_path), fname))
+
+        db.begin()
+        # noinspection SqlWithoutWhere
+        db.execute('DELETE FROM geodata', None)
+        db.execute('DROP INDEX IF EXISTS shard_country_idx', None)
+        self.save_checkpoint(shards=countries)
+        db.commit()
+        self.report.add(shards=len(countries))
+        self.logger.info(f'Created {len(countries)} country shards')
+        return False
+
+    def _write_shards(self, countries: [str]) -> bool:
+        """
+        Copy the geodata rows for each country from main.geodata into a new shard file and index the shards.   
+        Each shard is written to a .building file and swapped into place when all shards are indexed   
+        # Args:   
+            countries: ISO codes of the shards to write   
+        # Returns:   
+            True if error   
+        """
+        db = self.geodb.db
+        os.makedirs(ShardSet.get_shard_directory(self.geodb.db_path), exist_ok=True)
+        path_list = []
+        for idx, iso in enumerate(countries):
+            self.progress(f'Writing shard for {iso}', 100 * idx / len(countries))
+            path = ShardSet.get_shard_path(self.geodb.db_path, iso) + '.building'
+            if os.path.exists(path):
+                os.remove(path)
+            shard_db = DB.DB(db_filename=path, show_message=False, exit_on_error=False)
+            shard_db.create_table(TABLE_SQL['geodata'])
+            shard_db.conn.close()
+
+            # Rows keep their main DB id so ids are unique across shards
+            db.conn.execute('ATTACH DATABASE ? AS shard', (path,))
+            db.begin()
+            db.execute('INSERT INTO shard.geodata SELECT * FROM main.geodata WHERE country = ? ORDER BY id', (iso,))
+            db.commit()
+            db.conn.execute('DETACH DATABASE shard')
+            path_list.append(path)
+
+        self.progress('Creating shard indices', 50)
+        if self.workers > 1:
+            with multiprocessing.Pool(processes=self.workers) as pool:
+                err_list = pool.map(_index_shard, path_list)
+        else:
+            err_list = [_index_shard(path) for path in path_list]
+
+        if any(err_list):
+            self.logger.error('Unable to create shard indices')
+            for path in path_list:
+                os.remove(path)
+            return True
+
+        for iso, path in zip(countries, path_list):
+            os.replace(path, ShardSet.get_shard_path(self.geodb.db_path, iso))
+        return False
+
+    def set_version_info(self, column: str, value):
+        """
+        Save a value as JSON in the version table, e.g. the list of countries with shards.  The column is added if   
+        needed.  Call this after insert_version()   
+        # Args:   
+            column: version table column   
+            value: value to save   
+        """
+        self.geodb.db.add_column('version', column, 'text')
+        self.geodb.db.begin()
+        # noinspection SqlWithoutWhere
+        self.geodb.db.execute(f'UPDATE version SET {column} = ?', (json.dumps(value),))
+        self.geodb.db.commit()
+
+    def get_version_info(self, column: str):
+        """
+        Get a value saved with set_version_info()   
+        # Args:   
+            column: version table column   
+        # Returns:   
+            value or None if not set   
+        """
+        if not self.geodb.db.column_exists('version', column):
+            return None
+        row_list = list(self.geodb.db.query(f'SELECT {column} FROM version WHERE {column} IS NOT NULL'))
+        return json.loads(row_list[0][0]) if row_list else None
+
+    def refresh_shard(self, iso: str) -> bool:
+        """
+        Rebuild the shard for one country in a sharded DB from the geonames.org file for the country   
+        (e.g. GB.txt or GB.zip) and alternateNamesV2.txt.  The admin entries and alternate names for the country   
+        are replaced.  Other shards are not changed.  You must call open_geodb() before this.   
+        # Args:   
+            iso: country ISO code   
+        # Returns:   
+            True if error   
+        """
+        iso = iso.lower()
+        fname = f'{iso.upper()}.txt'
+        if self.geodb is None or self.geodb.shards is None:
+            self.logger.error('Cannot refresh shard: database is not sharded')
+            return True
+        if not (len(iso) == 2 and iso.isalpha()):
+            self.logger.error(f'Cannot refresh shard: invalid country [{iso}]')
+            return True
+        if FileReader.find_file(self.directory, fname) is None:
+            self.logger.error(f'Cannot refresh shard: {fname} not found in {self.directory}')
+            return True
+
+        start_time = time.time()
+        db = self.geodb.db
+        shards = self.geodb.shards
+        db.set_pragma('PRAGMA journal_mode = truncate')
+
+        # Remove the country's entries.  Historic entries aren't in the geonames files so they are kept
+        schema = shards.attach(iso) if iso in shards.countries else None
+        # noinspection SqlWithoutWhere
+        sql_list = ['DELETE FROM main.geodata']
+        if schema:
+            sql_list.append(f'DELETE FROM altname WHERE geoid IN (SELECT geoid FROM {schema}.geodata)')
+            sql_list.append(f"INSERT INTO main.geodata SELECT * FROM {schema}.geodata WHERE typeof(geoid) != 'integer'")
+        sql_list.append(f"DELETE FROM altname WHERE geoid IN "
+                        f"(SELECT geoid FROM admin WHERE country = '{iso}' AND typeof(geoid) = 'integer')")
+        sql_list.append(f"DELETE FROM admin WHERE country = '{iso}' AND typeof(geoid) = 'integer'")
+        err = db.execute_transaction(sql_list)
+        shards.detach_all()
+
+        if not err:
+            # Load the country into main.geodata.  Lookups for aliases use main.geodata until the shard is written
+            self.geodb.shards = None
+            self.georow_store.clear()
+            self.report = BuildReport.BuildReport()
+            self.checkpoint = {'files_done': [], 'file_count': 0, 'file': '', 'offset': 0, 'line': 0,
+                               'indices': True, 'altnames': False, 'alt_offset': 0, 'alt_line': 0}
+            err = self._add_geoname_file_to_db(fname, f'Refresh {iso}) ')
+
+        if not err:
+            # Only alternate names for entries in the georow store (this country) are added
+            err = self.alternate_names.add_alternate_names_to_db()
+            self.georow_store.clear()
+            self.norm.add_aliases_to_db(self, country_iso=iso)
+            err = err or self.set_admin_names(where='country = ?', args=(iso,)) or self._write_shards([iso])
+
+        if not err:
+            db.begin()
+            # noinspection SqlWithoutWhere
+            db.execute('DELETE FROM main.geodata', None)
+            db.execute('UPDATE version SET checkpoint = NULL', None)
+            self.manifest.update_file(db, fname)
+            db.commit()
+            self.set_version_info('shards', sorted(set(shards.countries) | {iso}))
+        else:
+            self.logger.error(f'Unable to refresh shard for {iso}.  Shard file is unchanged')
+
+        db.set_pragma('PRAGMA journal_mode = off')
+        if os.path.exists(self.geodb.db_path + '-journal'):
+            os.remove(self.geodb.db_path + '-journal')
+        self.geodb.open_shards()
+        self.logger.info(f'Refreshed shard for {iso}.  Elapsed = {(time.time() - start_time):.1f} seconds')
+        return err
+
+
+def get_priority(feature: str, pop: int) -> int:
+    """
+    Rank of an entry for ORDER BY priority DESC.  Higher is more important   
+    # Args:   
+        feature: normalized feature code   
+        pop: population   
+    # Returns:   
+        Feature priority (see Geodata.feature_priority) * 10 plus the number of digits in the population (max 9)   
+    """
+    feat_priority = Geodata.feature_priority.get(feature) or Geodata.feature_priority['DEFAULT']
+    return feat_priority * 10 + min(len(str(pop)) if pop > 0 else 0, 9)
+
+
+def get_priority_sql() -> str:
+    """ Returns: SQL expression for get_priority() of a row with no population """
+    cases = ' '.join(f"WHEN '{feat}' THEN {val * 10}" for feat, val in Geodata.feature_priority.items() if val)
+    return f"CASE feature {cases} ELSE {Geodata.feature_priority['DEFAULT'] * 10} END"
+
+
+def make_georows(geoname_row: Geofile_row, norm: 'Normalize.Normalize') -> [()]:
+    """
+        Create the geo tuples to insert for a geonames.org row.  Name is normalized, soundex is added,  
+        and feature is normalized (this creates new Feature codes PP1M, P1HK, and P10K using population data).   
+        USA states get a second entry with the state abbreviation as the name   
+    Args:
+        geoname_row: Geofile_row from geonames.org file
+        norm: Normalize instance
+
+    Returns:
+        list of geo tuples.  The first entry is the main entry
+    """
+    geo_row = [None] * GeoSearch.Entry.MAX
+    geo_row[GeoSearch.Entry.NAME] = norm.normalize(geoname_row.name, remove_commas=True)
+    geo_row[GeoSearch.Entry.SDX] = GeoSearch.get_soundex(geo_row[GeoSearch.Entry.NAME])
+    geo_row[GeoSearch.Entry.ISO] = geoname_row.iso.lower()
+    geo_row[GeoSearch.Entry.ADM1] = geoname_row.admin1_id
+    geo_row[GeoSearch.Entry.ADM2] = geoname_row.admin2_id
+    geo_row[GeoSearch.Entry.LAT] = geoname_row.lat
+    geo_row[GeoSearch.Entry.LON] = geoname_row.lon
+    geo_row[GeoSearch.Entry.ID] = geoname_row.id
+    geo_row[GeoSearch.Entry.POP] = int(geoname_row.pop)
+
+    # Simplify feature type for Abbey/Priory, Castle, and Church.  Set feature based on population
+    geo_row[GeoSearch.Entry.FEAT] = norm.feature_normalize(feature=geoname_row.feat_code,
+                                                           name=geo_row[GeoSearch.Entry.NAME], pop=geo_row[GeoSearch.Entry.POP])
+    geo_tuple_list = [tuple(geo_row)]
+
+    # Add abbreviations for USA states
+    if geo_row[GeoSearch.Entry.ISO] == 'us' and geoname_row.feat_code == 'ADM1':
+        geo_row[GeoSearch.Entry.NAME] = norm.normalize(geoname_row.admin1_id, remove_commas=True)
+        geo_row[GeoSearch.Entry.SDX] = GeoSearch.get_soundex(geo_row[GeoSearch.Entry.NAME])
+        geo_tuple_list.append(tuple(geo_row))
+    return geo_tuple_list
+
+
+# Settings for parallel build worker processes.  Set by _init_parse_worker
+_parse_worker = {}
+
+
+def _init_parse_worker(supported_countries_dct, feature_code_list_dct):
+    """ Initialize a parallel build worker process """
+    _parse_worker['norm'] = Normalize.Normalize()
+    _parse_worker['countries'] = supported_countries_dct
+    _parse_worker['features'] = feature_code_list_dct
+
+
+def _parse_geoname_chunk(chunk: bytes):
+    """
+        Parallel build worker.  Filter, normalize and soundex the geoname lines in chunk
+    Args:
+        chunk: bytes from geoname file.  Chunk ends on a line boundary
+
+    Returns:
+        (chunk length, line count, list of line numbers that couldn't be parsed,
+        (lines rejected by country, lines rejected by feature),
+        list of (feat_code, geo_tuple, name for altname table or None))
+    """
+    norm = _parse_worker['norm']
+    countries = _parse_worker['countries']
+    features = _parse_worker['features']
+    row_list = []
+    bad_lines = []
+    line_count = 0
+    rejected_country = 0
+    rejected_feature = 0
+
+    reader = csv.reader(io.StringIO(chunk.decode('utf-8', errors='replace'), newline=""), delimiter='\t')
+    for line in reader:
+        line_count += 1
+        try:
+            geoname_row = Geofile_row._make(line)
+        except TypeError:
+            bad_lines.append(line_count)
+            continue
+
+        # Only handle line if it's for a country and Feature tag we are interested in
+        if geoname_row.iso.lower() not in countries:
+            rejected_country += 1
+        elif geoname_row.feat_code not in features:
+            rejected_feature += 1
+        else:
+            alt_name = geoname_row.name
+            for geo_tuple in make_georows(geoname_row, norm):
+                row_list.append((geoname_row.feat_code, geo_tuple, alt_name))
+                alt_name = None
+    return len(chunk), line_count, bad_lines, (rejected_country, rejected_feature), row_list
+
+
+def add_trigrams(db: DB.DB, schema: str) -> bool:
+    """
+    Create the trigram table for a geodata table and add the trigram keys for each row (see TRIGRAM_SQL)
+    Args:
+        db: DB instance
+        schema: schema of the geodata table, e.g. main or s_gb
+
+    Returns:
+        True if error
+    """
+    if db.execute_transaction([TRIGRAM_SQL.format(schema=schema)]):
+        return True
+    sql = f'INSERT OR IGNORE INTO {schema}.trigram(gram, id) VALUES (?, ?)'
+    err = False
+    keys = []
+    db.begin()
+    for row_id, name, iso in db.query(f'SELECT id, name, country FROM {schema}.geodata'):
+        keys.extend((key, row_id) for key in GeoSearch.get_trigram_keys(name or '', iso or ''))
+        if len(keys) >= TRIGRAM_BATCH:
+            err = db.executemany(sql, keys) or err
+            keys = []
+    err = db.executemany(sql, keys) or err
+    db.commit()
+    return err
+
+
+def _index_shard(path: str) -> bool:
+    """
+    Create the geodata indices, word index and trigram index for a shard file and analyze it.  Runs in a worker   
+    process if workers > 1
+    Args:
+        path: path of shard file
+
+    Returns:
+        True if error
+    """
+    shard_db = DB.DB(db_filename=path, show_message=False, exit_on_error=False)
+    shard_db.set_speed_pragmas()
+    err = False
+    for sql in GEODATA_INDEX_SQL:
+        err = shard_db.create_index(create_index_sql=sql) or err
+    if shard_db.fts5_available():
+        # Shard files are replaced rather than changed, so the word index doesn't need triggers
+        err = shard_db.execute_transaction([sql.format(schema='main') for sql in WORD_INDEX_SQL]) or err
+    err = add_trigrams(shard_db, 'main') or err
+    shard_db.analyze()
+    shard_db.conn.close()
+    return err
+
+
+def _read_chunks(file, chunk_size):
+    """ Generator - read binary file in chunks of about chunk_size bytes.  Each chunk ends on a line boundary """
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            break
+        if chunk[-1:] != b'\n':
+            chunk += file.readline()
+        yield chunk
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2019.       Mike Herbert
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+"""
+In-memory store of the main DB entry for each geoid.  Used while building the DB so the alternate names pass
+can copy an entry without a DB lookup.
+"""
+from array import array
+
+from geodata.GeoUtil import Entry
+
+# Key values for slots in the hash table.  Numeric geoids are never negative
+_EMPTY = -1
+_DELETED = -2
+_MAX_KEY = 2 ** 63 - 1
+# Multiplier to spread runs of sequential geoids across the table
+_MULT = 0x9E3779B97F4A7C15
+
+
+class GeorowStore:
+    """
+    Compact store of geo rows keyed by geoid.  Only the first row added for a geoid is kept (the main entry).
+    Numeric geoids are kept in an open addressing hash table made of two int64 arrays: the geoid and the offset
+    of its row in a byte buffer.  Each row is stored in the buffer as a tab separated UTF-8 line.  This avoids
+    a Python int, str and dict entry per geoid and uses about half the memory of a dictionary of strings.
+    Non numeric geoids (e.g. historic entries) are kept in a dictionary.
+    """
+
+    def __init__(self, capacity=1024):
+        """
+        #Args:
+            capacity: initial number of hash table slots.  The table grows as needed
+        """
+        self._initial_capacity = capacity
+        self.clear()
+
+    @staticmethod
+    def _key(geoid):
+        # geoid can be int (from DB), str or bytes.  Returns int for numeric geoids, otherwise str
+        if isinstance(geoid, int):
+            return geoid
+        if geoid.isdigit() and int(geoid) <= _MAX_KEY:
+            return int(geoid)
+        if isinstance(geoid, bytes):
+            return geoid.decode('utf-8', errors='replace')
+        return geoid
+
+    def _find(self, key: int) -> int:
+        """
+        Find the hash table slot for key
+        #Args:
+            key: numeric geoid
+        #Returns:
+            slot for key.  If key isn't in the table, returns -(slot + 1) for the slot to add it in
+        """
+        keys = self._keys
+        mask = self._mask
+        slot = ((key * _MULT) >> 32) & mask
+        free_slot = -1
+        while True:
+            val = keys[slot]
+            if val == key:
+                return slot
+            if val == _EMPTY:
+                return -((slot if free_slot < 0 else free_slot) + 1)
+            if val == _DELETED and free_slot < 0:
+                free_slot = slot
+            slot = (slot + 1) & mask
+
+    def _resize(self, capacity: int):
+        """ Rehash the table with capacity slots.  Deleted slots are dropped """
+        old_keys = self._keys
+        old_offsets = self._offsets
+        self._keys = array('q', [_EMPTY]) * capacity
+        self._offsets = array('q', [0]) * capacity
+        self._mask = capacity - 1
+        self._used = 0
+        for idx, key in enumerate(old_keys):
+            if key >= 0:
+                slot = -self._find(key) - 1
+                self._keys[slot] = key
+                self._offsets[slot] = old_offsets[idx]
+                self._used += 1
+
+    def add(self, geo_row) -> None:
+        """
+        Add geo_row to store unless there is already an entry for its geoid
+        #Args:
+            geo_row: DB row  (name, iso, adm1, adm2, lat, lon, feat, geoid, sdx, pop).  Fields must not contain tabs or   
+                newlines.  Rows read from the DB have numeric lat, lon, geoid and pop.  These are stored as text
+        """
+        key = self._key(geo_row[Entry.ID])
+        if isinstance(key, str):
+            if key not in self._other:
+                self._other[key] = '\t'.join(map(str, geo_row[0:Entry.POP + 1]))
+            return
+
+        slot = self._find(key)
+        if slot >= 0:
+            return
+        slot = -slot - 1
+        if self._keys[slot] == _EMPTY:
+            self._used += 1
+        self._keys[slot] = key
+        self._offsets[slot] = len(self._rows)
+        self._rows += '\t'.join(map(str, geo_row[0:Entry.POP + 1])).encode('utf-8') + b'\n'
+        self._count += 1
+        # Keep load factor below 2/3 so probe sequences stay short
+        if self._used * 3 > len(self._keys) * 2:
+            self._resize(len(self._keys) * 2)
+
+    def get(self, geoid: str) -> [(), None]:
+        """
+        Get the main entry for geoid
+        #Args:
+            geoid: geonames.org geoid
+        #Returns:
+            geo_row tuple or None if geoid isn't in store
+        """
+        key = self._key(geoid)
+        if isinstance(key, str):
+            val = self._other.get(key)
+            return None if val is None else tuple(val.split('\t'))
+        slot = self._find(key)
+        if slot < 0:
+            return None
+        start = self._offsets[slot]
+        end = self._rows.index(b'\n', start)
+        return tuple(self._rows[start:end].decode('utf-8').split('\t'))
+
+    def __contains__(self, geoid):
+        key = self._key(geoid)
+        if isinstance(key, str):
+            return key in self._other
+        return self._find(key) >= 0
+
+    def remove(self, geoid: str) -> None:
+        """ Remove the entry for geoid.  The space for its row isn't reused until clear() """
+        key = self._key(geoid)
+        if isinstance(key, str):
+            self._other.pop(key, None)
+            return
+        slot = self._find(key)
+        if slot >= 0:
+            self._keys[slot] = _DELETED
+            self._count -= 1
+
+    def clear(self) -> None:
+        """ Remove all entries """
+        capacity = 1
+        while capacity < self._initial_capacity:
+            capacity *= 2
+        self._keys = array('q', [_EMPTY]) * capacity
+        self._offsets = array('q', [0]) * capacity
+        self._mask = capacity - 1
+        self._used = 0  # Slots that are not empty, including deleted
+        self._count = 0
+        self._rows = bytearray()
+        self._other = {}
+
+    def __len__(self):
+        return self._count + len(self._other)
+
+    def memory_size(self) -> int:
+        """ Returns: approximate bytes used by the store, not including the dictionary of non numeric geoids """
+        return self._keys.buffer_info()[1] * self._keys.itemsize * 2 + len(self._rows)
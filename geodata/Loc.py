@@ -114,7 +114,7 @@ class Loc:
 
         #self.georow_list.clear()
 
-    def parse_place(self, place_name: str, geo_db: GeoDB.GeoDB):
+    def parse_place(self, place_name: str, geo_db: 'GeoDB.GeoDB'):
         """
             Given a comma separated place name,   
             parse into its city, admin1, country and type of entity (city, country etc)   
@@ -19,6 +19,7 @@
 """Calculate a heuristic score for how well a result place name matches a target place name."""
 import copy
 import logging
+import threading
 import time
 
 from rapidfuzz import fuzz
@@ -47,7 +48,7 @@ class MatchScore:
 
     def __init__(self):
         self.logger = logging.getLogger(__name__)
-        self.score_diags = ''  # Diagnostic text for scoring
+        self._local = threading.local()  # score_diags and timing for this thread
         self.token_weight = []
         self.prefix_weight = 0.0
         self.feature_weight = 0.0
@@ -68,6 +69,24 @@ class MatchScore:
         else:
             return 0.0
 
+    @property
+    def score_diags(self) -> str:
+        """ Returns: diagnostic text for the last match_score in this thread """
+        return getattr(self._local, 'score_diags', '')
+
+    @score_diags.setter
+    def score_diags(self, score_diags: str):
+        self._local.score_diags = score_diags
+
+    @property
+    def timing(self) -> float:
+        """ Returns: fuzzy match time in seconds for the last match_score in this thread """
+        return getattr(self._local, 'timing', 0)
+
+    @timing.setter
+    def timing(self, timing: float):
+        self._local.timing = timing
+
     def set_weighting(self, token_weight: [], prefix_weight: float, feature_weight: float):
         """
         Set weighting of scoring components.  See match_score for details of weighting.  All weights are positive
@@ -24,6 +24,7 @@ noise_words is a list of replacements only used for match scoring
 phrase_cleanup is a list of replacements for db build, lookup and match scoring   
 """
 import functools
+import hashlib
 import math
 import sys
 from re import sub
@@ -381,10 +382,11 @@ class Normalize:
             input_words = sub('middlesex', 'greater london', input_words)
         return input_words, res_words
 
-    def add_aliases_to_db(self, geo_build: GeodataBuild):
-        #  Add alias names to DB
+    def add_aliases_to_db(self, geo_build: GeodataBuild, country_iso=''):
+        #  Add alias names to DB.  If country_iso is set, only aliases for that country are added
         for ky in alias_list:
-            self.add_alias_to_db(ky, geo_build)
+            if country_iso == '' or alias_list[ky][ALIAS_ISO].lower() == country_iso:
+                self.add_alias_to_db(ky, geo_build)
 
     def add_alias_to_db(self, ky: str, geo_build: GeodataBuild):
         alias_row = alias_list.get(ky)
@@ -398,12 +400,21 @@ class Normalize:
         geo_build.geodb.s.lookup_place(place)
         if len(place.georow_list) > 0:
             if len(place.georow_list[0]) > 0:
-                geo_row = list(place.georow_list[0][0:GeoUtil.Entry.SDX + 1])
+                geo_row = list(place.georow_list[0][0:GeoUtil.Entry.POP + 1])
                 geo_build.update_geo_row_name(geo_row=geo_row, name=ky)
                 geo_tuple = tuple(geo_row)
                 geo_build.insert(geo_tuple=geo_tuple, feat_code=alias_row[ALIAS_FEAT])
 
 
+def get_rules_hash() -> str:
+    """
+    Returns: hash of the normalization rules used when building the DB.  A DB built with different rules has different names
+    """
+    rules = [sorted(stop_words), noise_words, phrase_cleanup, no_punc_remove_commas, no_punc_keep_commas,
+             sorted(local_country_names.items()), sorted(alias_list.items())]
+    return hashlib.sha256(repr(rules).encode('utf-8')).hexdigest()
+
+
 @functools.lru_cache(maxsize=CACHE_SIZE)
 def sorted_normalize(text):
     # Remove l' and d'  
@@ -18,23 +18,38 @@
 #   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
 
 """ Build SQL where clause and arg list """
+import functools
 import re
 
+# Where clause for each kind of term.  Formatted with the column name.  See get_where
+CLAUSE_TEMPLATES = {
+    'equal': '{0} = ?',
+    'range': '({0} >= ? AND {0} < ?)',
+    'rev_range': '(rev_{0} >= ? AND rev_{0} < ?)',
+    'range_like': '({0} >= ? AND {0} < ?) AND {0} LIKE ?',
+    'like': '{0} LIKE ?'
+    }
+
 
 class QueryItem:
     def __init__(self):
         self.where = ''
         self.args = tuple()
+        self.shape = []  # (column, kind of term) for each clause in where.  See get_where
         self.table = 'main.geodata'
+        self.word = None  # FTS5 MATCH string for a wildcard name.  See get_word_match
 
     def clear(self):
         self.where = ''
         self.args = tuple()
+        self.shape = []
+        self.word = None
 
     def add_clauses(self, where_clauses: [str], terms: [], table=''):
         """
         Create a Where clause (and args list) by appending each item in clause with AND as separator
-        Use equal, unless there is an '*', then use LIKE type clause
+        Use equal, unless there is an '*', then use LIKE type clause.  The Where clause is the template for   
+        the shape of the clauses, so the same shape always gives the same SQL statement
         Args:
             where_clauses: list of column names
             terms: list of values
@@ -52,25 +67,38 @@ class QueryItem:
                 if 'ADM0' in term or 'ADM1' in term:
                     self.table = 'main.admin'
 
-            if len(term) > 0:
-                if len(self.where) > 0:
-                    # There is already text in Where, so add AND
-                    self.where += ' AND '
-
-                if term[-1] == '*':
-                    # TODO handle case with multiple wildcards with one at end
+            if len(term.strip('*')) > 0:
+                # A term that is only wildcards matches anything, so it doesn't need a clause
+                if term[-1] == '*' and term.count('*') == 1:
                     # Wildcard search at end of text - Use >= and < (usually gives better performanc than LIKE)
                     term = self.create_wildcard(term, remove=True)
-                    self.where += f' ({where_clause} >= ? and {where_clause} < ?) '
+                    self.shape.append((where_clause, 'range'))
+                    self.args += (term, inc_key(term),)
+                elif where_clause == 'name' and term[0] == '*' and term.count('*') == 1 and len(term) > 1:
+                    # Wildcard search at start of name - Use >= and < on the reversed name, e.g. *minster is
+                    # rev_name >= 'retsnim' and rev_name < 'retsnin'
+                    term = self.create_wildcard(term, remove=True)[::-1]
+                    self.shape.append((where_clause, 'rev_range'))
                     self.args += (term, inc_key(term),)
+                elif '*' in term and term[0] != '*':
+                    # Wildcard search in middle, e.g. ab*cd - Use >= and < on the text before the first wildcard so
+                    # the index narrows the rows, then LIKE for the rest
+                    prefix = term.partition('*')[0]
+                    self.shape.append((where_clause, 'range_like'))
+                    self.args += (prefix, inc_key(prefix), self.create_wildcard(term, remove=False))
                 elif '*' in term:
-                    # Wildcard search in middle or start of search - Use LIKE
+                    # Wildcard search at start and in middle of search - Use LIKE
+                    if where_clause == 'name':
+                        # LIKE with a leading wildcard can't use the name index, so narrow the rows with the
+                        # word index (if the DB has one)
+                        self.word = get_word_match(term) or None
                     term = self.create_wildcard(term, remove=False)
-                    self.where += f' ({where_clause} like ?) '
+                    self.shape.append((where_clause, 'like'))
                     self.args += (term,)
                 else:
-                    self.where += f' {where_clause} = ?'
+                    self.shape.append((where_clause, 'equal'))
                     self.args += (term,)
+        self.where = get_where(tuple(self.shape))
 
     @staticmethod
     def create_wildcard(pattern: str, remove: bool):
@@ -91,6 +119,49 @@ class QueryItem:
             return re.sub(r"\*", "%", pattern)
 
 
+@functools.lru_cache(maxsize=None)
+def get_where(shape: ()) -> str:
+    """
+    Create the Where clause for a shape
+    Args:
+        shape: tuple of (column, kind of term) for each clause.  Kind is a key in CLAUSE_TEMPLATES
+
+    Returns: Where clause with ? for each arg
+    """
+    return ' AND '.join(CLAUSE_TEMPLATES[kind].format(column) for column, kind in shape)
+
+
+# Shortest token prefix that is looked up in the word index
+MIN_WORD_PREFIX = 3
+
+
+def get_word_match(pattern: str) -> str:
+    """
+    Create an FTS5 MATCH string for the words in a wildcard pattern.  Each word matches a token, or a token prefix   
+    if the word has a wildcard, e.g. 'cant* cath*' gives '"cant"* AND "cath"*'.  Text after the first wildcard in   
+    a word is ignored and words starting with a wildcard are skipped since a token index can't match them.   
+    Prefixes shorter than MIN_WORD_PREFIX are skipped since they match too many tokens to narrow the search.   
+    Every name the pattern matches with LIKE is in the result, so the LIKE clause is still needed to filter it   
+    Args:
+        pattern: name with * wildcards
+
+    Returns: MATCH string.  '' if no word can use the index
+    """
+    terms = []
+    for word in pattern.split(' '):
+        literal, wildcard, _ = word.partition('*')
+        tokens = re.findall(r'[^\W_]+', literal)
+        if len(tokens) == 0:
+            continue
+        terms.extend(f'"{token}"' for token in tokens[:-1])
+        # The last token is a prefix unless the literal ends at the end of the word
+        if not (wildcard and literal[-1].isalnum()):
+            terms.append(f'"{tokens[-1]}"')
+        elif len(tokens[-1]) >= MIN_WORD_PREFIX:
+            terms.append(f'"{tokens[-1]}"*')
+    return ' AND '.join(terms)
+
+
 def inc_key(text):
     """ increment the last letter of text by one.  Used to replace key in SQL LIKE case with less than """
     return text[0:-1] + chr(ord(text[-1]) + 1)
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2019.       Mike Herbert
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+"""
+Check the sqlite query plan for each query shape the search code creates.  A query shape is the SELECT fields,
+WHERE clause, table and ORDER clause of a DB.select() - the plan depends on the shape and the indices, not the args.
+
+    python3 -m geodata.QueryPlanAudit --directory /Volumes/DISK2/geoname_data
+
+The search code is run with probe lookups made from entries in the DB (exact names, admin1 and admin2 names,
+wildcards, misspellings, feature words, etc.) with every lookup tier enabled, and the routines that aren't reached
+by a lookup (geoid, DB id, alternate names, soundex combinations) are called directly.  Each DB.select() is
+recorded, then EXPLAIN QUERY PLAN is run for each shape.  A shape with a full SCAN of geodata or admin is reported.
+Query lists are recorded one query at a time.  A UNION ALL statement (GeoDB.union_queries) runs the same
+clauses as subqueries so it has the same plan for each clause.
+"""
+import argparse
+import logging
+import re
+import sys
+import traceback
+from collections import namedtuple, OrderedDict
+
+from geodata import Geodata, Loc
+
+# A full scan of these tables is an error
+SCAN_TABLES = ['geodata', 'admin']
+# The function reported for a shape is the innermost caller in these files
+SOURCE_FILES = ('GeoSearch.py', 'Geodata.py', 'Loc.py')
+SAMPLE_ROWS = 3
+
+ShapePlan = namedtuple('ShapePlan', 'function table where plan scan')
+
+_SCAN_PATTERN = re.compile(r'SCAN (TABLE )?(\w+\.)?(' + '|'.join(SCAN_TABLES) + r')\b')
+
+
+def is_scan(plan: [str]) -> bool:
+    """ Returns: True if a line of the query plan is a full scan of a table in SCAN_TABLES """
+    return any(_SCAN_PATTERN.match(line) for line in plan)
+
+
+class QueryPlanAudit:
+    """
+    Record the query shapes the search code creates and check their query plans
+    """
+
+    def __init__(self, geodata: Geodata.Geodata):
+        """
+        #Args:
+            geodata: Geodata instance.  The DB must be open
+        """
+        self.logger = logging.getLogger(__name__)
+        self.geodata = geodata
+        self.geodb = geodata.geo_build.geodb
+        self.shapes = OrderedDict()  # Key is (select, where, table, order), value is (from_tbl, args, function)
+
+    def run(self, sample_rows=SAMPLE_ROWS) -> [ShapePlan]:
+        """
+        Run the probe lookups and get the query plan for each shape they create
+        #Args:
+            sample_rows: number of DB entries to create probe lookups from
+        #Returns:
+            list of ShapePlan, one for each query shape
+        """
+        self.record(sample_rows)
+        return self.explain()
+
+    def record(self, sample_rows=SAMPLE_ROWS):
+        """
+        Run the probe lookups and record the shape of each DB.select().  The lookup caches are cleared first so
+        each lookup reaches the DB
+        #Args:
+            sample_rows: number of DB entries to create probe lookups from
+        """
+        db = self.geodb.db
+        search = self.geodb.s
+        for func in [search._get_name, search.get_iso_from_admin1_id, search.get_admin1_id, search.get_country_iso]:
+            func.cache_clear()
+
+        union_queries = self.geodb.union_queries
+        tier_thresholds = self.geodata.tier_thresholds
+        self.geodb.union_queries = False
+        self.geodata.tier_thresholds = {tier: 0 for tier in tier_thresholds}
+        db.select = self._record_select
+        try:
+            for row in self.get_sample_rows(sample_rows):
+                self._run_probes(*row)
+        finally:
+            # Remove the instance attribute so the class method is used again
+            del db.select
+            self.geodb.union_queries = union_queries
+            self.geodata.tier_thresholds = tier_thresholds
+
+    def get_sample_rows(self, count: int) -> []:
+        """
+        Get entries to create probe lookups from.  Places with a space in the name and an admin2 name are used
+        if there are any
+        #Returns:
+            list of (name, admin2_name, admin1_name, country_name, country, admin1_id, admin2_id, geoid, id)
+        """
+        if self.geodb.shards:
+            table = next(self.geodb.shards.get_tables(''), 'main.geodata')
+        else:
+            table = 'main.geodata'
+        select = f'SELECT name, admin2_name, admin1_name, country_name, country, admin1_id, admin2_id, geoid, id FROM {table}'
+        rows = list(self.geodb.db.query(f"{select} WHERE admin2_name != '' AND feature NOT LIKE 'ADM%' AND name LIKE '% %' "
+                                          "LIMIT ?", (count,)))
+        if len(rows) == 0:
+            rows = list(self.geodb.db.query(f'{select} LIMIT ?', (count,)))
+        return rows
+
+    def _run_probes(self, name, admin2, admin1, country, iso, admin1_id, admin2_id, geoid, dbid):
+        """ Run lookups for one entry that reach each of the search routines """
+        mid = len(name) // 2
+        for location in [f'{name}, {country}', f'{name}, {admin1}, {country}', f'{name}, {admin2}, {admin1}, {country}',
+                         f'old {name}, {admin2}, {admin1}, {country}', f'{name[:3]}*, {country}', f'*{name[-4:]}, {country}',
+                         f'{name[:2]}*{name[-2:]}, {country}', f'*{name[1:4]}*, {country}', f'{name[:-2]}xq, {country}',
+                         country, f'{admin1}, {country}', name, f'st {name} church, {country}', f'{name} castle, {country}',
+                         f'{name}, {admin1[:3]}*, {country}', f'{name}, {admin2[:3]}*, {admin1}, {country}',
+                         f'{name[:mid]}q{name[mid:]}, {admin1}, {country}']:
+            self.geodata.find_matches(location, Loc.Loc())
+
+        search = self.geodb.s
+        search.lookup_geoid([], geoid, Loc.Loc())
+        search.lookup_geoid([], geoid, Loc.Loc(), admin=True)
+        search.lookup_dbid([], dbid, Loc.Loc())
+        search.lookup_dbid([], dbid, Loc.Loc(), admin=True)
+        search.get_alternate_name(geoid)
+        search.get_admin1_name(admin1_id, iso)
+        search.get_admin2_name(admin1_id, admin2_id, iso)
+        search.get_country_name(iso)
+        search.get_iso_from_admin1_id(admin1_id, '')
+
+        place = Loc.Loc()
+        place.country_iso = iso
+        search.get_admin1_alternate_name(admin1_id, place)
+        for feature in ['', 'PPL']:
+            place.feature = feature
+            for target in [name, name.split(' ')[0]]:
+                search.search_for_combinations([], target, place, 'main.geodata')
+                search.search_each_term([], target, place, 'main.geodata')
+                search.search_trigrams([], target, place, 'main.geodata')
+            search.search_for_combinations([], admin1, place, 'main.admin')
+
+    def _record_select(self, select_str, where, from_tbl, args, order_str=None):
+        """ Record the query shape, then run DB.select() """
+        key = (select_str, where, from_tbl.rpartition('.')[2], order_str)
+        if key not in self.shapes:
+            callers = [frame.name for frame in traceback.extract_stack() if frame.filename.endswith(SOURCE_FILES)]
+            self.shapes[key] = (from_tbl, args, callers[-1] if callers else '')
+        return type(self.geodb.db).select(self.geodb.db, select_str, where, from_tbl, args, order_str)
+
+    def explain(self) -> [ShapePlan]:
+        """
+        Get the query plan for each recorded shape
+        #Returns:
+            list of ShapePlan
+        """
+        db = self.geodb.db
+        results = []
+        for (select_str, where, _, order_str), (from_tbl, args, function) in self.shapes.items():
+            schema = from_tbl.rpartition('.')[0]
+            if self.geodb.shards and schema.startswith('s_'):
+                # The shard may have been detached since the shape was recorded
+                self.geodb.shards.attach(schema[2:])
+            plan = db.explain_query_plan(select_str, where, from_tbl, args, order_str)
+            if len(plan) == 0:
+                self.logger.warning(f'No query plan for [{where}] {db.err}')
+            results.append(ShapePlan(function=function, table=from_tbl, where=where, plan=plan, scan=is_scan(plan)))
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the query plan of each query shape the search code creates')
+    parser.add_argument('--directory', help='Directory with geonames.org files and the geodata DB', required=True)
+    parser.add_argument('--rows', help='DB entries to create probe lookups from', type=int, default=SAMPLE_ROWS)
+    parser.add_argument('--verbose', help='Show the query plan for each shape', action='store_true')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    geodata = Geodata.Geodata(directory_name=args.directory, display_progress=None, show_message=False,
+                              exit_on_error=False, languages_list_dct={'en'}, feature_code_list_dct={},
+                              supported_countries_dct={})
+    if geodata.open(repair_database=False, query_limit=50, read_only=True):
+        print(f'Unable to open DB in {args.directory}')
+        sys.exit(2)
+    # Lookups are only done for supported countries.  Use every country in the DB
+    geodata.geo_build.supported_countries_dct = {row[0] for row in
+                                                 geodata.geo_build.geodb.db.query('SELECT DISTINCT country FROM admin')}
+    results = QueryPlanAudit(geodata).run(args.rows)
+    geodata.close()
+
+    scans = 0
+    for res in results:
+        scans += res.scan
+        print(f'{"SCAN" if res.scan else "ok":5} {res.function:25} {res.table:15} {res.where}')
+        if res.scan or args.verbose:
+            for line in res.plan:
+                print(f'{"":47} {line}')
+    print(f'\n{len(results)} query shapes, {scans} with a full scan of {" or ".join(SCAN_TABLES)}')
+    sys.exit(1 if scans else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2019.       Mike Herbert
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+"""
+Per-country geodata shards.  In a sharded DB the geodata rows for each country are in their own sqlite file and
+the main DB has the admin, altname and version tables.  Shards are attached to the main DB connection as needed.
+A read only DB has a connection for each thread, so each thread has its own set of attached shards.
+"""
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+# SQLite allows 10 attached DBs by default
+MAX_ATTACHED = 8
+# Suffix of a DB file being built by a staged rebuild.  Its shards are in their own directory until the swap
+STAGING_SUFFIX = '.building'
+
+
+def get_shard_directory(db_path: str) -> str:
+    """ Returns: directory for the shard files of the DB at db_path.  A staging DB has shards.building """
+    if db_path.endswith(STAGING_SUFFIX):
+        return os.path.join(os.path.dirname(db_path), 'shards' + STAGING_SUFFIX)
+    return os.path.join(os.path.dirname(db_path), 'shards')
+
+
+def get_shard_path(db_path: str, iso: str) -> str:
+    """ Returns: path of the shard file for country iso """
+    return os.path.join(get_shard_directory(db_path), f'geodata_{iso}.db')
+
+
+class ShardSet:
+    """
+    Attach per-country geodata shards to the main DB connection on demand.  Each shard has a geodata table with
+    the rows for one country and is attached as schema s_<iso>.  At most max_attached shards are attached at once.
+    When another shard is needed, the least recently used shard is detached.
+    """
+
+    def __init__(self, db, db_path: str, countries: [str], max_attached=MAX_ATTACHED):
+        """
+        #Args:
+            db: DB instance for the main DB
+            db_path: path of the main DB file.  Shards are in the shards directory next to it
+            countries: ISO codes of the countries that have a shard
+            max_attached: Maximum number of shards attached at one time
+        """
+        self.logger = logging.getLogger(__name__)
+        self.db = db
+        self.db_path = db_path
+        self.countries = sorted(countries)
+        self.max_attached = max_attached
+        self._local = threading.local()  # Shards attached to the connection for this thread.  See _attached
+        self.attach_count = 0
+
+    @property
+    def _attached(self) -> OrderedDict:
+        """ Returns: Dictionary of shards attached to this thread's connection.  Key is country iso, value is schema
+        name.  Most recently used last """
+        attached = getattr(self._local, 'attached', None)
+        if attached is None:
+            attached = self._local.attached = OrderedDict()
+        return attached
+
+    def get_tables(self, country: str):
+        """
+        Generator - geodata tables to query for a country.  Shards are attached as they are reached
+        #Args:
+            country: country ISO code or ''
+        #Returns:
+            The shard table for country, e.g. s_gb.geodata.  If country is '' all shards are returned, one at a time
+        """
+        for iso in (list(self.countries) if country == '' else [country]):
+            if iso in self.countries:
+                schema = self.attach(iso)
+                if schema:
+                    yield f'{schema}.geodata'
+
+    def attach(self, iso: str) -> str:
+        """
+        Attach the shard for a country if it isn't already attached
+        #Args:
+            iso: country ISO code
+        #Returns:
+            schema name of shard.  None if the shard file is missing
+        """
+        schema = self._attached.get(iso)
+        if schema is not None:
+            self._attached.move_to_end(iso)
+            return schema
+
+        while len(self._attached) >= self.max_attached:
+            self._detach(next(iter(self._attached)))
+
+        schema = f's_{iso}'
+        path = get_shard_path(self.db_path, iso)
+        if not schema.isidentifier() or not os.path.exists(path):
+            self.logger.error(f'Shard for [{iso}] not found: {path}')
+            self.countries.remove(iso)
+            return None
+        self.db.conn.execute('ATTACH DATABASE ? AS ' + schema, (self.db.get_uri(path),))
+        self._attached[iso] = schema
+        self.attach_count += 1
+        return schema
+
+    def _detach(self, iso: str):
+        schema = self._attached.pop(iso)
+        self.db.conn.execute(f'DETACH DATABASE {schema}')
+
+    def detach_all(self):
+        """ Detach all shards """
+        for iso in list(self._attached):
+            self._detach(iso)
+
+    def get_row_count(self) -> int:
+        """ Returns: total rows in all shards """
+        return sum(self.db.get_row_count(table) for table in self.get_tables(''))
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2019.       Mike Herbert
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+"""
+Measure the cost and benefit of storing the admin1, admin2 and country names on each DB row.
+
+    python3 -m geodata.test.BenchAdminNames --rows 200000
+    python3 -m geodata.test.BenchAdminNames --directory /Volumes/DISK2/geoname_data   (use real geonames.org files)
+
+DB size is compared with a copy of the DB that has the name columns dropped.
+The time to fill in the names for a lookup candidate (copy_georow_to_place) is compared for:
+    stored - names are copied from the row
+    lookup cold - names are looked up from the row's IDs with an empty name cache
+    lookup warm - names are looked up from the row's IDs with the name cache filled by the cold pass
+Without --directory synthetic geonames files are created in a temp directory.
+"""
+import argparse
+import logging
+import os
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from geodata import GeodataBuild, GeoSearch, Loc
+from geodata.GeoUtil import Entry
+from geodata.test import SyntheticData
+
+
+def make_no_names_copy(db_path: str, copy_path: str):
+    """
+    Copy the DB at db_path to copy_path and drop the name columns from the copy
+    #Args:
+        db_path: DB built with current schema
+        copy_path: path for copy
+    """
+    shutil.copyfile(db_path, copy_path)
+    conn = sqlite3.connect(copy_path)
+    for tbl in ['geodata', 'admin']:
+        for column in GeodataBuild.NAME_COLUMNS:
+            conn.execute(f'ALTER TABLE {tbl} DROP COLUMN {column}')
+    conn.commit()
+    conn.execute('VACUUM')
+    conn.close()
+
+
+def time_names(search: GeoSearch.GeoSearch, rows, stored: bool, clear_cache: bool) -> [float]:
+    """
+    Time copy_georow_to_place for each row
+    #Args:
+        search: GeoSearch instance
+        rows: rows from DB with the name columns
+        stored: If True use the stored names.  Otherwise the rows are cut so the names are looked up
+        clear_cache: If True the name cache is cleared before the pass
+    #Returns:
+        list of usec per row
+    """
+    if clear_cache:
+        GeoSearch.GeoSearch._get_name.cache_clear()
+    times = []
+    for row in rows:
+        row = list(row) if stored else list(row[:Entry.ADM1_NAME])
+        place = Loc.Loc()
+        start = time.perf_counter()
+        search.copy_georow_to_place(row, place, fast=True)
+        times.append((time.perf_counter() - start) * 1e6)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare DB size and name lookup time with and without stored admin names')
+    parser.add_argument('--directory', help='Directory with geonames.org files.  Default is synthetic data', default='')
+    parser.add_argument('--rows', help='Rows of synthetic data to create', type=int, default=200000)
+    parser.add_argument('--lookups', help='Rows to sample as lookup candidates', type=int, default=5000)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    directory = args.directory
+    temp_dir = None
+    if directory == '':
+        temp_dir = tempfile.mkdtemp()
+        directory = temp_dir
+        SyntheticData.write_geoname_files(directory, args.rows)
+
+    try:
+        geodata = SyntheticData.open_synthetic_geodata(directory)
+        db_path = geodata.geo_build.get_db_path()
+        search = geodata.geo_build.geodb.s
+        rows = list(geodata.geo_build.geodb.db.query(f'SELECT {search.select_str} FROM geodata ORDER BY random() LIMIT ?',
+                                                     (args.lookups,)))
+
+        stored = time_names(search, rows, stored=True, clear_cache=True)
+        cold = time_names(search, rows, stored=False, clear_cache=True)
+        warm = time_names(search, rows, stored=False, clear_cache=False)
+        geodata.close()
+
+        copy_path = os.path.join(os.path.dirname(db_path), 'bench_no_names.db')
+        make_no_names_copy(db_path, copy_path)
+        names_size = os.path.getsize(db_path)
+        no_names_size = os.path.getsize(copy_path)
+        os.remove(copy_path)
+
+        print(f'{"DB size":30} {"no names":>14} {"names":>14}')
+        print(f'{"bytes":30} {no_names_size:14,} {names_size:14,}   '
+              f'{(names_size - no_names_size) * 100 / no_names_size:+.1f}%')
+        print()
+        print(f'{"Names per candidate (usec)":30} {"median":>10} {"mean":>10} {"p99":>10}')
+        for title, times in [('stored', stored), ('lookup cold', cold), ('lookup warm', warm)]:
+            p99 = sorted(times)[int(len(times) * 0.99)]
+            print(f'{title:30} {statistics.median(times):10.1f} {statistics.mean(times):10.1f} {p99:10.1f}')
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2019.       Mike Herbert
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+"""
+Benchmark database build throughput (rows/sec) for reading allCountries.txt into the geodata DB.
+
+    python3 -m geodata.test.BenchBuild --rows 200000
+    python3 -m geodata.test.BenchBuild --directory /Volumes/DISK2/geoname_data   (use real geonames.org files)
+
+Without --directory a synthetic allCountries.txt is created in a temp directory.
+"""
+import argparse
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+from geodata import GeodataBuild, GeoDB, GeoUtil, GeoSearch, Normalize
+from geodata.test import SyntheticData
+
+
+def run_step1(directory: str, fname: str, mode: dict) -> (float, int, int):
+    """
+    Build a new DB from fname using the build settings in mode
+    #Args:
+        directory: directory with geonames files
+        fname: geonames file to read
+        mode: dictionary of GeodataBuild attributes to set before the build
+    #Returns:
+        (elapsed seconds, lines read, rows in DB)
+    """
+    db_path = os.path.join(GeoUtil.get_cache_directory(directory), 'bench.db')
+    if os.path.exists(db_path):
+        os.remove(db_path)
+
+    # Start each run with cold caches so modes are compared fairly
+    Normalize.Normalize.normalize.cache_clear()
+    Normalize.sorted_normalize.cache_clear()
+    GeoSearch.get_word_soundex.cache_clear()
+    build = GeodataBuild.GeodataBuild(directory, display_progress=None, show_message=False, exit_on_error=False,
+                                      languages_list_dct={'en'}, feature_code_list_dct=SyntheticData.FEATURES,
+                                      supported_countries_dct=SyntheticData.SUPPORTED_COUNTRIES)
+    for key, val in mode.items():
+        setattr(build, key, val)
+    build.geodb = GeoDB.GeoDB(db_path=db_path, show_message=False, exit_on_error=False,
+                              set_speed_pragmas=True, db_limit=50)
+    build.create_tables()
+
+    start = time.time()
+    build._add_geoname_file_to_db(fname, 'Bench ')
+    elapsed = time.time() - start
+
+    rows = build.geodb.get_row_count() + build.geodb.db.get_row_count('admin')
+    lines = build.line_num
+    build.geodb.close()
+    os.remove(db_path)
+    return elapsed, lines, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark geodata DB build throughput')
+    parser.add_argument('--directory', help='Directory with geonames.org files.  Default is synthetic data', default='')
+    parser.add_argument('--file', help='geonames file to read', default='allCountries.txt')
+    parser.add_argument('--rows', help='Rows of synthetic data to create', type=int, default=200000)
+    parser.add_argument('--workers', help='Worker counts to benchmark for parallel build', type=int, nargs='*',
+                        default=[2, 4, os.cpu_count()])
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    directory = args.directory
+    temp_dir = None
+    if directory == '':
+        temp_dir = tempfile.mkdtemp()
+        directory = temp_dir
+        SyntheticData.write_geoname_files(directory, args.rows, alt_per_row=0)
+
+    modes = [('executemany (bulk_insert=True)', {'bulk_insert': True}),
+             ('row at a time (bulk_insert=False)', {'bulk_insert': False})]
+    for workers in args.workers:
+        modes.append((f'parallel (workers={workers})', {'bulk_insert': True, 'workers': workers}))
+    try:
+        print(f'{"Mode":40} {"Lines":>10} {"DB rows":>10} {"Secs":>8} {"Lines/sec":>10} {"Rows/sec":>10}')
+        for title, mode in modes:
+            elapsed, lines, rows = run_step1(directory, args.file, mode)
+            print(f'{title:40} {lines:10,} {rows:10,} {elapsed:8.2f} {lines / elapsed:10,.0f} {rows / elapsed:10,.0f}')
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2019.       Mike Herbert
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+"""
+Measure lookup throughput of a read only DB shared by several threads or processes.
+
+    python3 -m geodata.test.BenchConcurrent --rows 200000
+    python3 -m geodata.test.BenchConcurrent --directory /Volumes/DISK2/geoname_data   (use real geonames.org files)
+
+The DB is built (or opened) normally, then opened with open(read_only=True).  The same lookups are run by one
+Geodata instance from 1 to --threads threads, and by a pool of processes that each open the DB read only.
+For each setting the lookups per second and the number of lookups with a different result from the single thread
+run are shown.
+Without --directory synthetic geonames files are created in a temp directory.
+"""
+import argparse
+import logging
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from geodata import Geodata, Loc
+from geodata.test import SyntheticData
+
+_process_geodata = None  # Geodata instance for each process in the process pool
+
+
+def open_geodata(directory: str, read_only: bool, immutable=False) -> Geodata.Geodata:
+    """
+    Open Geodata for the synthetic data settings
+    #Args:
+        directory: geonames directory
+        read_only: If True open the DB read only.  Otherwise build it if needed
+        immutable: If True open the read only DB as immutable
+    #Returns:
+        Geodata instance
+    """
+    return SyntheticData.open_synthetic_geodata(directory, open_args={'repair_database': not read_only,
+                                                                      'read_only': read_only, 'immutable': immutable})
+
+
+def lookup(geodata: Geodata.Geodata, location: str) -> str:
+    """ Returns: result of lookup for location """
+    place = Loc.Loc()
+    geodata.find_best_match(location, place)
+    return f'{place.get_long_name(None)} {place.lat} {place.lon}'
+
+
+def _init_process(directory: str):
+    global _process_geodata
+    logging.basicConfig(level=logging.ERROR)
+    _process_geodata = open_geodata(directory, read_only=True)
+
+
+def _process_lookup(location: str) -> str:
+    return lookup(_process_geodata, location)
+
+
+def run_threads(geodata: Geodata.Geodata, locations: [str], threads: int) -> ([str], float):
+    """
+    Lookup each location using a pool of threads that share geodata
+    #Returns:
+        (list of results, lookups per second)
+    """
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        start = time.perf_counter()
+        results = list(executor.map(lambda location: lookup(geodata, location), locations))
+        elapsed = time.perf_counter() - start
+    return results, len(locations) / elapsed
+
+
+def run_processes(directory: str, locations: [str], processes: int) -> ([str], float):
+    """
+    Lookup each location using a pool of processes that each open the DB read only.  Time to open is not included
+    #Returns:
+        (list of results, lookups per second)
+    """
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_process, initargs=(directory,)) as executor:
+        # Wait for each process to open the DB
+        list(executor.map(_process_lookup, locations[:processes * 4], chunksize=1))
+        start = time.perf_counter()
+        results = list(executor.map(_process_lookup, locations, chunksize=16))
+        elapsed = time.perf_counter() - start
+    return results, len(locations) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare lookup throughput for threads and processes on a read only DB')
+    parser.add_argument('--directory', help='Directory with geonames.org files.  Default is synthetic data', default='')
+    parser.add_argument('--rows', help='Rows of synthetic data to create', type=int, default=200000)
+    parser.add_argument('--lookups', help='Number of lookups', type=int, default=2000)
+    parser.add_argument('--threads', help='Largest number of threads and processes', type=int, default=8)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    directory = args.directory
+    temp_dir = None
+    if directory == '':
+        temp_dir = tempfile.mkdtemp()
+        directory = temp_dir
+        SyntheticData.write_geoname_files(directory, args.rows)
+
+    try:
+        geodata = open_geodata(directory, read_only=False)
+        rows = geodata.geo_build.geodb.db.query("SELECT name, country_name FROM geodata WHERE feature LIKE 'PP%' "
+                                               "ORDER BY random() LIMIT ?", (args.lookups,))
+        locations = [f'{name}, {country}' for name, country in rows]
+        geodata.close()
+
+        counts = [1]
+        while counts[-1] * 2 <= args.threads:
+            counts.append(counts[-1] * 2)
+
+        print(f'{"Read only DB":30} {"lookups/sec":>12} {"speedup":>8} {"different":>10}')
+        base_rate = None
+        for immutable in [False, True]:
+            geodata = open_geodata(directory, read_only=True, immutable=immutable)
+            # First pass warms the page cache and gives the reference results
+            reference, _ = run_threads(geodata, locations, threads=1)
+            for threads in counts:
+                results, rate = run_threads(geodata, locations, threads)
+                base_rate = base_rate or rate
+                different = sum(res != ref for res, ref in zip(results, reference))
+                title = f'{threads} threads{" immutable" if immutable else ""}'
+                print(f'{title:30} {rate:12.1f} {rate / base_rate:7.2f}x {different:10}')
+            geodata.close()
+        for processes in counts[1:]:
+            results, rate = run_processes(directory, locations, processes)
+            different = sum(res != ref for res, ref in zip(results, reference))
+            print(f'{f"{processes} processes":30} {rate:12.1f} {rate / base_rate:7.2f}x {different:10}')
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir)
+
+
+if __name__ == "__main__":
+    main()
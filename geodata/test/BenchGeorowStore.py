@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2019.       Mike Herbert
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+"""
+Compare memory use and speed of GeorowStore with the dictionary store it replaced.
+
+    python3 -m geodata.test.BenchGeorowStore --rows 12000000     (full planet build)
+
+Each store is filled in its own process with the same synthetic rows and the growth in peak RSS is reported.
+Lookups are timed the way the alternate names pass uses the store: a bytes membership test then a get.
+"""
+import argparse
+import multiprocessing
+import random
+import resource
+import sys
+import time
+
+from geodata import GeorowStore
+from geodata.GeoUtil import Entry
+
+
+class DictGeorowStore:
+    """ The previous store - a dictionary of int geoid to tab separated row string """
+
+    def __init__(self):
+        self._store = {}
+
+    def add(self, geo_row):
+        key = int(geo_row[Entry.ID])
+        if key not in self._store:
+            self._store[key] = '\t'.join(map(str, geo_row[0:Entry.SDX + 1]))
+
+    def get(self, geoid):
+        val = self._store.get(int(geoid))
+        return None if val is None else tuple(val.split('\t'))
+
+    def __contains__(self, geoid):
+        return int(geoid) in self._store
+
+    def __len__(self):
+        return len(self._store)
+
+
+STORES = {'dict': DictGeorowStore, 'GeorowStore': GeorowStore.GeorowStore}
+
+
+def make_rows(count: int):
+    """ Generator - synthetic geo rows with geonames.org sized fields and geoids """
+    rnd = random.Random(1)
+    words = ['saint', 'north', 'new', 'upper', 'kirk', 'ham', 'ton', 'ville', 'burg', 'field', 'brook', 'wood']
+    geoid = 2000000
+    for idx in range(count):
+        geoid += rnd.randint(1, 3)
+        name = ' '.join(rnd.choice(words) + rnd.choice(words) for _ in range(rnd.randint(1, 3)))
+        yield (name, 'us', f'{rnd.randint(1, 99):02d}', str(rnd.randint(1, 999)), f'{rnd.uniform(-90, 90):.5f}',
+               f'{rnd.uniform(-180, 180):.5f}', 'PPL', str(geoid), name[0:4].upper())
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in KB on linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def run_store(name: str, rows: int, lookups: int, queue):
+    """ Fill a store and time lookups.  Runs in a child process so peak RSS is for this store only """
+    base_rss = _peak_rss_mb()
+    store = STORES[name]()
+    start = time.perf_counter()
+    for row in make_rows(rows):
+        store.add(row)
+    add_secs = time.perf_counter() - start
+    rss = _peak_rss_mb() - base_rss
+
+    rnd = random.Random(2)
+    keys = [str(rnd.randint(2000000, 2000000 + rows * 2)).encode() for _ in range(lookups)]
+    found = 0
+    start = time.perf_counter()
+    for key in keys:
+        if key in store and store.get(key.decode()) is not None:
+            found += 1
+    lookup_usec = (time.perf_counter() - start) * 1e6 / lookups
+    queue.put((name, len(store), rss, add_secs, lookup_usec, found))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare GeorowStore and dictionary memory use')
+    parser.add_argument('--rows', help='Rows to add to each store', type=int, default=12000000)
+    parser.add_argument('--lookups', help='Lookups to time', type=int, default=1000000)
+    args = parser.parse_args()
+
+    queue = multiprocessing.Queue()
+    print(f'{"Store":15} {"entries":>12} {"peak RSS MB":>12} {"bytes/entry":>12} {"add secs":>10} {"lookup usec":>12} {"found":>10}')
+    for name in STORES:
+        proc = multiprocessing.Process(target=run_store, args=(name, args.rows, args.lookups, queue))
+        proc.start()
+        name, count, rss, add_secs, lookup_usec, found = queue.get()
+        proc.join()
+        print(f'{name:15} {count:12,} {rss:12,.0f} {rss * 1024 * 1024 / count:12,.0f} {add_secs:10.1f} '
+              f'{lookup_usec:12.2f} {found:10,}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2019.       Mike Herbert
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+"""
+Measure how the query LIMIT affects lookup results with and without ORDER BY priority.
+
+    python3 -m geodata.test.BenchPriority --rows 200000
+    python3 -m geodata.test.BenchPriority --directory /Volumes/DISK2/geoname_data   (use real geonames.org files)
+
+Lookups are wildcard names (e.g. 'mon*, france') which match many entries, so the LIMIT decides which
+entries are scored.  The reference result for each lookup uses ORDER BY priority with a large LIMIT.
+For each setting the percent of lookups with the reference result and the mean lookup time are shown.
+Without --directory synthetic geonames files are created in a temp directory.
+"""
+import argparse
+import logging
+import shutil
+import statistics
+import tempfile
+import time
+
+from geodata import Geodata, Loc
+from geodata.test import SyntheticData
+
+
+def run_lookups(geodata: Geodata.Geodata, locations: [str], limit: int, order_by_priority: bool) -> ([str], [float]):
+    """
+    Lookup each location
+    #Args:
+        geodata: Geodata instance
+        locations: list of locations to look up
+        limit: SQL LIMIT for queries
+        order_by_priority: If True, queries use ORDER BY priority
+    #Returns:
+        (list of results, list of lookup times in msec)
+    """
+    geodb = geodata.geo_build.geodb
+    geodb.db.limit_string = f'LIMIT {limit}'
+    geodb.order_by_priority = order_by_priority
+    results = []
+    times = []
+    for location in locations:
+        place = Loc.Loc()
+        start = time.perf_counter()
+        geodata.find_best_match(location, place)
+        times.append((time.perf_counter() - start) * 1000)
+        results.append(f'{place.get_long_name(None)} {place.lat} {place.lon}')
+    return results, times
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare lookup results for query LIMIT with and without ORDER BY priority')
+    parser.add_argument('--directory', help='Directory with geonames.org files.  Default is synthetic data', default='')
+    parser.add_argument('--rows', help='Rows of synthetic data to create', type=int, default=200000)
+    parser.add_argument('--lookups', help='Number of lookups', type=int, default=300)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    directory = args.directory
+    temp_dir = None
+    if directory == '':
+        temp_dir = tempfile.mkdtemp()
+        directory = temp_dir
+        SyntheticData.write_geoname_files(directory, args.rows)
+
+    try:
+        geodata = SyntheticData.open_synthetic_geodata(directory)
+        rows = geodata.geo_build.geodb.db.query("SELECT name, country_name FROM geodata WHERE feature LIKE 'PP%' "
+                                               "ORDER BY random() LIMIT ?", (args.lookups,))
+        locations = [f'{name[0:3]}*, {country}' for name, country in rows]
+
+        reference, _ = run_lookups(geodata, locations, limit=1000, order_by_priority=True)
+        print(f'{"Setting":30} {"same result":>12} {"mean msec":>10}')
+        for limit in [50, 20, 10]:
+            for order_by_priority in [False, True]:
+                results, times = run_lookups(geodata, locations, limit, order_by_priority)
+                same = sum(res == ref for res, ref in zip(results, reference)) * 100 / len(locations)
+                title = f'LIMIT {limit} {"ORDER BY priority" if order_by_priority else "unordered"}'
+                print(f'{title:30} {same:11.1f}% {statistics.mean(times):10.2f}')
+        geodata.close()
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2019.       Mike Herbert
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+"""
+Compare DB size and lookup latency of the V4 schema (all TEXT COLLATE NOCASE) with the current typed V5 schema.
+The current DB also has the admin name columns added in V6.  See BenchAdminNames for their cost.
+
+    python3 -m geodata.test.BenchSchema --rows 200000
+    python3 -m geodata.test.BenchSchema --directory /Volumes/DISK2/geoname_data   (use real geonames.org files)
+
+A DB is built with the current schema and then copied into a V4 layout DB with the same rows and indices.
+The same lookups (the query shapes GeoSearch uses) are timed against each DB.
+Without --directory synthetic geonames files are created in a temp directory.
+"""
+import argparse
+import logging
+import os
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from geodata import GeoSearch
+from geodata.test import SyntheticData
+
+V4_TABLE_SQL = {
+    'geodata': """CREATE TABLE geodata (id integer primary key autoincrement not null, name text COLLATE NOCASE,
+                country text COLLATE NOCASE, admin1_id text COLLATE NOCASE, admin2_id text COLLATE NOCASE,
+                lat text COLLATE NOCASE, lon text COLLATE NOCASE, feature text COLLATE NOCASE,
+                geoid text COLLATE NOCASE, sdx text COLLATE NOCASE, UNIQUE(geoid, name, feature))""",
+    'admin': """CREATE TABLE admin (id integer primary key autoincrement not null, name text COLLATE NOCASE,
+                country text COLLATE NOCASE, admin1_id text COLLATE NOCASE, admin2_id text COLLATE NOCASE,
+                lat text COLLATE NOCASE, lon text COLLATE NOCASE, feature text COLLATE NOCASE,
+                geoid text COLLATE NOCASE, sdx text COLLATE NOCASE, UNIQUE(geoid, name, feature))""",
+    'altname': """CREATE TABLE altname (id integer primary key autoincrement not null, name text COLLATE NOCASE,
+                lang text COLLATE NOCASE, geoid text COLLATE NOCASE, sdx text COLLATE NOCASE, alt_id integer,
+                UNIQUE(geoid, name, lang))"""
+    }
+
+# V4 indices.  The current index SQL uses columns V4 didn't have
+V4_INDEX_SQL = ['CREATE INDEX IF NOT EXISTS geoid_idx ON geodata(geoid)',
+                'CREATE INDEX IF NOT EXISTS admgeoid_idx ON admin(geoid)',
+                'CREATE INDEX IF NOT EXISTS altnamegeoid_idx ON altname(geoid)',
+                'CREATE INDEX IF NOT EXISTS name_idx ON geodata(name, country, admin1_id)',
+                'CREATE INDEX IF NOT EXISTS name_idx2 ON geodata(name, country, feature)',
+                'CREATE INDEX IF NOT EXISTS admin1_idx ON geodata(admin1_id, country, feature)',
+                'CREATE INDEX IF NOT EXISTS sdx_idx ON geodata(sdx, country, feature)',
+                'CREATE INDEX IF NOT EXISTS admin2_idx ON geodata(admin1_id, feature, admin2_id)',
+                'CREATE INDEX IF NOT EXISTS adm_name_idx ON admin(name, country)',
+                'CREATE INDEX IF NOT EXISTS adm_admin1_idx ON admin(admin1_id, feature)',
+                'CREATE INDEX IF NOT EXISTS adm_country_idx ON admin(country, feature)',
+                'CREATE INDEX IF NOT EXISTS adm_sdx_idx ON admin(sdx)',
+                'CREATE INDEX IF NOT EXISTS alt_sdx_idx ON altname(sdx)']
+
+V4_COLUMNS = 'id, name, country, admin1_id, admin2_id, lat, lon, feature, geoid, sdx'
+
+
+def make_v4_copy(db_path: str, v4_path: str):
+    """
+    Copy the rows in db_path into a new DB at v4_path that uses the V4 schema
+    #Args:
+        db_path: DB built with current schema
+        v4_path: path for V4 DB
+    """
+    if os.path.exists(v4_path):
+        os.remove(v4_path)
+    conn = sqlite3.connect(v4_path)
+    conn.execute(f"ATTACH DATABASE '{db_path}' AS src")
+    for tbl, sql in V4_TABLE_SQL.items():
+        conn.execute(sql)
+        # Store lat, lon and geoid as text the way V4 did.  V4 didn't have the admin name columns
+        columns = 'id, name, lang, geoid, sdx, alt_id' if tbl == 'altname' else V4_COLUMNS
+        conn.execute(f'INSERT INTO {tbl} SELECT {columns} FROM src.{tbl}')
+        if tbl != 'altname':
+            conn.execute(f'UPDATE {tbl} SET lat = CAST(lat AS TEXT), lon = CAST(lon AS TEXT), geoid = CAST(geoid AS TEXT)')
+    for sql in V4_INDEX_SQL:
+        conn.execute(sql)
+    conn.commit()
+    conn.execute('DETACH DATABASE src')
+    conn.execute('ANALYZE')
+    conn.execute('VACUUM')
+    conn.close()
+
+
+def get_lookups(db_path: str, count: int) -> [(str, str, tuple)]:
+    """
+    Create lookups from a random sample of DB rows
+    #Args:
+        db_path: DB to sample
+        count: number of rows to sample
+    #Returns:
+        list of (lookup title, SQL, args)
+    """
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute('SELECT name, country, feature, geoid, sdx FROM geodata ORDER BY random() LIMIT ?',
+                        (count,)).fetchall()
+    adm_rows = conn.execute('SELECT name, country, admin1_id FROM admin WHERE feature = ? ORDER BY random() LIMIT ?',
+                            ('ADM1', count,)).fetchall()
+    conn.close()
+
+    select = 'SELECT name, country, admin1_id, admin2_id, lat, lon, feature, geoid, sdx'
+    lookups = []
+    for name, iso, feat, geoid, sdx in rows:
+        prefix = name[0:4]
+        lookups.append(('name = country =', f'{select} FROM geodata WHERE name = ? AND country = ?', (name, iso)))
+        lookups.append(('name range (abc*)', f'{select} FROM geodata WHERE (name >= ? and name < ?) AND country = ?',
+                        (prefix, GeoSearch.inc_key(prefix), iso)))
+        lookups.append(('name LIKE (a*c)', f'{select} FROM geodata WHERE name LIKE ? AND country = ?',
+                        (f'{prefix}%{name[-2:]}', iso)))
+        lookups.append(('sdx range', f'{select} FROM geodata WHERE (sdx >= ? and sdx < ?) AND country = ? AND feature = ?',
+                        (sdx, GeoSearch.inc_key(sdx), iso, feat)))
+        lookups.append(('geoid =', f'{select} FROM geodata WHERE geoid = ?', (str(geoid),)))
+        lookups.append(('altname geoid =', 'SELECT name, lang FROM altname WHERE geoid = ?', (str(geoid),)))
+    for name, iso, adm1 in adm_rows:
+        lookups.append(('admin name', f'{select} FROM admin WHERE name = ? AND country = ? AND feature = ?',
+                        (name, iso, 'ADM1')))
+        lookups.append(('admin1_id', f'{select} FROM admin WHERE admin1_id = ? AND country = ? AND feature = ?',
+                        (adm1, iso, 'ADM1')))
+    return lookups
+
+
+def time_lookups(db_path: str, lookups, case_sensitive_like: bool) -> {}:
+    """
+    Time each lookup
+    #Args:
+        db_path: DB to query
+        lookups: list of (title, sql, args)
+        case_sensitive_like: setting for PRAGMA case_sensitive_like
+    #Returns:
+        dictionary of title: (median usec, mean usec, rows found)
+    """
+    conn = sqlite3.connect(db_path)
+    conn.execute(f'PRAGMA case_sensitive_like = {"ON" if case_sensitive_like else "OFF"}')
+    times = {}
+    found = {}
+    # Warm the page cache so both DBs are compared from memory
+    for title, sql, args in lookups:
+        conn.execute(sql + ' LIMIT 50', args).fetchall()
+    for title, sql, args in lookups:
+        start = time.perf_counter()
+        rows = conn.execute(sql + ' LIMIT 50', args).fetchall()
+        times.setdefault(title, []).append((time.perf_counter() - start) * 1e6)
+        found[title] = found.get(title, 0) + len(rows)
+    conn.close()
+    return {title: (statistics.median(val), statistics.mean(val), found[title]) for title, val in times.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare V4 and current DB schema size and lookup latency')
+    parser.add_argument('--directory', help='Directory with geonames.org files.  Default is synthetic data', default='')
+    parser.add_argument('--rows', help='Rows of synthetic data to create', type=int, default=200000)
+    parser.add_argument('--lookups', help='Rows to sample for lookups', type=int, default=2000)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    directory = args.directory
+    temp_dir = None
+    if directory == '':
+        temp_dir = tempfile.mkdtemp()
+        directory = temp_dir
+        SyntheticData.write_geoname_files(directory, args.rows)
+
+    try:
+        geodata = SyntheticData.open_synthetic_geodata(directory)
+        db_path = geodata.geo_build.get_db_path()
+        geodata.close()
+        v4_path = os.path.join(os.path.dirname(db_path), 'bench_v4.db')
+        make_v4_copy(db_path, v4_path)
+
+        lookups = get_lookups(db_path, args.lookups)
+        v4_times = time_lookups(v4_path, lookups, case_sensitive_like=False)
+        v5_times = time_lookups(db_path, lookups, case_sensitive_like=True)
+
+        v4_size = os.path.getsize(v4_path)
+        v5_size = os.path.getsize(db_path)
+        print(f'{"DB size":30} {"V4":>12} {"V5":>12}')
+        print(f'{"bytes":30} {v4_size:12,} {v5_size:12,}   {(v5_size - v4_size) * 100 / v4_size:+.1f}%')
+        print()
+        print(f'{"Lookup (usec)":30} {"V4 median":>10} {"V5 median":>10} {"V4 mean":>10} {"V5 mean":>10} {"V4 rows":>8} {"V5 rows":>8}')
+        for title in v4_times:
+            v4, v5 = v4_times[title], v5_times[title]
+            print(f'{title:30} {v4[0]:10.1f} {v5[0]:10.1f} {v4[1]:10.1f} {v5[1]:10.1f} {v4[2]:8,} {v5[2]:8,}')
+        os.remove(v4_path)
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2019.       Mike Herbert
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+"""
+Compare cold and warm lookup latency for the read only DB with and without the serving profile.
+
+    python3 -m geodata.test.BenchServing --rows 200000
+    python3 -m geodata.test.BenchServing --directory /Volumes/DISK2/geoname_data   (use real geonames.org files)
+
+Before each setting the DB files are dropped from the OS file cache (posix_fadvise DONTNEED, so this is like the
+first start after a deploy), then the DB is opened and the lookups are run twice.  The first (cold) pass reads
+the DB from disk, the second (warm) pass reads it from the cache.  For each setting the time to open (including
+warming the cache), the median and p99 lookup time for each pass and the lookups with a different result from
+the read only DB are shown.
+Without --directory synthetic geonames files are created in a temp directory.
+"""
+import argparse
+import logging
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+from geodata import Geodata, GeoSearch, Loc, ShardSet
+from geodata.test import SyntheticData
+
+SETTINGS = [('read only', {'read_only': True}),
+            ('serving', {'serving': True}),
+            ('serving + warm cache', {'serving': True, 'warm_cache': True})]
+
+
+def open_geodata(directory: str, **kwargs) -> Geodata.Geodata:
+    """
+    Open Geodata for the synthetic data settings
+    #Args:
+        directory: geonames directory
+        kwargs: args for Geodata.open
+    #Returns:
+        Geodata instance
+    """
+    return SyntheticData.open_synthetic_geodata(directory, open_args=dict(kwargs, repair_database=not kwargs))
+
+
+def drop_file_cache(db_path: str) -> bool:
+    """
+    Drop the DB file and any shard files from the OS file cache
+    #Returns:
+        False if the OS doesn't support it
+    """
+    if not hasattr(os, 'posix_fadvise'):
+        return False
+    paths = [db_path]
+    shard_dir = ShardSet.get_shard_directory(db_path)
+    if os.path.isdir(shard_dir):
+        paths.extend(os.path.join(shard_dir, fname) for fname in os.listdir(shard_dir))
+    for path in paths:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            # Only clean pages are dropped
+            os.fsync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+    return True
+
+
+def run_lookups(geodata: Geodata.Geodata, locations: [str]) -> ([str], [float]):
+    """
+    Lookup each location
+    #Returns:
+        (list of results, list of lookup times in msec)
+    """
+    results = []
+    times = []
+    for location in locations:
+        place = Loc.Loc()
+        start = time.perf_counter()
+        geodata.find_best_match(location, place)
+        times.append((time.perf_counter() - start) * 1000)
+        results.append(f'{place.get_long_name(None)} {place.lat} {place.lon} {place.result_type}')
+    return results, times
+
+
+def percentile(times: [float], pct: float) -> float:
+    """ Returns: the pct percentile of times """
+    return sorted(times)[min(len(times) - 1, int(len(times) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare cold and warm lookup latency for the serving profile')
+    parser.add_argument('--directory', help='Directory with geonames.org files.  Default is synthetic data', default='')
+    parser.add_argument('--rows', help='Rows of synthetic data to create', type=int, default=200000)
+    parser.add_argument('--lookups', help='Names to sample for lookups', type=int, default=500)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    directory = args.directory
+    temp_dir = None
+    if directory == '':
+        temp_dir = tempfile.mkdtemp()
+        directory = temp_dir
+        SyntheticData.write_geoname_files(directory, args.rows)
+
+    try:
+        # Build the DB if needed
+        geodata = open_geodata(directory)
+        db_path = geodata.geo_build.get_db_path()
+        rows = geodata.geo_build.geodb.db.query('SELECT name, admin1_name, country_name FROM geodata '
+                                               'ORDER BY random() LIMIT ?', (args.lookups,))
+        rnd = random.Random(1)
+        locations = []
+        for name, admin1, country in rows:
+            idx = rnd.randrange(1, max(2, len(name) - 1))
+            locations.extend([f'{name}, {admin1}, {country}', f'{name[:3]}*, {country}',
+                              f'{name[:idx]}{name[idx + 1:]}, {country}'])
+        rnd.shuffle(locations)
+        geodata.close()
+
+        if not drop_file_cache(db_path):
+            print('The OS file cache cannot be dropped on this platform, so the cold pass may be warm')
+        print(f'{"Setting":25} {"open msec":>10} {"cold median":>12} {"cold p99":>10} {"warm median":>12} '
+              f'{"warm p99":>10} {"different":>10}')
+        reference = None
+        for title, kwargs in SETTINGS:
+            # The search caches are shared by all GeoSearch instances
+            for func in [GeoSearch.GeoSearch._get_name, GeoSearch.GeoSearch.get_iso_from_admin1_id,
+                         GeoSearch.GeoSearch.get_admin1_id, GeoSearch.GeoSearch.get_country_iso]:
+                func.cache_clear()
+            drop_file_cache(db_path)
+            start = time.perf_counter()
+            geodata = open_geodata(directory, **kwargs)
+            open_msec = (time.perf_counter() - start) * 1000
+            results, cold = run_lookups(geodata, locations)
+            _, warm = run_lookups(geodata, locations)
+            geodata.close()
+            reference = reference or results
+            different = sum(res != ref for res, ref in zip(results, reference))
+            print(f'{title:25} {open_msec:10.1f} {statistics.median(cold):12.2f} {percentile(cold, 99):10.2f} '
+                  f'{statistics.median(warm):12.2f} {percentile(warm, 99):10.2f} {different:10}')
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2019.       Mike Herbert
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+"""
+Measure DB.select time and statement cache hit rate for different statement cache sizes.
+
+    python3 -m geodata.test.BenchStatements --rows 200000
+    python3 -m geodata.test.BenchStatements --directory /Volumes/DISK2/geoname_data   (use real geonames.org files)
+
+Queries are created with QueryItem for sampled entries using several clause shapes (exact name, name and admin1,
+name*, *name, etc.) and run in turn, so a cache smaller than the number of shapes misses on every query.
+The median shows the statement prepare cost; the mean is dominated by a few wildcards with many matches.
+Without --directory synthetic geonames files are created in a temp directory.
+"""
+import argparse
+import logging
+import shutil
+import statistics
+import tempfile
+import time
+
+from geodata import DB, QueryList
+from geodata.test import SyntheticData
+
+COLUMNS = ['name', 'country', 'admin1_id', 'admin2_id', 'feature']
+
+
+def make_queries(rows) -> [(str, ())]:
+    """
+    Create queries with several clause shapes for each row
+    #Args:
+        rows: list of (name, country, admin1_id, feature)
+    #Returns:
+        list of (where, args)
+    """
+    queries = []
+    for name, country, admin1_id, feature in rows:
+        for terms in [[name, country, '', '', ''], [name, country, admin1_id, '', ''], [name, country, '', '', feature],
+                      [f'{name[:3]}*', country, '', '', ''], [f'*{name[2:]}', country, '', '', ''],
+                      [name, country, admin1_id, '', feature], [f'{name[:4]}*', country, admin1_id, '', '']]:
+            item = QueryList.QueryItem()
+            item.add_clauses(where_clauses=COLUMNS, terms=terms)
+            queries.append((item.where, item.args))
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare select time for statement cache sizes')
+    parser.add_argument('--directory', help='Directory with geonames.org files.  Default is synthetic data', default='')
+    parser.add_argument('--rows', help='Rows of synthetic data to create', type=int, default=200000)
+    parser.add_argument('--lookups', help='Entries to sample for queries', type=int, default=2000)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    directory = args.directory
+    temp_dir = None
+    if directory == '':
+        temp_dir = tempfile.mkdtemp()
+        directory = temp_dir
+        SyntheticData.write_geoname_files(directory, args.rows)
+
+    try:
+        geodata = SyntheticData.open_synthetic_geodata(directory)
+        geodb = geodata.geo_build.geodb
+        db_path = geodata.geo_build.get_db_path()
+        select_str = geodb.s.select_str
+        rows = geodb.db.query('SELECT name, country, admin1_id, feature FROM geodata ORDER BY random() LIMIT ?',
+                              (args.lookups,))
+        queries = make_queries(rows)
+        geodata.close()
+
+        print(f'{"Statement cache size":30} {"median usec":>12} {"mean usec":>10} {"hit rate":>10} {"statements":>11}')
+        for size in [4, 16, 128, DB.CACHED_STATEMENTS]:
+            db = DB.DB(db_filename=db_path, show_message=False, exit_on_error=False, cached_statements=size)
+            db.limit_string = 'LIMIT 50'
+            times = []
+            for where, query_args in queries:
+                start = time.perf_counter()
+                db.select(select_str, where, 'main.geodata', query_args, order_str='ORDER BY priority DESC')
+                times.append((time.perf_counter() - start) * 1e6)
+            stats = db.get_statement_stats()
+            db.conn.close()
+            print(f'{size:<30} {statistics.median(times):12.1f} {statistics.mean(times):10.1f} '
+                  f'{stats["hit_rate"]:9.1f}% {stats["statements"]:11}')
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir)
+
+
+if __name__ == "__main__":
+    main()
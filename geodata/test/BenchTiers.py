@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2019.       Mike Herbert
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+"""
+Compare lookup time and results for different lookup tier thresholds in Geodata.find_matches.
+
+    python3 -m geodata.test.BenchTiers --rows 200000
+    python3 -m geodata.test.BenchTiers --directory /Volumes/DISK2/geoname_data   (use real geonames.org files)
+
+Lookups are sampled entries with the admin2 name (so all tiers can run), in a few forms: as is, with admin2 and city
+swapped, with a prefix, and misspelled.  A lookup is correct if the best match has the geoid of the sampled entry.
+For each setting the mean lookup time, the percent correct, the lookups with a different result from 'default'
+(every tier is run) and the stats for each tier are shown.
+Without --directory synthetic geonames files are created in a temp directory.
+"""
+import argparse
+import logging
+import shutil
+import statistics
+import tempfile
+import time
+
+from geodata import Geodata, Loc, MatchScore
+from geodata.test import SyntheticData
+
+SETTINGS = [('default', dict(Geodata.TIER_THRESHOLDS)),
+            ('confident', {'deep': Geodata.POOR_CUTOFF, 'admin2': Geodata.CONFIDENT_SCORE,
+                           'admin2_deep': Geodata.POOR_CUTOFF, 'rescore': 0}),
+            ('fast', {'deep': MatchScore.Score.POOR, 'admin2': 30, 'admin2_deep': MatchScore.Score.POOR,
+                      'rescore': Geodata.CONFIDENT_SCORE})]
+
+
+def run_lookups(geodata: Geodata.Geodata, lookups, thresholds: dict) -> ([str], [float], float):
+    """
+    Lookup each location
+    #Args:
+        geodata: Geodata instance
+        lookups: list of (location, geoid)
+        thresholds: tier thresholds
+    #Returns:
+        (list of results, list of lookup times in msec, percent correct)
+    """
+    geodata.tier_thresholds = dict(thresholds)
+    geodata.clear_tier_stats()
+    results = []
+    times = []
+    correct = 0
+    for location, geoid in lookups:
+        place = Loc.Loc()
+        start = time.perf_counter()
+        geodata.find_best_match(location, place)
+        times.append((time.perf_counter() - start) * 1000)
+        results.append(f'{place.get_long_name(None)} {place.lat} {place.lon} {place.result_type}')
+        correct += str(place.geoid) == str(geoid)
+    return results, times, correct * 100 / len(lookups)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare lookup time and results for lookup tier thresholds')
+    parser.add_argument('--directory', help='Directory with geonames.org files.  Default is synthetic data', default='')
+    parser.add_argument('--rows', help='Rows of synthetic data to create', type=int, default=200000)
+    parser.add_argument('--lookups', help='Entries to sample for lookups', type=int, default=300)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    directory = args.directory
+    temp_dir = None
+    if directory == '':
+        temp_dir = tempfile.mkdtemp()
+        directory = temp_dir
+        SyntheticData.write_geoname_files(directory, args.rows)
+
+    try:
+        geodata = SyntheticData.open_synthetic_geodata(directory)
+        rows = geodata.geo_build.geodb.db.query("SELECT name, admin2_name, admin1_name, country_name, geoid FROM geodata "
+                                               "WHERE admin2_name != '' ORDER BY random() LIMIT ?", (args.lookups,))
+        lookups = []
+        for name, admin2, admin1, country, geoid in rows:
+            for location in [f'{name}, {admin2}, {admin1}, {country}', f'{admin2}, {name}, {admin1}, {country}',
+                             f'old {name}, {admin2}, {admin1}, {country}', f'{name[:-1]}, {admin2}, {admin1}, {country}']:
+                lookups.append((location, geoid))
+
+        # Warm the page cache
+        run_lookups(geodata, lookups, SETTINGS[0][1])
+        reference = None
+        for title, thresholds in SETTINGS:
+            results, times, correct = run_lookups(geodata, lookups, thresholds)
+            reference = reference or results
+            different = sum(res != ref for res, ref in zip(results, reference))
+            print(f'{title:30} {"mean msec":>10} {"correct":>10} {"different":>10}')
+            print(f'{"":30} {statistics.mean(times):10.2f} {correct:9.1f}% {different:10}')
+            print(f'  {"tier":28} {"runs":>10} {"skips":>10} {"hit rate":>10} {"msec/run":>10}')
+            for tier, stats in geodata.get_tier_stats().items():
+                print(f'  {tier:28} {stats["runs"]:10} {stats["skips"]:10} {stats["hit_rate"]:9.1f}% '
+                      f'{stats["msec"]:10.2f}')
+            print()
+        geodata.close()
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir)
+
+
+if __name__ == "__main__":
+    main()
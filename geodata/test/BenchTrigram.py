@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2019.       Mike Herbert
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+"""
+Compare recall and latency of the trigram and soundex deep lookups for misspelled names.
+
+    python3 -m geodata.test.BenchTrigram --rows 200000
+    python3 -m geodata.test.BenchTrigram --directory /Volumes/DISK2/geoname_data   (use real geonames.org files)
+
+Names are sampled from the DB and misspelled with one or two random edits (e.g. 'cardiff' to 'carddif').
+A lookup is a hit if the best match has the geoid of the sampled entry.
+For each strategy the percent of hits and the lookup time are shown.
+Without --directory synthetic geonames files are created in a temp directory.
+"""
+import argparse
+import logging
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+from geodata import Geodata, Loc
+from geodata.test import SyntheticData
+
+
+def misspell(name: str, rnd: random.Random, edits: int) -> str:
+    """
+    Apply random edits to a name.  An edit swaps, drops, doubles or replaces a letter after the first letter
+    #Args:
+        name: name to misspell
+        rnd: random number generator
+        edits: number of edits
+    #Returns:
+        misspelled name
+    """
+    for _ in range(edits):
+        if len(name) < 4:
+            break
+        idx = rnd.randrange(1, len(name) - 1)
+        edit = rnd.randrange(4)
+        if edit == 0:
+            name = name[:idx] + name[idx + 1] + name[idx] + name[idx + 2:]
+        elif edit == 1:
+            name = name[:idx] + name[idx + 1:]
+        elif edit == 2:
+            name = name[:idx] + name[idx] + name[idx:]
+        else:
+            name = name[:idx] + rnd.choice('aeioulnrst') + name[idx + 1:]
+    return name
+
+
+def run_lookups(geodata: Geodata.Geodata, lookups, trigram_lookup: bool) -> ([bool], [float]):
+    """
+    Lookup each location
+    #Args:
+        geodata: Geodata instance
+        lookups: list of (location, geoid)
+        trigram_lookup: If True, deep lookups use the trigram index.  Otherwise soundex
+    #Returns:
+        (list of True for hit, list of lookup times in msec)
+    """
+    geodata.geo_build.geodb.s.trigram_lookup = trigram_lookup
+    hits = []
+    times = []
+    for location, geoid in lookups:
+        place = Loc.Loc()
+        start = time.perf_counter()
+        geodata.find_best_match(location, place)
+        times.append((time.perf_counter() - start) * 1000)
+        hits.append(str(place.geoid) == str(geoid))
+    return hits, times
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare trigram and soundex lookups of misspelled names')
+    parser.add_argument('--directory', help='Directory with geonames.org files.  Default is synthetic data', default='')
+    parser.add_argument('--rows', help='Rows of synthetic data to create', type=int, default=200000)
+    parser.add_argument('--lookups', help='Number of lookups', type=int, default=300)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    directory = args.directory
+    temp_dir = None
+    if directory == '':
+        temp_dir = tempfile.mkdtemp()
+        directory = temp_dir
+        SyntheticData.write_geoname_files(directory, args.rows)
+
+    try:
+        geodata = SyntheticData.open_synthetic_geodata(directory)
+        if not geodata.geo_build.geodb.has_trigram_index('main.geodata'):
+            print('No trigram index.  Rebuild the database')
+            geodata.close()
+            return
+        rows = geodata.geo_build.geodb.db.query("SELECT name, country_name, geoid FROM geodata WHERE feature LIKE 'PP%' "
+                                               "ORDER BY random() LIMIT ?", (args.lookups,))
+        rnd = random.Random(1)
+        lookups = []
+        for name, country, geoid in rows:
+            lookups.append((f'{misspell(name, rnd, edits=1)}, {country}', geoid))
+            lookups.append((f'{misspell(name, rnd, edits=2)}, {country}', geoid))
+
+        print(f'{"Deep lookup":30} {"edits":>6} {"hits":>8} {"median msec":>12} {"p99 msec":>10}')
+        for trigram_lookup in [False, True]:
+            hits, times = run_lookups(geodata, lookups, trigram_lookup)
+            title = 'trigram' if trigram_lookup else 'soundex'
+            for edits in [1, 2]:
+                edit_hits = hits[edits - 1::2]
+                edit_times = sorted(times[edits - 1::2])
+                print(f'{title:30} {edits:6} {sum(edit_hits) * 100 / len(edit_hits):7.1f}% '
+                      f'{statistics.median(edit_times):12.2f} {edit_times[int(len(edit_times) * 0.99)]:10.2f}')
+        geodata.close()
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2019.       Mike Herbert
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+"""
+Compare running each query list as one UNION ALL statement with running the queries one at a time.
+
+    python3 -m geodata.test.BenchUnion --rows 200000
+    python3 -m geodata.test.BenchUnion --directory /Volumes/DISK2/geoname_data   (use real geonames.org files)
+
+Lookups are sampled names with and without the admin1 name, wildcard names and names with a letter dropped.
+For each setting the SELECT statements per lookup, the lookup time and the number of lookups with a different
+result from running the queries one at a time are shown.
+Without --directory synthetic geonames files are created in a temp directory.
+"""
+import argparse
+import logging
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+from geodata import Geodata, Loc
+from geodata.test import SyntheticData
+
+
+def run_lookups(geodata: Geodata.Geodata, locations: [str], union_queries: bool) -> ([str], [float], float):
+    """
+    Lookup each location
+    #Args:
+        geodata: Geodata instance
+        locations: list of locations to look up
+        union_queries: If True, query lists are run as one UNION ALL statement
+    #Returns:
+        (list of results, list of lookup times in msec, SELECT statements per lookup)
+    """
+    db = geodata.geo_build.geodb.db
+    geodata.geo_build.geodb.union_queries = union_queries
+    selects = db.statement_hits + db.statement_misses
+    results = []
+    times = []
+    for location in locations:
+        place = Loc.Loc()
+        start = time.perf_counter()
+        geodata.find_best_match(location, place)
+        times.append((time.perf_counter() - start) * 1000)
+        results.append(f'{place.get_long_name(None)} {place.lat} {place.lon} {place.result_type}')
+    selects = db.statement_hits + db.statement_misses - selects
+    return results, times, selects / len(locations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare UNION ALL query lists with one query at a time')
+    parser.add_argument('--directory', help='Directory with geonames.org files.  Default is synthetic data', default='')
+    parser.add_argument('--rows', help='Rows of synthetic data to create', type=int, default=200000)
+    parser.add_argument('--lookups', help='Names to sample for lookups', type=int, default=300)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    directory = args.directory
+    temp_dir = None
+    if directory == '':
+        temp_dir = tempfile.mkdtemp()
+        directory = temp_dir
+        SyntheticData.write_geoname_files(directory, args.rows)
+
+    try:
+        geodata = SyntheticData.open_synthetic_geodata(directory)
+        rows = geodata.geo_build.geodb.db.query('SELECT name, admin1_name, country_name FROM geodata '
+                                               'ORDER BY random() LIMIT ?', (args.lookups,))
+        rnd = random.Random(1)
+        locations = []
+        for name, admin1, country in rows:
+            idx = rnd.randrange(1, max(2, len(name) - 1))
+            locations.extend([f'{name}, {country}', f'{name}, {admin1}, {country}', f'{name[:3]}*, {country}',
+                              f'{name[:idx]}{name[idx + 1:]}, {country}'])
+
+        # Warm the page cache
+        reference, _, _ = run_lookups(geodata, locations, union_queries=False)
+        print(f'{"Query list":30} {"selects":>8} {"median msec":>12} {"mean msec":>10} {"different":>10}')
+        for union_queries in [False, True]:
+            results, times, selects = run_lookups(geodata, locations, union_queries)
+            different = sum(res != ref for res, ref in zip(results, reference))
+            title = 'UNION ALL' if union_queries else 'one query at a time'
+            print(f'{title:30} {selects:8.2f} {statistics.median(times):12.2f} {statistics.mean(times):10.2f} '
+                  f'{different:10}')
+        geodata.close()
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir)
+
+
+if __name__ == "__main__":
+    main()
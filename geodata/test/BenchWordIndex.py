@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2019.       Mike Herbert
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+"""
+Measure the FTS5 word index used for wildcard name searches.
+
+    python3 -m geodata.test.BenchWordIndex --rows 200000
+    python3 -m geodata.test.BenchWordIndex --directory /Volumes/DISK2/geoname_data   (use real geonames.org files)
+
+Wildcard patterns with a leading wildcard (e.g. '*ton cath*') are made from sampled names.  These can't use
+the name index so LIKE alone scans every row for the country.  The time for the geodata query is
+compared for LIKE alone, for LIKE narrowed by the word index, and for the query QueryItem creates (a range on
+the reversed name if the only wildcard is at the start).  All must return the same rows.
+DB size is compared with a copy of the DB that has the word index dropped.
+Without --directory synthetic geonames files are created in a temp directory.
+"""
+import argparse
+import logging
+import os
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from geodata import GeoDB, QueryList
+from geodata.test import SyntheticData
+
+
+def make_patterns(rows) -> [str]:
+    """
+    Create wildcard patterns from names
+    #Args:
+        rows: list of (name, country)
+    #Returns:
+        list of (pattern, country)
+    """
+    patterns = []
+    for name, country in rows:
+        words = name.split(' ')
+        patterns.append((f'*{words[0][-3:]} {words[1][:4]}*', country))
+        patterns.append((f'*{words[0][1:]} {words[1]}', country))
+        patterns.append((f'*{words[0][-2:]} {words[1][:3]}*{words[1][-2:]}', country))
+    return patterns
+
+
+def time_queries(db, patterns, method: str) -> ([list], [float]):
+    """
+    Run the geodata query for each pattern
+    #Args:
+        db: DB instance
+        patterns: list of (pattern, country)
+        method: 'like' for LIKE alone, 'word' for LIKE narrowed by the word index, 'query' for the QueryItem query
+    #Returns:
+        (list of result rows, list of query times in msec)
+    """
+    results = []
+    times = []
+    for pattern, country in patterns:
+        if method == 'query':
+            item = QueryList.QueryItem()
+            item.add_clauses(where_clauses=['name', 'country'], terms=[pattern, country])
+            sql = f'SELECT * FROM geodata WHERE {item.where}'
+            args = item.args
+            word = item.word
+        else:
+            sql = 'SELECT * FROM geodata WHERE name LIKE ? AND country = ?'
+            args = (QueryList.QueryItem.create_wildcard(pattern, remove=False), country)
+            word = QueryList.get_word_match(pattern) if method == 'word' else None
+        if word:
+            sql += ' AND ' + GeoDB.WORD_INDEX_CLAUSE.format('main')
+            args += (word,)
+        start = time.perf_counter()
+        results.append(sorted(db.query(sql, args)))
+        times.append((time.perf_counter() - start) * 1000)
+    return results, times
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare wildcard query time and DB size with and without the word index')
+    parser.add_argument('--directory', help='Directory with geonames.org files.  Default is synthetic data', default='')
+    parser.add_argument('--rows', help='Rows of synthetic data to create', type=int, default=200000)
+    parser.add_argument('--lookups', help='Names to sample for patterns', type=int, default=300)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    directory = args.directory
+    temp_dir = None
+    if directory == '':
+        temp_dir = tempfile.mkdtemp()
+        directory = temp_dir
+        SyntheticData.write_geoname_files(directory, args.rows)
+
+    try:
+        geodata = SyntheticData.open_synthetic_geodata(directory)
+        geodb = geodata.geo_build.geodb
+        if not geodb.has_word_index('main.geodata'):
+            print('No word index.  FTS5 is not available in this sqlite build')
+            geodata.close()
+            return
+        db_path = geodata.geo_build.get_db_path()
+        rows = geodb.db.query("SELECT name, country FROM geodata WHERE name LIKE '% %' ORDER BY random() LIMIT ?",
+                              (args.lookups,))
+        patterns = make_patterns(rows)
+
+        like_results, like_times = time_queries(geodb.db, patterns, method='like')
+        word_results, word_times = time_queries(geodb.db, patterns, method='word')
+        query_results, query_times = time_queries(geodb.db, patterns, method='query')
+        geodata.close()
+        mismatch = sum(like != word or like != query for like, word, query in
+                       zip(like_results, word_results, query_results))
+
+        copy_path = os.path.join(os.path.dirname(db_path), 'bench_no_word_index.db')
+        shutil.copyfile(db_path, copy_path)
+        conn = sqlite3.connect(copy_path)
+        conn.execute('DROP TABLE geodata_fts')
+        conn.execute('VACUUM')
+        conn.close()
+        index_size = os.path.getsize(db_path)
+        no_index_size = os.path.getsize(copy_path)
+        os.remove(copy_path)
+
+        print(f'{"DB size":30} {"no index":>14} {"word index":>14}')
+        print(f'{"bytes":30} {no_index_size:14,} {index_size:14,}   '
+              f'{(index_size - no_index_size) * 100 / no_index_size:+.1f}%')
+        print()
+        print(f'{"Query (msec)":30} {"median":>10} {"mean":>10} {"p99":>10}')
+        for title, times in [('LIKE', like_times), ('LIKE + word index', word_times), ('QueryItem', query_times)]:
+            p99 = sorted(times)[int(len(times) * 0.99)]
+            print(f'{title:30} {statistics.median(times):10.2f} {statistics.mean(times):10.2f} {p99:10.2f}')
+        print(f'\n{len(patterns)} patterns, {mismatch} with different results')
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2019.       Mike Herbert
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+"""
+Create synthetic geonames.org style files (allCountries.txt, alternateNamesV2.txt) for benchmarks and tests.
+The files have the same column layout as the geonames.org dumps so the normal build path can read them.
+"""
+import os
+import random
+
+from geodata import Geodata
+
+# Countries written to the synthetic files.  The last two are NOT in supported_countries so they exercise the filter
+COUNTRIES = ['gb', 'fr', 'de', 'ca', 'us', 'it', 'es']
+SUPPORTED_COUNTRIES = {'gb', 'fr', 'de', 'ca', 'us'}
+FEATURES = {"ADM1", "ADM2", "ADM3", "ADM4", "ADMF", "CH", "CSTL", "CMTY", "EST ", "HSP", "FT",
+            "HSTS", "ISL", "MSQE", "MSTY", "MT", "MUS", "PAL", "PPL", "PPLA", "PPLA2", "PPLA3", "PPLA4",
+            "PPLC", "PPLG", "PPLH", "PPLL", "PPLQ", "PPLX", "PRK", "PRN", "PRSH", "RUIN", "RLG", "STG", "SQR", "SYG", "VAL"}
+
+# Feature codes written for places.  STM and HTL are not in FEATURES so they exercise the feature filter
+_PLACE_FEATURES = ['PPL', 'PPL', 'PPL', 'PPLA2', 'PPLX', 'CH', 'CSTL', 'CMTY', 'STM', 'HTL']
+_SYLLABLES = ['ash', 'bar', 'ber', 'bro', 'bury', 'cas', 'ches', 'dale', 'den', 'don', 'field', 'ford', 'gate',
+              'ham', 'hill', 'kirk', 'lan', 'ley', 'lin', 'mar', 'mont', 'mouth', 'new', 'nor', 'port', 'ric',
+              'sal', 'stan', 'ter', 'ton', 'vale', 'ville', 'wal', 'wick', 'win', 'wood', 'worth']
+_PREFIXES = ['', '', '', '', 'St ', 'North ', 'Upper ', 'Saint-', 'Le ', 'Bad ']
+
+# Places that are always written so lookup tests have known entries.  (geoid, name, feat, iso, admin1, admin2, pop, lat, lon)
+KNOWN_PLACES = [
+    ('2653822', 'Cardiff', 'PPLA', 'gb', 'WLS', 'X5', '302139', '51.48', '-3.18'),
+    ('2650225', 'Edinburgh', 'PPLA', 'gb', 'SCT', 'U8', '464990', '55.95', '-3.19'),
+    ('2650229', 'Edinburgh Castle', 'CSTL', 'gb', 'SCT', 'U8', '0', '55.94', '-3.20'),
+    ('2653941', 'Canterbury', 'PPL', 'gb', 'ENG', 'G5', '43432', '51.27', '1.08'),
+    ('6619951', 'Canterbury Cathedral', 'CH', 'gb', 'ENG', 'G5', '0', '51.27', '1.08'),
+    ('2643743', 'London', 'PPLC', 'gb', 'ENG', 'GLA', '7556900', '51.50', '-0.12'),
+    ('2988507', 'Paris', 'PPLC', 'fr', '11', '75', '2138551', '48.85', '2.35'),
+    ('2983990', 'Nogent-le-Roi', 'PPL', 'fr', '24', '28', '4037', '48.64', '1.53'),
+    ('6324729', 'Halifax', 'PPLA', 'ca', '07', '', '359111', '44.64', '-63.57'),
+    ('4930956', 'Boston', 'PPLA', 'us', 'MA', '025', '667137', '42.35', '-71.05'),
+    ('2950159', 'Berlin', 'PPLC', 'de', '16', '00', '3426354', '52.52', '13.41'),
+    ]
+
+# Admin1 entries for KNOWN_PLACES.  (geoid, name, iso, admin1)
+KNOWN_ADMIN1 = [
+    ('2634895', 'Wales', 'gb', 'WLS'),
+    ('2638360', 'Scotland', 'gb', 'SCT'),
+    ('6269131', 'England', 'gb', 'ENG'),
+    ('3012874', 'Ile-de-France', 'fr', '11'),
+    ('3027939', 'Centre-Val de Loire', 'fr', '24'),
+    ('6091530', 'Nova Scotia', 'ca', '07'),
+    ('6254926', 'Massachusetts', 'us', 'MA'),
+    ('2950157', 'Land Berlin', 'de', '16'),
+    ]
+
+
+def _name(rnd: random.Random) -> str:
+    words = ''.join(rnd.choice(_SYLLABLES) for _ in range(rnd.randint(2, 3)))
+    return rnd.choice(_PREFIXES) + words.capitalize()
+
+
+def _row(geoid, name, feat, iso, admin1, admin2, pop, lat, lon) -> str:
+    feat_class = 'A' if feat.startswith('ADM') else 'P'
+    cols = [geoid, name, name, '', lat, lon, feat_class, feat, iso.upper(), '', admin1, admin2, '', '', pop, '', '10',
+            'Europe/London', '2019-01-01']
+    return '\t'.join(cols) + '\n'
+
+
+def write_geoname_files(directory: str, rows: int, seed=1, alt_per_row=2.0):
+    """
+    Write synthetic allCountries.txt and alternateNamesV2.txt into directory and create directory/cache
+    #Args:
+        directory: directory to write files into
+        rows: approximate number of rows for allCountries.txt
+        seed: random seed
+        alt_per_row: average number of alternate name lines per geoname row
+    #Returns:
+        (number of lines in allCountries.txt, number of lines in alternateNamesV2.txt)
+    """
+    rnd = random.Random(seed)
+    os.makedirs(os.path.join(directory, 'cache'), exist_ok=True)
+    geoid = 8000000
+    alt_id = 1
+    geoid_list = []
+    lines = 0
+    alt_lines = 0
+
+    with open(os.path.join(directory, 'allCountries.txt'), 'w', encoding='utf-8') as geofile:
+        for adm in KNOWN_ADMIN1:
+            geofile.write(_row(adm[0], adm[1], 'ADM1', adm[2], adm[3], '', '0', '50.0', '1.0'))
+            geoid_list.append(adm[0])
+            lines += 1
+        for place in KNOWN_PLACES:
+            geofile.write(_row(*place))
+            geoid_list.append(place[0])
+            lines += 1
+
+        per_country = max(1, rows // len(COUNTRIES))
+        for iso in COUNTRIES:
+            admin1_list = [f'{idx:02d}' for idx in range(1, 13)]
+            for admin1 in admin1_list:
+                geoid += 1
+                geofile.write(_row(str(geoid), _name(rnd), 'ADM1', iso, admin1, '', '0', '47.0', '2.0'))
+                geoid_list.append(str(geoid))
+                for admin2 in range(1, 4):
+                    geoid += 1
+                    geofile.write(_row(str(geoid), _name(rnd) + ' County', 'ADM2', iso, admin1, f'{admin2:03d}', '0', '47.0', '2.0'))
+                    geoid_list.append(str(geoid))
+                    lines += 1
+                lines += 1
+            for _ in range(per_country):
+                geoid += 1
+                pop = str(rnd.choice([0, 0, 0, 250, 4000, 25000, 300000]))
+                lat = f'{rnd.uniform(40, 60):.5f}'
+                lon = f'{rnd.uniform(-10, 20):.5f}'
+                geofile.write(_row(str(geoid), _name(rnd), rnd.choice(_PLACE_FEATURES), iso, rnd.choice(admin1_list),
+                                   f'{rnd.randint(1, 3):03d}', pop, lat, lon))
+                geoid_list.append(str(geoid))
+                lines += 1
+
+    with open(os.path.join(directory, 'alternateNamesV2.txt'), 'w', encoding='utf-8') as altfile:
+        for gid in geoid_list:
+            count = int(alt_per_row) + (1 if rnd.random() < alt_per_row - int(alt_per_row) else 0)
+            for _ in range(count):
+                lang = rnd.choice(['en', 'en', 'de', 'fr', 'ru', 'zh', 'link', 'post', ''])
+                if lang == 'link':
+                    name = 'https://en.wikipedia.org/wiki/' + _name(rnd)
+                elif lang == 'post':
+                    name = str(rnd.randint(10000, 99999))
+                else:
+                    name = _name(rnd)
+                altfile.write(f'{alt_id}\t{gid}\t{lang}\t{name}\t\t\t\t\t\t\n')
+                alt_id += 1
+                alt_lines += 1
+        # Add a few alternate names for geoids that are NOT in the geoname file
+        for _ in range(int(len(geoid_list) * 0.5)):
+            altfile.write(f'{alt_id}\t{rnd.randint(1, 7000000)}\ten\t{_name(rnd)}\t\t\t\t\t\t\n')
+            alt_id += 1
+            alt_lines += 1
+
+    return lines, alt_lines
+
+
+def create_geodata(directory: str, languages=None, **kwargs) -> Geodata.Geodata:
+    """
+    Create Geodata for the synthetic geonames files in directory.  The DB isn't opened
+    #Args:
+        directory: directory with the geonames files
+        languages: languages loaded from alternate names.  Default is {'en'}
+        kwargs: other Geodata args, e.g. sharded, workers
+    #Returns:
+        Geodata instance
+    """
+    return Geodata.Geodata(directory_name=directory, display_progress=None, show_message=False, exit_on_error=False,
+                           languages_list_dct={'en'} if languages is None else set(languages),
+                           feature_code_list_dct=FEATURES, supported_countries_dct=SUPPORTED_COUNTRIES, **kwargs)
+
+
+def open_synthetic_geodata(directory: str, rows=0, open_args=None, **kwargs) -> Geodata.Geodata:
+    """
+    Create Geodata for synthetic geonames files and open its DB.  The DB is built if needed
+    #Args:
+        directory: directory for the geonames files
+        rows: If not 0, synthetic geonames files with about this many rows are written to directory first
+        open_args: args for Geodata.open.  Default is repair_database=True, query_limit=50
+        kwargs: args for create_geodata
+    #Returns:
+        Geodata with its DB open
+    #Raises:
+        ValueError if the DB can't be built or opened
+    """
+    if rows:
+        write_geoname_files(directory, rows)
+    geodata = create_geodata(directory, **kwargs)
+    open_args = dict({'repair_database': True, 'query_limit': 50}, **(open_args or {}))
+    if geodata.open(**open_args):
+        if geodata.geo_build.geodb is not None:
+            geodata.close()
+        raise ValueError(f'Unable to open synthetic DB in {directory}')
+    return geodata
@@ -29,7 +29,7 @@ features = ["ADM1", "ADM2", "ADM3", "ADM4", "ADMF", "CH", "CSTL", "CMTY", "EST "
 
 def run_test(title: str, pref: str, result:str)->str:
     print("*****TEST: {}".format(title))
-    return Loc.Loc.matchscore_prefix(pref, result)
+    return Loc.Loc.prefix_cleanup(pref, result)
 
 
 class TestClearPrefix(unittest.TestCase):
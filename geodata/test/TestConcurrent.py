@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2019.       Mike Herbert
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+import logging
+import shutil
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+from geodata import Geodata, Loc
+from geodata.test import SyntheticData
+
+ROWS = 2000
+THREADS = 4
+LOCATIONS = ['cardiff, wales', 'carddif, wales', 'eddinburg castle,,scotland', 'cant* cath*,england', 'paris, france',
+             '*bury, england', 'halifax, nova scotia, canada', 'boston,,ma, united states', 'berlin, germany', 'london']
+
+
+def lookup(geodata: Geodata.Geodata, location: str) -> str:
+    place = Loc.Loc()
+    geodata.find_best_match(location, place)
+    return f'{place.get_long_name(None)} {place.lat} {place.lon} {place.geoid} {place.result_type}'
+
+
+class TestConcurrent(unittest.TestCase):
+    """
+    Lookups from several threads on a read only DB.  Each thread has its own connection.  The DB is built from
+    synthetic geonames files in a temp directory
+    """
+
+    def setUp(self) -> None:
+        fmt = "%(levelname)s %(name)s.%(funcName)s %(lineno)d: %(message)s"
+        logging.basicConfig(level=logging.ERROR, format=fmt)
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        geodata = SyntheticData.open_synthetic_geodata(self.temp_dir, rows=ROWS)
+        rows = geodata.geo_build.geodb.db.query('SELECT name, admin1_name, country_name FROM geodata WHERE id % 37 = 0')
+        self.locations = LOCATIONS + [', '.join(row) for row in rows]
+        geodata.close()
+
+    def test_threads(self):
+        # Each thread gets the single thread results.  close() closes the connection for every thread
+        geodata = SyntheticData.open_synthetic_geodata(self.temp_dir, open_args={'read_only': True,
+                                                                                 'repair_database': False})
+        db = geodata.geo_build.geodb.db
+        expected = [lookup(geodata, location) for location in self.locations]
+        barrier = threading.Barrier(THREADS)
+        results = [None] * THREADS
+        connections = [None] * THREADS
+
+        def run(idx):
+            barrier.wait()
+            # Each thread starts at a different location
+            order = self.locations[idx:] + self.locations[:idx]
+            found = {location: lookup(geodata, location) for location in order}
+            results[idx] = [found[location] for location in self.locations]
+            connections[idx] = db.conn
+
+        threads = [threading.Thread(target=run, args=(idx,)) for idx in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for idx in range(THREADS):
+            with self.subTest(thread=idx):
+                self.assertEqual(expected, results[idx])
+        connections.append(db.conn)
+        self.assertEqual(THREADS + 1, len({id(conn) for conn in connections}))
+
+        geodata.close()
+        for conn in connections:
+            with self.assertRaises(sqlite3.ProgrammingError):
+                conn.execute('SELECT 1')
+
+
+if __name__ == '__main__':
+    unittest.main()
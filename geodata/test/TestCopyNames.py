@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2019.       Mike Herbert
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+import logging
+import shutil
+import tempfile
+import unittest
+
+from geodata import Loc
+from geodata.GeoUtil import Entry
+from geodata.test import SyntheticData
+
+
+class TestCopyNames(unittest.TestCase):
+    """
+    Check GeoSearch.copy_names with the names stored on DB rows and the update_names fallback.  A DB is built from
+    synthetic geonames files in a temp directory
+    """
+    geodata = None
+    temp_dir = None
+
+    @classmethod
+    def setUpClass(cls):
+        fmt = "%(levelname)s %(name)s.%(funcName)s %(lineno)d: %(message)s"
+        logging.basicConfig(level=logging.ERROR, format=fmt)
+        cls.temp_dir = tempfile.mkdtemp()
+        cls.geodata = SyntheticData.open_synthetic_geodata(cls.temp_dir, rows=300)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.geodata.close()
+        shutil.rmtree(cls.temp_dir)
+
+    def get_row(self, geoid: str, table='main.geodata') -> tuple:
+        search = TestCopyNames.geodata.geo_build.geodb.s
+        return tuple(TestCopyNames.geodata.geo_build.geodb.db.select(search.select_str, 'geoid = ?', table, (geoid,))[0])
+
+    @staticmethod
+    def copy(row) -> Loc.Loc:
+        place = Loc.Loc()
+        TestCopyNames.geodata.geo_build.geodb.copy_georow_to_place(row, place, fast=False)
+        return place
+
+    def test_stored_names(self):
+        # The names come from the row, not the DB
+        row = self.get_row('2653822')
+        row = row[:Entry.ADM1_NAME] + ('adm1 x', 'adm2 x', 'country x')
+        place = self.copy(row)
+        self.assertEqual(('adm1 x', 'adm2 x', 'country x'), (place.admin1_name, place.admin2_name, place.country_name))
+
+    def test_keep_names(self):
+        # Admin names already set are kept.  The country name is set from the row
+        row = self.get_row('2653822')
+        row = row[:Entry.ADM1_NAME] + ('adm1 x', 'adm2 x', 'country x')
+        place = Loc.Loc()
+        place.admin1_name = 'wales'
+        place.country_name = 'uk'
+        TestCopyNames.geodata.geo_build.geodb.s.copy_names(row, place)
+        self.assertEqual(('wales', 'adm2 x', 'country x'), (place.admin1_name, place.admin2_name, place.country_name))
+
+    def test_fallback(self):
+        # Rows without stored names get the same names from update_names
+        for geoid, table in [('2653822', 'main.geodata'), ('2988507', 'main.geodata'), ('2634895', 'main.admin'),
+                             ('fr', 'main.admin')]:
+            with self.subTest(geoid=geoid):
+                row = self.get_row(geoid, table)
+                stored = self.copy(row)
+                for fallback_row in [row[:Entry.ADM1_NAME], row[:Entry.COUNTRY_NAME] + (None,)]:
+                    place = self.copy(fallback_row)
+                    self.assertEqual((stored.admin1_name, stored.admin2_name, stored.country_name),
+                                     (place.admin1_name, place.admin2_name, place.country_name))
+        place = self.copy(self.get_row('2653822')[:Entry.ADM1_NAME])
+        self.assertEqual('wales', place.admin1_name)
+
+
+if __name__ == '__main__':
+    unittest.main()
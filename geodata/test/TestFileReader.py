@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2019.       Mike Herbert
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+import gzip
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+from geodata import FileReader, Geodata
+from geodata.test import SyntheticData
+
+ROWS = 1000
+LINES = ''.join(f'{idx}\tplace {idx}\té\n' for idx in range(2000)).encode('utf-8')
+
+
+def write_zip(path: str, member: str, data: bytes):
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as zip_file:
+        zip_file.writestr('readme.txt' if member != 'readme.txt' else 'other.txt', b'not this one\n')
+        zip_file.writestr(member, data)
+
+
+def write_gz(path: str, data: bytes):
+    with gzip.open(path, 'wb') as gz_file:
+        gz_file.write(data)
+
+
+def get_rows(geodata: Geodata.Geodata) -> {}:
+    """ Returns: dictionary of table: all rows in id order """
+    db = geodata.geo_build.geodb.db
+    return {tbl: list(db.query(f'SELECT * FROM {tbl} ORDER BY id')) for tbl in ['geodata', 'admin', 'altname']}
+
+
+class TestFileReader(unittest.TestCase):
+    """
+    Read geonames files that are zip or gzip compressed.  The DBs are built from synthetic geonames files in temp
+    directories
+    """
+
+    def setUp(self) -> None:
+        fmt = "%(levelname)s %(name)s.%(funcName)s %(lineno)d: %(message)s"
+        logging.basicConfig(level=logging.ERROR, format=fmt)
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+
+    def test_find_file(self):
+        self.assertIsNone(FileReader.find_file(self.temp_dir, 'GB.txt'))
+        # Country zips from geonames.org are upper case
+        write_zip(os.path.join(self.temp_dir, 'GB.zip'), 'GB.txt', LINES)
+        self.assertEqual(os.path.join(self.temp_dir, 'GB.zip'), FileReader.find_file(self.temp_dir, 'gb.txt'))
+        write_gz(os.path.join(self.temp_dir, 'allCountries.txt.gz'), LINES)
+        self.assertEqual(os.path.join(self.temp_dir, 'allCountries.txt.gz'),
+                         FileReader.find_file(self.temp_dir, 'allCountries.txt'))
+        # The uncompressed file is used if it is there
+        with open(os.path.join(self.temp_dir, 'allCountries.txt'), 'wb') as txt_file:
+            txt_file.write(LINES)
+        self.assertEqual(os.path.join(self.temp_dir, 'allCountries.txt'),
+                         FileReader.find_file(self.temp_dir, 'allCountries.txt'))
+
+    def test_input_file(self):
+        # Same lines and positions for the file, zip and gzip
+        paths = [os.path.join(self.temp_dir, fname) for fname in ['data.txt', 'data.zip', 'data.gz']]
+        with open(paths[0], 'wb') as txt_file:
+            txt_file.write(LINES)
+        write_zip(paths[1], 'data.txt', LINES)
+        write_gz(paths[2], LINES)
+        offset = LINES.index(b'\n1000\t') + 1
+        for path in paths:
+            for use_mmap in [False, True]:
+                with self.subTest(path=path, use_mmap=use_mmap):
+                    with FileReader.InputFile(path, 'data.txt', use_mmap=use_mmap) as input_file:
+                        self.assertEqual(path.endswith('.txt'), not input_file.compressed)
+                        self.assertEqual(LINES.splitlines(keepends=True), list(input_file))
+                        # For a zip, the bytes after the member aren't read
+                        self.assertAlmostEqual(100.0, input_file.progress(), delta=5)
+                    with FileReader.InputFile(path, 'data.txt', use_mmap=use_mmap) as input_file:
+                        input_file.seek(offset)
+                        self.assertEqual(offset, input_file.tell())
+                        self.assertEqual(b'1000\tplace 1000\t\xc3\xa9\n', input_file.readline())
+                        self.assertEqual(LINES[input_file.tell():], input_file.read())
+
+    def test_zip_member(self):
+        # The member with the file name is used.  Otherwise the first .txt file
+        path = os.path.join(self.temp_dir, 'GB.zip')
+        write_zip(path, 'GB.txt', LINES)
+        with FileReader.InputFile(path, 'gb.txt') as input_file:
+            self.assertEqual(LINES, input_file.read())
+        with FileReader.InputFile(path, 'allCountries.txt') as input_file:
+            self.assertEqual(b'not this one\n', input_file.read())
+        with zipfile.ZipFile(path, 'w') as zip_file:
+            zip_file.writestr('GB.csv', LINES)
+        with self.assertRaises(ValueError):
+            FileReader.InputFile(path, 'GB.txt')
+
+    def test_build(self):
+        # A DB built from allCountries.zip and alternateNamesV2.txt.gz is the same as one built from the text files
+        geodata = SyntheticData.open_synthetic_geodata(self.temp_dir, rows=ROWS)
+        expected = get_rows(geodata)
+        geodata.close()
+
+        compressed_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, compressed_dir)
+        os.mkdir(os.path.join(compressed_dir, 'cache'))
+        with open(os.path.join(self.temp_dir, 'allCountries.txt'), 'rb') as txt_file:
+            write_zip(os.path.join(compressed_dir, 'allCountries.zip'), 'allCountries.txt', txt_file.read())
+        with open(os.path.join(self.temp_dir, 'alternateNamesV2.txt'), 'rb') as txt_file:
+            write_gz(os.path.join(compressed_dir, 'alternateNamesV2.txt.gz'), txt_file.read())
+
+        geodata = SyntheticData.open_synthetic_geodata(compressed_dir)
+        self.addCleanup(geodata.close)
+        self.assertEqual(expected, get_rows(geodata))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2019.       Mike Herbert
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+import random
+import unittest
+
+from geodata.GeorowStore import GeorowStore
+
+
+def make_row(geoid, name='paris') -> tuple:
+    return name, 'fr', 'A8', '75', '48.85', '2.35', 'PPLC', str(geoid), 'p620', '2138551'
+
+
+class TestGeorowStore(unittest.TestCase):
+    """
+    Check GeorowStore against a dictionary of the first row added for each geoid
+    """
+
+    def test_first_row_kept(self):
+        store = GeorowStore()
+        store.add(make_row('2988507'))
+        store.add(make_row('2988507', name='lutece'))
+        self.assertEqual(make_row('2988507'), store.get('2988507'))
+        self.assertEqual(1, len(store))
+
+    def test_key_types(self):
+        # Rows read from the DB have an int geoid and numeric lat, lon and pop.  They are returned as text
+        store = GeorowStore()
+        store.add(('paris', 'fr', 'A8', '75', 48.85, 2.35, 'PPLC', 2988507, 'p620', 2138551))
+        self.assertEqual(make_row('2988507'), store.get('2988507'))
+        self.assertEqual(make_row('2988507'), store.get(b'2988507'))
+        self.assertEqual(make_row('2988507'), store.get(2988507))
+        self.assertIn('2988507', store)
+        self.assertNotIn('2988508', store)
+
+    def test_non_numeric(self):
+        # Historic entries have non numeric geoids.  Geoids too large for the table are also kept in a dictionary
+        store = GeorowStore()
+        for geoid in ['hist1', 'X123', str(2 ** 64)]:
+            store.add(make_row(geoid))
+            self.assertEqual(make_row(geoid), store.get(geoid))
+        store.remove('hist1')
+        self.assertIsNone(store.get('hist1'))
+        self.assertEqual(2, len(store))
+
+    def test_remove(self):
+        store = GeorowStore()
+        store.add(make_row('1'))
+        store.remove('1')
+        store.remove('2')
+        self.assertNotIn('1', store)
+        self.assertEqual(0, len(store))
+        # A new row can be added for a removed geoid
+        store.add(make_row('1', name='lyon'))
+        self.assertEqual(make_row('1', name='lyon'), store.get('1'))
+        self.assertEqual(1, len(store))
+
+    def test_same_as_dict(self):
+        # Random adds and removes, with sequential geoids and enough entries to grow the table several times
+        rnd = random.Random(1)
+        store = GeorowStore(capacity=8)
+        expected = {}
+        geoids = [str(geoid) for geoid in range(1000, 6000)] + [str(rnd.randrange(10 ** 9)) for _ in range(5000)]
+        for idx, geoid in enumerate(geoids):
+            row = make_row(geoid, name=f'place {idx}')
+            store.add(row)
+            expected.setdefault(geoid, row)
+            if rnd.random() < 0.2:
+                geoid = rnd.choice(geoids[:idx + 1])
+                store.remove(geoid)
+                expected.pop(geoid, None)
+        self.assertEqual(len(expected), len(store))
+        for geoid in geoids:
+            with self.subTest(geoid=geoid):
+                self.assertEqual(expected.get(geoid), store.get(geoid))
+                self.assertEqual(geoid in expected, geoid in store)
+
+    def test_clear(self):
+        store = GeorowStore(capacity=8)
+        for geoid in range(100):
+            store.add(make_row(geoid))
+        store.clear()
+        self.assertEqual(0, len(store))
+        self.assertIsNone(store.get('5'))
+        store.add(make_row('5'))
+        self.assertEqual(make_row('5'), store.get('5'))
+
+
+if __name__ == '__main__':
+    unittest.main()
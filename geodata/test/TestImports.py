@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2019.       Mike Herbert
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+import os
+import subprocess
+import sys
+import unittest
+
+import geodata
+from geodata import MatchScore, Geodata
+
+# Scratch scripts that run code when imported
+SKIP_MODULES = {'__init__', 'Test'}
+
+
+class TestImports(unittest.TestCase):
+    """
+    The geodata modules import each other, so a module level reference to another module can fail depending on
+    which module is imported first.  Import each module first in a new interpreter
+    """
+
+    def test_import_each_module(self):
+        package_dir = os.path.dirname(geodata.__file__)
+        root = os.path.dirname(package_dir)
+        modules = sorted(fname[:-3] for fname in os.listdir(package_dir)
+                         if fname.endswith('.py') and fname[:-3] not in SKIP_MODULES)
+        for module in modules:
+            with self.subTest(module=module):
+                res = subprocess.run([sys.executable, '-c', f'import geodata.{module}'], cwd=root,
+                                     stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+                self.assertEqual(res.returncode, 0, msg=res.stderr)
+
+    def test_poor_cutoff(self):
+        # Geodata keeps its own copy of the cutoff
+        self.assertEqual(Geodata.POOR_CUTOFF, MatchScore.Score.POOR_CUTOFF)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2019.       Mike Herbert
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+from geodata import BuildManifest, Geodata
+from geodata.test import SyntheticData
+
+ROWS = 1000
+# Lat set on the first geodata row.  It is only kept if the DB isn't rebuilt
+MARKER_LAT = 99.0
+
+
+def get_names(geodata: Geodata.Geodata) -> {}:
+    """ Returns: dictionary of table: set of rows without ids.  Ids differ when the alternate names are redone """
+    db = geodata.geo_build.geodb.db
+    return {'geodata': set(db.query('SELECT name, country, feature, geoid, admin1_name, country_name FROM geodata')),
+            'admin': set(db.query('SELECT name, country, feature, geoid, admin1_name, country_name FROM admin')),
+            'altname': set(db.query('SELECT name, lang, geoid FROM altname'))}
+
+
+class TestManifest(unittest.TestCase):
+    """
+    Open a DB after its inputs are changed.  The DB is used as is, its alternate names are redone, or it is rebuilt.
+    The DBs are built from synthetic geonames files in temp directories
+    """
+
+    def setUp(self) -> None:
+        fmt = "%(levelname)s %(name)s.%(funcName)s %(lineno)d: %(message)s"
+        logging.basicConfig(level=logging.ERROR, format=fmt)
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        geodata = SyntheticData.open_synthetic_geodata(self.temp_dir, rows=ROWS)
+        geodata.geo_build.geodb.db.execute_transaction(['UPDATE geodata SET lat = ? WHERE id = 1'], (MARKER_LAT,))
+        geodata.close()
+
+    def reopen(self, languages=None) -> Geodata.Geodata:
+        geodata = SyntheticData.open_synthetic_geodata(self.temp_dir, languages=languages)
+        self.addCleanup(geodata.close)
+        return geodata
+
+    def get_marker(self, geodata: Geodata.Geodata) -> float:
+        return list(geodata.geo_build.geodb.db.query('SELECT lat FROM geodata WHERE id = 1'))[0][0]
+
+    def test_unchanged(self):
+        # A file that is touched but unchanged doesn't cause a rebuild
+        path = os.path.join(self.temp_dir, 'allCountries.txt')
+        os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 10 ** 9))
+        geodata = self.reopen()
+        self.assertEqual(MARKER_LAT, self.get_marker(geodata))
+        manifest = geodata.geo_build.manifest
+        self.assertEqual(BuildManifest.SAME, manifest.compare(geodata.geo_build.geodb.db))
+        # The new modify time is recorded so the file isn't hashed on the next open
+        stored = manifest.read(geodata.geo_build.geodb.db)['file:allCountries.txt']
+        self.assertEqual(os.stat(path).st_mtime_ns, stored[2])
+
+    def test_geoname_file_changed(self):
+        # Rebuild
+        with open(os.path.join(self.temp_dir, 'allCountries.txt'), 'a', encoding='utf-8') as geofile:
+            geofile.write('\t'.join(['9000001', 'Newtown', 'Newtown', '', '51.0', '-3.0', 'P', 'PPL', 'GB', '', 'WLS', 'X5',
+                                     '', '', '100', '', '10', '', '2019-11-20']) + '\n')
+        geodata = self.reopen()
+        self.assertNotEqual(MARKER_LAT, self.get_marker(geodata))
+        self.assertEqual([('newtown',)], list(geodata.geo_build.geodb.db.query(
+            "SELECT name FROM geodata WHERE geoid = '9000001'")))
+
+    def test_file_removed(self):
+        # A geonames file removed since the build isn't a change.  The DB is kept
+        os.remove(os.path.join(self.temp_dir, 'allCountries.txt'))
+        geodata = self.reopen()
+        self.assertEqual(MARKER_LAT, self.get_marker(geodata))
+        self.assertEqual(BuildManifest.SAME, geodata.geo_build.manifest.compare(geodata.geo_build.geodb.db))
+
+    def test_rebuild_without_files(self):
+        # A rebuild is needed but the geonames file was removed.  The DB is kept
+        geodata = SyntheticData.open_synthetic_geodata(self.temp_dir)
+        geodata.geo_build.geodb.db.execute_transaction(["UPDATE manifest SET hash = 'x' WHERE item = 'normalize'"], ())
+        geodata.close()
+        os.remove(os.path.join(self.temp_dir, 'allCountries.txt'))
+        geodata = SyntheticData.open_synthetic_geodata(self.temp_dir)
+        self.assertEqual(MARKER_LAT, self.get_marker(geodata))
+
+        # Out of date version.  Open fails but the DB isn't deleted
+        geodata.geo_build.geodb.db.execute_transaction(['UPDATE version SET version = 2'], ())
+        geodata.close()
+        geodata = SyntheticData.create_geodata(self.temp_dir)
+        self.addCleanup(geodata.close)
+        self.assertTrue(geodata.open(repair_database=True, query_limit=50))
+        self.assertEqual(MARKER_LAT, self.get_marker(geodata))
+
+    def test_languages_changed(self):
+        # Only the alternate names are redone.  The result is the same as a full build with the new languages
+        geodata = self.reopen(languages={'en', 'de'})
+        self.assertEqual(MARKER_LAT, self.get_marker(geodata))
+        self.assertEqual(BuildManifest.SAME, geodata.geo_build.manifest.compare(geodata.geo_build.geodb.db))
+
+        reference_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, reference_dir)
+        reference = SyntheticData.open_synthetic_geodata(reference_dir, rows=ROWS, languages={'en', 'de'})
+        self.addCleanup(reference.close)
+        names = get_names(geodata)
+        reference_names = get_names(reference)
+        self.assertIn('de', {row[1] for row in names['altname']})
+        for tbl in names:
+            with self.subTest(table=tbl):
+                self.assertEqual(reference_names[tbl], names[tbl])
+
+
+if __name__ == '__main__':
+    unittest.main()
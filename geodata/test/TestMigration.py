@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2019.       Mike Herbert
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from geodata import Geodata, Loc
+from geodata.test import BenchSchema, SyntheticData
+
+ROWS = 2000
+LOCATIONS = ['cardiff, wales', 'carddif, wales', 'eddinburg castle,,scotland', 'cant* cath*,england', 'paris, france',
+             '*bury, england', 'halifax, nova scotia, canada', 'boston,,ma, united states', 'berlin, germany', 'london']
+
+
+def lookup(geodata: Geodata.Geodata, location: str) -> str:
+    place = Loc.Loc()
+    geodata.find_best_match(location, place)
+    return f'{place.get_long_name(None)} {place.lat} {place.lon} {place.geoid} {place.result_type}'
+
+
+class TestMigration(unittest.TestCase):
+    """
+    Copy a DB built with the current schema into a V4 DB, then open the V4 DB so it is migrated to the current
+    version.  Lookups must give the same results from both DBs.  The DBs are built from synthetic geonames files
+    in temp directories
+    """
+    current = None
+    migrated = None
+    temp_dirs = []
+
+    @classmethod
+    def setUpClass(cls):
+        fmt = "%(levelname)s %(name)s.%(funcName)s %(lineno)d: %(message)s"
+        logging.basicConfig(level=logging.ERROR, format=fmt)
+        cls.temp_dirs = [tempfile.mkdtemp(), tempfile.mkdtemp()]
+        for directory in cls.temp_dirs:
+            SyntheticData.write_geoname_files(directory, ROWS)
+        cls.current = SyntheticData.open_synthetic_geodata(cls.temp_dirs[0])
+        db_path = cls.current.geo_build.get_db_path()
+        # The DB is opened with an exclusive lock
+        cls.current.close()
+
+        v4_path = os.path.join(cls.temp_dirs[1], 'cache', 'geodata.db')
+        BenchSchema.make_v4_copy(db_path, v4_path)
+        conn = sqlite3.connect(v4_path)
+        conn.execute('CREATE TABLE version (id integer primary key autoincrement not null, version integer)')
+        conn.execute('INSERT INTO version(version) VALUES(4)')
+        conn.commit()
+        conn.close()
+
+        cls.current = SyntheticData.open_synthetic_geodata(cls.temp_dirs[0])
+        cls.migrated = SyntheticData.open_synthetic_geodata(cls.temp_dirs[1])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.current.close()
+        cls.migrated.close()
+        for directory in cls.temp_dirs:
+            shutil.rmtree(directory)
+
+    def test_version(self):
+        geo_build = TestMigration.migrated.geo_build
+        self.assertEqual(geo_build.required_db_version, geo_build.geodb.get_db_version())
+
+    def test_columns(self):
+        # Columns added by the migrations have the same values as a build, except population which V4 didn't have
+        sql = 'SELECT geoid, name, admin1_name, admin2_name, country_name, rev_name FROM {} ORDER BY id'
+        for tbl in ['geodata', 'admin']:
+            with self.subTest(table=tbl):
+                self.assertEqual(list(TestMigration.current.geo_build.geodb.db.query(sql.format(tbl))),
+                                 list(TestMigration.migrated.geo_build.geodb.db.query(sql.format(tbl))))
+
+    def test_lookups(self):
+        rows = TestMigration.current.geo_build.geodb.db.query(
+            'SELECT name, admin1_name, country_name FROM geodata WHERE id % 37 = 0')
+        for location in LOCATIONS + [', '.join(row) for row in rows]:
+            with self.subTest(location=location):
+                self.assertEqual(lookup(TestMigration.current, location), lookup(TestMigration.migrated, location))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2019.       Mike Herbert
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+import logging
+import shutil
+import tempfile
+import unittest
+
+from geodata import Geodata
+from geodata.test import SyntheticData
+
+ROWS = 5000
+WORKERS = 4
+CHUNK_SIZE = 32 * 1024
+
+
+def get_tables(geodata: Geodata.Geodata) -> {}:
+    """ Returns: dictionary of table: all rows in id order """
+    db = geodata.geo_build.geodb.db
+    return {tbl: list(db.query(f'SELECT * FROM {tbl} ORDER BY id')) for tbl in ['geodata', 'admin', 'altname']}
+
+
+class TestParallelBuild(unittest.TestCase):
+    """
+    Build a DB with several worker processes parsing the geonames files.  It must be the same as a DB built by one
+    process.  The DBs are built from the same synthetic geonames files in temp directories
+    """
+
+    def setUp(self) -> None:
+        fmt = "%(levelname)s %(name)s.%(funcName)s %(lineno)d: %(message)s"
+        logging.basicConfig(level=logging.ERROR, format=fmt)
+
+    def build(self, workers: int) -> {}:
+        """ Returns: the rows of the DB built with workers processes """
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        SyntheticData.write_geoname_files(directory, ROWS)
+        geodata = SyntheticData.create_geodata(directory, workers=workers)
+        # Small chunks so each worker gets several
+        geodata.geo_build.chunk_size = CHUNK_SIZE
+        self.addCleanup(geodata.close)
+        self.assertFalse(geodata.open(repair_database=True, query_limit=50))
+        return get_tables(geodata)
+
+    def test_parallel(self):
+        sequential = self.build(workers=1)
+        parallel = self.build(workers=WORKERS)
+        for tbl in sequential:
+            with self.subTest(table=tbl):
+                self.assertGreater(len(sequential[tbl]), 0)
+                self.assertEqual(sequential[tbl], parallel[tbl])
+
+
+if __name__ == '__main__':
+    unittest.main()
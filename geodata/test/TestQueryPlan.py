@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2019.       Mike Herbert
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+import logging
+import shutil
+import tempfile
+import unittest
+
+from geodata import QueryList, QueryPlanAudit
+from geodata.test import SyntheticData
+
+
+class TestQueryPlan(unittest.TestCase):
+    """
+    Check that no query shape the search code creates does a full scan of geodata or admin.  A DB is built from
+    synthetic geonames files in a temp directory
+    """
+    geodata = None
+    temp_dir = None
+    results = []
+
+    @classmethod
+    def setUpClass(cls):
+        fmt = "%(levelname)s %(name)s.%(funcName)s %(lineno)d: %(message)s"
+        logging.basicConfig(level=logging.ERROR, format=fmt)
+        cls.temp_dir = tempfile.mkdtemp()
+        cls.geodata = SyntheticData.open_synthetic_geodata(cls.temp_dir, rows=20000)
+        cls.results = QueryPlanAudit.QueryPlanAudit(cls.geodata).run()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.geodata.close()
+        shutil.rmtree(cls.temp_dir)
+
+    def test_no_scan(self):
+        # Each query shape must use an index on geodata and admin
+        for res in TestQueryPlan.results:
+            with self.subTest(where=res.where, table=res.table):
+                self.assertFalse(res.scan, msg=f'{res.function} {res.table} [{res.where}] {res.plan}')
+
+    def test_shapes_found(self):
+        # The probes reach each of the search routines
+        functions = {res.function for res in TestQueryPlan.results}
+        for function in ['_search', 'search_for_combinations', 'search_each_term', 'search_trigrams', 'lookup_geoid',
+                         'lookup_dbid', 'get_alternate_name']:
+            with self.subTest(function=function):
+                self.assertIn(function, functions)
+        tables = {res.table for res in TestQueryPlan.results}
+        self.assertIn('main.geodata', tables)
+        self.assertIn('main.admin', tables)
+
+    def test_wildcard_shapes(self):
+        # Wildcards at the start (*abc) and in the middle (abc*def) of a name use a range on rev_name or name.
+        # A skip scan of admin1_idx (ANY(admin1_id)) reads every row for the country, so it is also checked
+        geodb = TestQueryPlan.geodata.geo_build.geodb
+        for pattern, index in [('*ton', 'rev_name'), ('*ton castle', 'rev_name'), ('can*ury', 'name'),
+                               ('can*ury cath*', 'name')]:
+            with self.subTest(pattern=pattern):
+                item = QueryList.QueryItem()
+                item.add_clauses(where_clauses=['name', 'country'], terms=[pattern, 'gb'])
+                plan = geodb.db.explain_query_plan('name', item.where, 'main.geodata', item.args, order_str='')
+                self.assertFalse(QueryPlanAudit.is_scan(plan), msg=plan)
+                self.assertFalse(any('ANY(' in line for line in plan), msg=plan)
+                self.assertTrue(any(f'({index}>?' in line for line in plan), msg=plan)
+        shapes = {res.where: res for res in TestQueryPlan.results if res.table == 'main.geodata'}
+        self.assertIn('(rev_name >= ? AND rev_name < ?) AND country = ?', shapes)
+        self.assertIn('(name >= ? AND name < ?) AND name LIKE ? AND country = ?', shapes)
+
+    def test_scan_detected(self):
+        # No index has lat, so this shape is a full scan
+        db = TestQueryPlan.geodata.geo_build.geodb.db
+        plan = db.explain_query_plan('name', 'lat = ?', 'main.geodata', (1.0,), order_str='')
+        self.assertTrue(QueryPlanAudit.is_scan(plan), msg=plan)
+        plan = db.explain_query_plan('name', 'name = ? AND country = ?', 'main.geodata', ('paris', 'fr'), order_str='')
+        self.assertFalse(QueryPlanAudit.is_scan(plan), msg=plan)
+
+
+if __name__ == '__main__':
+    unittest.main()
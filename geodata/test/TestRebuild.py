@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2019.       Mike Herbert
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from geodata import Geodata, GeodataBuild, Loc
+from geodata.test import SyntheticData
+
+ROWS = 1000
+# Lat set on the first geodata row.  It is only kept if the DB isn't rebuilt
+MARKER_LAT = 99.0
+
+
+def get_marker(geodata: Geodata.Geodata) -> float:
+    return list(geodata.geo_build.geodb.db.query('SELECT lat FROM geodata WHERE id = 1'))[0][0]
+
+
+def lookup(geodata: Geodata.Geodata, location: str) -> str:
+    place = Loc.Loc()
+    geodata.find_best_match(location, place)
+    return f'{place.get_long_name(None)} {place.lat} {place.lon} {place.geoid} {place.result_type}'
+
+
+class TestRebuild(unittest.TestCase):
+    """
+    Staged rebuilds.  The new DB is built in geodata.db.building and only replaces geodata.db when it is valid.
+    The DBs are built from synthetic geonames files in a temp directory
+    """
+
+    def setUp(self) -> None:
+        fmt = "%(levelname)s %(name)s.%(funcName)s %(lineno)d: %(message)s"
+        logging.basicConfig(level=logging.ERROR, format=fmt)
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        geodata = SyntheticData.open_synthetic_geodata(self.temp_dir, rows=ROWS)
+        geodata.geo_build.geodb.db.execute_transaction(['UPDATE geodata SET lat = ? WHERE id = 1'], (MARKER_LAT,))
+        self.db_path = geodata.geo_build.get_db_path()
+        geodata.close()
+        self.file_id = GeodataBuild.GeodataBuild._get_file_id(self.db_path)
+
+    def open_geodata(self, **kwargs) -> Geodata.Geodata:
+        geodata = SyntheticData.open_synthetic_geodata(self.temp_dir, open_args=kwargs)
+        self.addCleanup(geodata.close)
+        return geodata
+
+    def test_stale_version(self):
+        # A DB with an old version is rebuilt in the staging file.  geodata.db is kept until the swap
+        geodata = SyntheticData.open_synthetic_geodata(self.temp_dir)
+        geodata.geo_build.geodb.db.execute_transaction(['UPDATE version SET version = 2'], ())
+        geodata.close()
+        self.file_id = GeodataBuild.GeodataBuild._get_file_id(self.db_path)
+        create_geonames_database = GeodataBuild.GeodataBuild.create_geonames_database
+        file_ids = []
+
+        def check_build(geo_build, **kwargs):
+            file_ids.append(GeodataBuild.GeodataBuild._get_file_id(self.db_path))
+            self.assertEqual(self.db_path + '.building', geo_build.geodb.db_path)
+            return create_geonames_database(geo_build, **kwargs)
+
+        with mock.patch.object(GeodataBuild.GeodataBuild, 'create_geonames_database', autospec=True,
+                               side_effect=check_build):
+            geodata = self.open_geodata(staged_rebuild=True)
+        self.assertEqual([self.file_id], file_ids)
+        self.assertNotEqual(MARKER_LAT, get_marker(geodata))
+        self.assertEqual(geodata.geo_build.required_db_version, geodata.geo_build.geodb.get_db_version())
+        self.assertFalse(os.path.exists(self.db_path + '.building'))
+
+    def test_validate(self):
+        geodata = SyntheticData.open_synthetic_geodata(self.temp_dir)
+        self.assertFalse(geodata.geo_build._validate_geodb(self.db_path, 50))
+        geodata.geo_build.geodb.db.execute_transaction(['UPDATE version SET version = 2'], ())
+        geodata.close()
+        self.assertTrue(geodata.geo_build._validate_geodb(self.db_path, 50))
+        self.assertTrue(geodata.geo_build._validate_geodb(os.path.join(self.temp_dir, 'allCountries.txt'), 50))
+
+    def test_validation_failure(self):
+        # geodata.db isn't changed and the staging file is removed
+        geodata = self.open_geodata()
+        with mock.patch.object(GeodataBuild.GeodataBuild, '_validate_geodb', return_value=True) as validate:
+            self.assertTrue(geodata.rebuild(query_limit=50))
+        validate.assert_called_once_with(self.db_path + '.building', 50)
+        self.assertEqual(self.file_id, GeodataBuild.GeodataBuild._get_file_id(self.db_path))
+        self.assertFalse(os.path.exists(self.db_path + '.building'))
+        self.assertEqual(MARKER_LAT, get_marker(geodata))
+
+    def test_reopen_if_changed(self):
+        # A second instance reading the DB switches to the new file after the rebuild
+        builder = self.open_geodata()
+        reader = self.open_geodata(read_only=True)
+        self.assertFalse(reader.reopen_if_changed())
+        self.assertEqual(MARKER_LAT, get_marker(reader))
+
+        self.assertFalse(builder.rebuild(query_limit=50))
+        self.assertNotEqual(self.file_id, GeodataBuild.GeodataBuild._get_file_id(self.db_path))
+        self.assertNotEqual(MARKER_LAT, get_marker(builder))
+        self.assertTrue(reader.geo_build.db_file_changed())
+        self.assertTrue(reader.reopen_if_changed())
+        self.assertFalse(reader.geo_build.db_file_changed())
+        self.assertNotEqual(MARKER_LAT, get_marker(reader))
+        self.assertEqual(lookup(builder, 'cardiff, wales'), lookup(reader, 'cardiff, wales'))
+
+
+if __name__ == '__main__':
+    unittest.main()
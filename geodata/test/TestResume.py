@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2019.       Mike Herbert
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+import logging
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from geodata import Geodata, GeodataBuild
+from geodata.test import SyntheticData
+
+ROWS = 2000
+CHECKPOINT_LINES = 500
+
+
+class BuildKilled(Exception):
+    pass
+
+
+def create_geodata(directory: str) -> Geodata.Geodata:
+    geodata = SyntheticData.create_geodata(directory)
+    geodata.geo_build.checkpoint_lines = CHECKPOINT_LINES
+    return geodata
+
+
+def get_tables(geodata: Geodata.Geodata) -> {}:
+    """ Returns: dictionary of table: all rows in id order """
+    db = geodata.geo_build.geodb.db
+    return {tbl: list(db.query(f'SELECT * FROM {tbl} ORDER BY id')) for tbl in ['geodata', 'admin', 'altname']}
+
+
+class TestResume(unittest.TestCase):
+    """
+    Kill a build at a checkpoint, then open the DB again.  The resumed build must give the same DB as a build that
+    wasn't interrupted.  The DBs are built from synthetic geonames files in temp directories
+    """
+    reference = {}
+    temp_dir = None
+
+    @classmethod
+    def setUpClass(cls):
+        fmt = "%(levelname)s %(name)s.%(funcName)s %(lineno)d: %(message)s"
+        logging.basicConfig(level=logging.ERROR, format=fmt)
+        cls.temp_dir = tempfile.mkdtemp()
+        geodata = SyntheticData.open_synthetic_geodata(cls.temp_dir, rows=ROWS)
+        cls.reference = get_tables(geodata)
+        geodata.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.temp_dir)
+
+    def resume_build(self, kill_at) -> Geodata.Geodata:
+        """
+        Build a DB and kill the build in the first save_checkpoint call where kill_at(checkpoint fields) is True.
+        Then open the DB again so the build is resumed
+        #Returns:
+            Geodata with the resumed DB open
+        """
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        SyntheticData.write_geoname_files(directory, ROWS)
+        save_checkpoint = GeodataBuild.GeodataBuild.save_checkpoint
+
+        def killed_save(geo_build, **kwargs):
+            if kill_at(kwargs):
+                # Killed before the checkpoint is committed
+                raise BuildKilled()
+            save_checkpoint(geo_build, **kwargs)
+
+        geodata = create_geodata(directory)
+        with mock.patch.object(GeodataBuild.GeodataBuild, 'save_checkpoint', autospec=True, side_effect=killed_save):
+            with self.assertRaises(BuildKilled):
+                geodata.open(repair_database=True, query_limit=50)
+        geodata.close()
+
+        geodata = create_geodata(directory)
+        self.addCleanup(geodata.close)
+        self.assertFalse(geodata.open(repair_database=True, query_limit=50))
+        self.assertTrue(geodata.geo_build.report.resumed)
+        self.assertEqual(geodata.geo_build.required_db_version, geodata.geo_build.geodb.get_db_version())
+        return geodata
+
+    def test_resume_geoname_file(self):
+        # Killed part way through allCountries.txt
+        geodata = self.resume_build(lambda kwargs: kwargs.get('line', 0) >= 3 * CHECKPOINT_LINES)
+        self.assertEqual(TestResume.reference, get_tables(geodata))
+
+    def test_resume_alternate_names(self):
+        # Killed part way through alternateNamesV2.txt
+        geodata = self.resume_build(lambda kwargs: kwargs.get('alt_line', 0) >= 3 * CHECKPOINT_LINES)
+        self.assertEqual(TestResume.reference, get_tables(geodata))
+
+    def test_resume_stage(self):
+        # Killed after the alternate names, before the admin names are set
+        geodata = self.resume_build(lambda kwargs: kwargs.get('names', False))
+        self.assertEqual(TestResume.reference, get_tables(geodata))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2019.       Mike Herbert
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from geodata import Geodata, GeodataBuild, Loc, ShardSet
+from geodata.test import SyntheticData
+
+ROWS = 2000
+LOCATIONS = ['cardiff, wales', 'carddif, wales', 'eddinburg castle,,scotland', 'cant* cath*,england', 'paris, france',
+             '*bury, england', 'halifax, nova scotia, canada', 'boston,,ma, united states', 'berlin, germany', 'london']
+COLUMNS = 'name, country, admin1_id, admin2_id, lat, lon, feature, geoid, sdx, admin1_name, country_name'
+
+
+def get_gb_lines(directory: str) -> [str]:
+    """
+    Returns: the GB lines from allCountries.txt with some removed and some renamed
+    """
+    lines = []
+    with open(os.path.join(directory, 'allCountries.txt'), encoding='utf-8') as geofile:
+        for idx, line in enumerate(geofile):
+            fields = line.rstrip('\n').split('\t')
+            if fields[8] != 'GB' or fields[0] in ['2653822', '2634895'] or idx % 5 == 0:
+                continue
+            if idx % 7 == 0:
+                fields[1] += 'ton'
+            lines.append('\t'.join(fields) + '\n')
+    return lines
+
+
+def replace_gb_lines(directory: str, gb_lines: [str]):
+    """ Replace the GB lines in allCountries.txt """
+    path = os.path.join(directory, 'allCountries.txt')
+    with open(path, encoding='utf-8') as geofile:
+        lines = [line for line in geofile if line.split('\t')[8] != 'GB']
+    with open(path, 'w', encoding='utf-8') as geofile:
+        geofile.writelines(lines + gb_lines)
+
+
+def get_rows(geodata: Geodata.Geodata) -> ([], [], []):
+    """ Returns: sorted rows (without ids) from geodata in all shards, admin and altname """
+    geodb = geodata.geo_build.geodb
+    tables = ['main.geodata']
+    if geodb.shards is not None:
+        tables.extend(f'{geodb.shards.attach(iso)}.geodata' for iso in sorted(geodb.shards.countries))
+    geo_rows = sorted(row for tbl in tables for row in geodb.db.query(f'SELECT {COLUMNS} FROM {tbl}'))
+    admin_rows = sorted(geodb.db.query(f'SELECT {COLUMNS} FROM admin'))
+    alt_rows = sorted(geodb.db.query('SELECT name, lang, geoid, sdx FROM altname'))
+    return geo_rows, admin_rows, alt_rows
+
+
+def lookup(geodata: Geodata.Geodata, location: str) -> str:
+    place = Loc.Loc()
+    geodata.find_best_match(location, place)
+    return f'{place.get_long_name(None)} {place.lat} {place.lon} {place.geoid} {place.result_type}'
+
+
+class TestShards(unittest.TestCase):
+    """
+    Build a DB with a shard file for each country and check it against a DB that isn't sharded.  Then reload the
+    shard for one country with refresh_shard.  The DBs are built from synthetic geonames files in temp directories
+    """
+
+    def setUp(self) -> None:
+        fmt = "%(levelname)s %(name)s.%(funcName)s %(lineno)d: %(message)s"
+        logging.basicConfig(level=logging.ERROR, format=fmt)
+
+    def build(self, sharded: bool, gb_lines=None) -> Geodata.Geodata:
+        """
+        Build a DB from synthetic geonames files.  If gb_lines is set, the GB lines in allCountries.txt are replaced
+        #Returns:
+            Geodata with the DB open
+        """
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        SyntheticData.write_geoname_files(directory, ROWS)
+        if gb_lines is not None:
+            replace_gb_lines(directory, gb_lines)
+        geodata = SyntheticData.open_synthetic_geodata(directory, sharded=sharded)
+        self.addCleanup(geodata.close)
+        return geodata
+
+    def test_sharded(self):
+        # Each country has a shard file and main.geodata is empty.  Lookups are the same as without shards
+        sharded = self.build(sharded=True)
+        reference = self.build(sharded=False)
+        geodb = sharded.geo_build.geodb
+        countries = sorted(row[0] for row in reference.geo_build.geodb.db.query('SELECT DISTINCT country FROM geodata'))
+        self.assertEqual(countries, sorted(geodb.shards.countries))
+        self.assertEqual(0, geodb.db.get_row_count('main.geodata'))
+        self.assertEqual(get_rows(reference), get_rows(sharded))
+        rows = reference.geo_build.geodb.db.query('SELECT name, admin1_name, country_name FROM geodata '
+                                                  'WHERE id % 37 = 0')
+        for location in LOCATIONS + [', '.join(row) for row in rows]:
+            with self.subTest(location=location):
+                self.assertEqual(lookup(reference, location), lookup(sharded, location))
+
+    def test_refresh_shard(self):
+        # After GB.txt is loaded the DB has the same rows as a DB built from the changed file.  Other shards are
+        # not changed
+        sharded = self.build(sharded=True)
+        directory = sharded.geo_build.directory
+        gb_lines = get_gb_lines(directory)
+        with open(os.path.join(directory, 'GB.txt'), 'w', encoding='utf-8') as geofile:
+            geofile.writelines(gb_lines)
+        shard_dir = ShardSet.get_shard_directory(sharded.geo_build.get_db_path())
+        mtimes = {fname: os.stat(os.path.join(shard_dir, fname)).st_mtime_ns for fname in os.listdir(shard_dir)}
+
+        self.assertFalse(sharded.refresh_shard('gb'))
+        reference = self.build(sharded=False, gb_lines=gb_lines)
+        self.assertEqual(get_rows(reference), get_rows(sharded))
+        self.assertEqual(lookup(reference, 'cardiff, wales'), lookup(sharded, 'cardiff, wales'))
+        for fname, mtime in mtimes.items():
+            with self.subTest(fname=fname):
+                changed = os.stat(os.path.join(shard_dir, fname)).st_mtime_ns != mtime
+                self.assertEqual(fname == 'geodata_gb.db', changed)
+
+    def test_staged_rebuild(self):
+        # The shards are built in shards.building.  The live shards aren't changed until the new DB is validated
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        geodata = SyntheticData.open_synthetic_geodata(directory, rows=ROWS, sharded=True)
+        db_path = geodata.geo_build.get_db_path()
+        geodata.close()
+        shard_dir = ShardSet.get_shard_directory(db_path)
+        mtimes = {fname: os.stat(os.path.join(shard_dir, fname)).st_mtime_ns for fname in os.listdir(shard_dir)}
+        gb_lines = get_gb_lines(directory)
+        replace_gb_lines(directory, gb_lines)
+
+        geodata = SyntheticData.create_geodata(directory, sharded=True)
+        with mock.patch.object(GeodataBuild.GeodataBuild, '_validate_geodb', return_value=True):
+            self.assertTrue(geodata.open(repair_database=True, query_limit=50, staged_rebuild=True))
+        geodata.close()
+        self.assertEqual(mtimes, {fname: os.stat(os.path.join(shard_dir, fname)).st_mtime_ns
+                                  for fname in os.listdir(shard_dir)})
+        self.assertFalse(os.path.exists(db_path + '.building'))
+        self.assertFalse(os.path.exists(ShardSet.get_shard_directory(db_path + '.building')))
+
+        # Without the validation failure the new DB and shards are swapped in
+        geodata = SyntheticData.open_synthetic_geodata(directory, sharded=True, open_args={'staged_rebuild': True})
+        self.addCleanup(geodata.close)
+        self.assertFalse(os.path.exists(ShardSet.get_shard_directory(db_path + '.building')))
+        reference = self.build(sharded=False, gb_lines=gb_lines)
+        self.assertEqual(get_rows(reference), get_rows(geodata))
+        self.assertEqual(lookup(reference, 'cardiff, wales'), lookup(geodata, 'cardiff, wales'))
+
+    def test_refresh_errors(self):
+        reference = self.build(sharded=False)
+        self.assertTrue(reference.refresh_shard('gb'))
+        sharded = self.build(sharded=True)
+        self.assertTrue(sharded.refresh_shard('gb'))
+        self.assertTrue(sharded.refresh_shard('g1'))
+
+
+if __name__ == '__main__':
+    unittest.main()
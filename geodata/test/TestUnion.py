@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2019.       Mike Herbert
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+import logging
+import shutil
+import tempfile
+import unittest
+
+from geodata import Geodata, Loc
+from geodata.test import SyntheticData
+
+ROWS = 5000
+LOCATIONS = ['cardiff, wales', 'carddif, wales', 'eddinburg castle,,scotland', 'cant* cath*,england', 'paris, france',
+             '*bury, england', 'halifax, nova scotia, canada', 'boston,,ma, united states', 'berlin, germany', 'london']
+
+
+def find_matches(geodata: Geodata.Geodata, location: str, union_queries: bool) -> ():
+    """ Returns: (result code, georow_list) from find_matches """
+    geodata.geo_build.geodb.union_queries = union_queries
+    place = Loc.Loc()
+    result = geodata.find_matches(location, place)
+    return result, place.result_type, [tuple(row) for row in place.georow_list]
+
+
+class TestUnion(unittest.TestCase):
+    """
+    Query lists run as one UNION ALL statement must find the same matches as the queries run one at a time.
+    The DB is built from synthetic geonames files in a temp directory
+    """
+    geodata = None
+    temp_dir = None
+
+    @classmethod
+    def setUpClass(cls):
+        fmt = "%(levelname)s %(name)s.%(funcName)s %(lineno)d: %(message)s"
+        logging.basicConfig(level=logging.ERROR, format=fmt)
+        cls.temp_dir = tempfile.mkdtemp()
+        cls.geodata = SyntheticData.open_synthetic_geodata(cls.temp_dir, rows=ROWS)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.geodata.close()
+        shutil.rmtree(cls.temp_dir)
+
+    def test_union(self):
+        rows = TestUnion.geodata.geo_build.geodb.db.query(
+            'SELECT name, admin1_name, country_name FROM geodata WHERE id % 97 = 0')
+        locations = list(LOCATIONS)
+        for name, admin1, country in rows:
+            # Exact, with admin1, prefix wildcard and a misspelling
+            locations.extend([f'{name}, {country}', f'{name}, {admin1}, {country}', f'{name[:3]}*, {country}',
+                              f'{name[:1]}{name[2:]}, {country}'])
+        db = TestUnion.geodata.geo_build.geodb.db
+        selects = {False: 0, True: 0}
+        results = {}
+        for union_queries in [False, True]:
+            start = db.statement_hits + db.statement_misses
+            results[union_queries] = [find_matches(TestUnion.geodata, location, union_queries)
+                                      for location in locations]
+            selects[union_queries] = db.statement_hits + db.statement_misses - start
+        for location, separate, union in zip(locations, results[False], results[True]):
+            with self.subTest(location=location):
+                self.assertEqual(separate, union)
+        # The union statements were used
+        self.assertLess(selects[True], selects[False])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2019.       Mike Herbert
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301  USA
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+from geodata.test import SyntheticData
+
+CARDIFF = ['2653822', 'Caerdydd', 'Caerdydd', '', '51.50', '-3.20', 'P', 'PPLA', 'GB', '', 'WLS', 'X5', '', '', '302139',
+           '', '10', 'Europe/London', '2019-11-20']
+WALES = ['2634895', 'Cymru', 'Cymru', '', '50.0', '1.0', 'A', 'ADM1', 'GB', '', 'WLS', '', '', '', '0',
+         '', '10', 'Europe/London', '2019-11-20']
+
+
+class TestUpdates(unittest.TestCase):
+    """
+    Apply geonames.org update files to a small DB built from synthetic geonames files in a temp directory
+    """
+
+    def setUp(self) -> None:
+        fmt = "%(levelname)s %(name)s.%(funcName)s %(lineno)d: %(message)s"
+        logging.basicConfig(level=logging.ERROR, format=fmt)
+        self.temp_dir = tempfile.mkdtemp()
+        self.geodata = SyntheticData.open_synthetic_geodata(self.temp_dir, rows=300)
+
+    def tearDown(self) -> None:
+        self.geodata.close()
+        shutil.rmtree(self.temp_dir)
+
+    def write_update(self, kind: str, date: str, lines: [str]):
+        with open(os.path.join(self.temp_dir, f'{kind}-{date}.txt'), 'w', encoding='utf-8') as update_file:
+            update_file.write(''.join(line + '\n' for line in lines))
+
+    def query(self, sql: str, args=()) -> []:
+        return list(self.geodata.geo_build.geodb.db.query(sql, args))
+
+    def test_modify(self):
+        # The entry is replaced and its alternate names are added back
+        alt_count = self.query("SELECT COUNT(*) FROM altname WHERE geoid = '2653822' AND lang != 'ut8'")[0][0]
+        self.write_update('modifications', '2019-11-20', ['\t'.join(CARDIFF)])
+        self.assertFalse(self.geodata.geo_build.apply_updates())
+        self.assertEqual([('caerdydd', 51.5, 'wales')],
+                         self.query("SELECT name, lat, admin1_name FROM geodata WHERE geoid = '2653822' "
+                                    "AND name = 'caerdydd'"))
+        self.assertEqual([], self.query("SELECT name FROM geodata WHERE geoid = '2653822' AND name = 'cardiff'"))
+        self.assertEqual(alt_count, self.query("SELECT COUNT(*) FROM altname WHERE geoid = '2653822' "
+                                               "AND lang != 'ut8'")[0][0])
+        self.assertEqual('2019-11-20', self.geodata.geo_build.get_update_date())
+
+    def test_modify_admin(self):
+        # Renaming an ADM1 entry sets the admin1 name on the places in it
+        self.write_update('modifications', '2019-11-20', ['\t'.join(WALES)])
+        self.assertFalse(self.geodata.geo_build.apply_updates())
+        self.assertEqual([('cymru',)], self.query("SELECT name FROM admin WHERE geoid = '2634895'"))
+        self.assertEqual([('cymru',)], self.query("SELECT DISTINCT admin1_name FROM geodata WHERE geoid = '2653822'"))
+
+    def test_delete(self):
+        self.write_update('deletes', '2019-11-20', ['2650225\tEdinburgh\tduplicate'])
+        self.assertFalse(self.geodata.geo_build.apply_updates())
+        self.assertEqual([(0,)], self.query("SELECT COUNT(*) FROM geodata WHERE geoid = '2650225'"))
+        self.assertEqual([(0,)], self.query("SELECT COUNT(*) FROM altname WHERE geoid = '2650225'"))
+        self.assertNotEqual([(0,)], self.query("SELECT COUNT(*) FROM geodata WHERE geoid = '2650229'"))
+
+    def test_alternate_name(self):
+        # Add then remove an alternate name for a place
+        self.write_update('alternateNamesModifications', '2019-11-20', ['900001\t2653822\ten\tLlandaff\t\t\t\t\t\t'])
+        self.assertFalse(self.geodata.geo_build.apply_updates())
+        self.assertEqual([(1,)], self.query("SELECT COUNT(*) FROM geodata WHERE geoid = '2653822' AND name = 'llandaff'"))
+        self.assertEqual([(1,)], self.query("SELECT COUNT(*) FROM altname WHERE alt_id = 900001"))
+
+        self.write_update('alternateNamesDeletes', '2019-11-21', ['900001\t2653822\tbad'])
+        self.assertFalse(self.geodata.geo_build.apply_updates())
+        self.assertEqual([(0,)], self.query("SELECT COUNT(*) FROM geodata WHERE geoid = '2653822' AND name = 'llandaff'"))
+        self.assertEqual([(0,)], self.query("SELECT COUNT(*) FROM altname WHERE alt_id = 900001"))
+        self.assertEqual([(1,)], self.query("SELECT COUNT(*) FROM geodata WHERE geoid = '2653822' AND name = 'cardiff'"))
+
+    def test_admin_alternate_name(self):
+        # The entry for a country alternate name is in the admin table.  Country entries use the ISO code as geoid
+        self.write_update('alternateNamesModifications', '2019-11-20', ['900002\tfr\ten\tLa Republique\t\t\t\t\t\t'])
+        self.assertFalse(self.geodata.geo_build.apply_updates())
+        self.assertEqual([(1,)], self.query("SELECT COUNT(*) FROM admin WHERE geoid = 'fr' AND name = 'la republique'"))
+
+        self.write_update('alternateNamesDeletes', '2019-11-21', ['900002\tfr\tbad'])
+        self.assertFalse(self.geodata.geo_build.apply_updates())
+        self.assertEqual([(0,)], self.query("SELECT COUNT(*) FROM admin WHERE geoid = 'fr' AND name = 'la republique'"))
+        self.assertEqual([(0,)], self.query("SELECT COUNT(*) FROM altname WHERE alt_id = 900002"))
+        self.assertEqual([(1,)], self.query("SELECT COUNT(*) FROM admin WHERE geoid = 'fr' AND name = 'france'"))
+        self.assertEqual([('france',)], self.query("SELECT DISTINCT country_name FROM geodata WHERE geoid = '2988507'"))
+
+
+if __name__ == '__main__':
+    unittest.main()